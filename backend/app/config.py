@@ -15,6 +15,40 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = ""
     DB_NAME: str = "estoque_engenho"
     
+    # Banco: mysql (servidor) ou sqlite (arquivo local em modo WAL, para loja única)
+    DB_ENGINE: str = "mysql"
+    DB_SQLITE_PATH: str = "estoque_engenho.db"
+    DB_SQLITE_SYNCHRONOUS: str = "NORMAL"   # NORMAL (recomendado com WAL) | FULL
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 5000   # espera pelo lock de escrita antes de falhar
+    
+    # Réplicas de leitura (URLs SQLAlchemy separadas por vírgula; vazio = sem réplicas)
+    DB_REPLICA_URLS: str = ""
+    DB_LEITURA_PRIMARIO_SEGUNDOS: float = 5   # leituras no primário após uma escrita
+    
+    # Group commit: movimentações simultâneas gravadas numa só transação
+    DB_GROUP_COMMIT: bool = False
+    DB_GROUP_COMMIT_JANELA_MS: float = 2   # espera por outras movimentações
+    DB_GROUP_COMMIT_LOTE_MAX: int = 64     # movimentações por transação
+    
+    # Estoque em faixas para SKUs concorridos (ativado por produto na API)
+    DB_ESTOQUE_FAIXAS: bool = False
+    DB_ESTOQUE_FAIXAS_PADRAO: int = 8                # faixas por produto
+    DB_ESTOQUE_FAIXAS_CONSOLIDAR_SEGUNDOS: float = 5  # atualiza produtos.estoque_atual
+    
+    # Pool de conexões
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30          # segundos aguardando uma conexão livre
+    DB_POOL_RECYCLE: int = 3600        # segundos até reciclar uma conexão
+    DB_POOL_PRE_PING: str = "ocioso"   # sempre | ocioso | nunca
+    DB_POOL_PING_OCIOSO_SEGUNDOS: int = 30
+    
+    # Diagnóstico de SQL
+    DB_ECHO: bool = False                   # Imprime todo o SQL (apenas para desenvolvimento)
+    DB_PROFILER_ATIVO: bool = False         # Server-Timing e log de consultas lentas
+    DB_SLOW_QUERY_MS: float = 200
+    DB_SLOW_QUERY_AMOSTRAGEM: float = 1.0   # Fração das consultas lentas registradas
+    
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
@@ -26,14 +60,56 @@ class Settings(BaseSettings):
     # Segurança
     SECRET_KEY: str = "dev-secret-key-change-in-production"
     
+    # Sincronização (margem de segurança aplicada ao token, em segundos)
+    SYNC_MARGEM_SEGUNDOS: int = 5
+    
+    # Idempotência das movimentações (validade das chaves, em horas)
+    IDEMPOTENCIA_TTL_HORAS: int = 24
+    
+    # Stream de eventos (buffer por assinante e intervalo de heartbeat)
+    EVENTOS_BUFFER: int = 256
+    EVENTOS_HEARTBEAT_SEGUNDOS: int = 15
+    
+    # Etiquetas pré-renderizadas (PNG por conteúdo, compartilhadas pelos workers)
+    ETIQUETAS_DIR: str = "armazem_etiquetas"
+    
+    # Jobs em segundo plano (/jobs): pool por worker, resultados em disco
+    JOBS_WORKERS: int = 2
+    JOBS_DIR: str = "jobs_resultados"
+    JOBS_RESULTADO_TTL_HORAS: int = 24
+    JOBS_MAX_PENDENTES: int = 100  # acima disso a submissão responde 503
+    JOBS_VARREDURA_SEGUNDOS: float = 30
+    JOBS_TIMEOUT_SEGUNDOS: int = 300  # "executando" sem sinal de vida volta para a fila
+    
+    # ZIP de códigos de barras e etiquetas: renderizações simultâneas e limite por pedido
+    ZIP_WORKERS: int = 4
+    ZIP_MAX_PRODUTOS: int = 2000
+    
+    # Dashboard (/relatorios/dashboard): validade do resultado em cache
+    DASHBOARD_CACHE_SEGUNDOS: float = 10
+    
+    # Previsão de demanda (/relatorios/previsoes): job noturno sobre as saídas
+    PREVISAO_HORA: int = 3  # hora local em que o job é submetido
+    PREVISAO_HISTORICO_DIAS: int = 120
+    PREVISAO_ALFA: float = 0.2  # suavização exponencial (peso do dia mais recente)
+    PREVISAO_LEAD_TIME_DIAS: float = 7  # prazo de entrega do fornecedor
+    PREVISAO_NIVEL_SERVICO_Z: float = 1.65  # ~95% de chance de não faltar no lead time
+    
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:19006"
     
     @property
     def database_url(self) -> str:
         """URL de conexão com o banco de dados"""
+        if self.DB_ENGINE == "sqlite":
+            return f"sqlite:///{self.DB_SQLITE_PATH}"
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
+    @property
+    def replica_urls(self) -> List[str]:
+        """URLs das réplicas de leitura"""
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+    
     @property
     def cors_origins(self) -> List[str]:
         """Lista de origens permitidas para CORS"""
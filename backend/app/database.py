@@ -1,35 +1,247 @@
 """
 Estoque Engenho - Database Connection
 """
-from sqlalchemy import create_engine
+import os
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Callable, Generator
 from app.config import settings
 from app.models import Base
+from app.services.metricas import instrumentar_engine
+from app.services.pool_metricas import QueuePoolInstrumentado, instrumentar
+from app.services.profiler_sql import profiler_sql
+from app.services.replicas import RoteadorLeitura, chave_cliente
 
-# Engine do SQLAlchemy
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,  # Verifica conexão antes de usar
-    pool_recycle=3600,   # Recicla conexões a cada hora
-    echo=settings.API_DEBUG  # Log de queries em modo debug
+SCHEMA_SQLITE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "schema_sqlite.sql"
 )
 
+TABELAS_SQLITE = (
+    "cores", "tipos", "produtos", "movimentacoes",
+    "idempotencia_movimentacoes", "produtos_estoque_faixas", "jobs", "previsoes_reposicao",
+)
+
+# MySQL: a transação foi escolhida como vítima de um deadlock e já foi desfeita
+ER_LOCK_DEADLOCK = 1213
+
+# Vezes que uma transação desfeita por deadlock é executada no total
+TENTATIVAS_DEADLOCK = 3
+
+# Índices que, se faltarem num banco existente, fazem o schema ser reaplicado
+INDICES_SQLITE = (
+    "idx_created_at", "idx_tipo_created_at", "idx_cor_created_at",
+    "idx_produto_data", "idx_tipo_data",
+)
+
+
+def _criar_engine(url: str) -> Engine:
+    """Cria um engine com o pool instrumentado e os ajustes do dialeto"""
+    sqlite = url.startswith("sqlite")
+
+    novo_engine = create_engine(
+        url,
+        # O pysqlite só libera a conexão para a thread que a criou; o pool
+        # entrega cada conexão a uma thread por vez, então a checagem é desligada
+        connect_args={"check_same_thread": False} if sqlite else {},
+        poolclass=QueuePoolInstrumentado,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING == "sempre",  # Verifica conexão em todo checkout
+        echo=settings.DB_ECHO  # Para diagnóstico em produção use o profiler
+    )
+
+    if sqlite:
+        @event.listens_for(novo_engine, "connect")
+        def _configurar_sqlite(dbapi_connection, connection_record):
+            # Desliga o BEGIN implícito do pysqlite: o evento "begin" abaixo
+            # emite o BEGIN, o que faz SAVEPOINT e transações funcionarem direito
+            dbapi_connection.isolation_level = None
+
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")  # leitores não bloqueiam o escritor
+            cursor.execute(f"PRAGMA synchronous={settings.DB_SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={settings.DB_SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute("PRAGMA cache_size=-16000")  # 16 MB por conexão
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA mmap_size=134217728")
+            cursor.close()
+
+        @event.listens_for(novo_engine, "begin")
+        def _begin_sqlite(conn):
+            # Escritas que leem antes de gravar pegam o lock de escrita já no
+            # BEGIN: sem isso, duas transações leem o mesmo estoque e a segunda
+            # falha com SQLITE_BUSY ao tentar gravar
+            if conn.get_execution_options().get("sqlite_begin") == "IMMEDIATE":
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            else:
+                conn.exec_driver_sql("BEGIN")
+
+    # Métricas do pool e pre-ping apenas para conexões ociosas
+    novo_engine.pool_metricas = instrumentar(
+        novo_engine,
+        settings.DB_POOL_PRE_PING,
+        settings.DB_POOL_PING_OCIOSO_SEGUNDOS
+    )
+
+    # Contagem e tempo de SQL por rota (/metrics), repassados ao profiler de
+    # SQL por requisição (Server-Timing e consultas lentas)
+    instrumentar_engine(novo_engine, profiler_sql.observar_consulta)
+
+    return novo_engine
+
+
+# Engine do SQLAlchemy (primário: recebe todas as escritas)
+engine = _criar_engine(settings.database_url)
+pool_metricas = engine.pool_metricas
+
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Réplicas de leitura (DB_REPLICA_URLS); sem réplicas, tudo usa o primário
+engines_replica = [_criar_engine(url) for url in settings.replica_urls]
+sessoes_replica = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica)
+    for replica in engines_replica
+]
+
+roteador_leitura = RoteadorLeitura(settings.DB_LEITURA_PRIMARIO_SEGUNDOS)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _registrar_escrita(session):
+    registrar_escrita_cliente(session)
+
+
+def registrar_escrita_cliente(db: Session) -> None:
+    """
+    Leituras do cliente da sessão vão ao primário durante a janela seguinte
+
+    Chamada automaticamente no commit; chame diretamente quando a escrita
+    foi confirmada por outra sessão (ex.: group commit).
+    """
+    cliente = db.info.get("cliente")
+    if cliente:
+        roteador_leitura.registrar_escrita(cliente)
+
+
+def nova_sessao(**opcoes) -> Session:
+    """
+    Abre uma sessão no primário fora de uma requisição (tarefas, jobs)
+
+    `SessionLocal` é resolvida a cada chamada, não na importação de quem
+    usa: testes e benchmarks (`carga.py --banco`) trocam a fábrica em
+    `app.database` e todas as sessões da aplicação passam a usar o banco novo.
+    """
+    return SessionLocal(**opcoes)
+
 
-def get_db() -> Generator[Session, None, None]:
+def get_db(request: Request) -> Generator[Session, None, None]:
     """
-    Dependency para obter sessão do banco de dados
+    Dependency para obter sessão do banco de dados (primário)
     """
     db = SessionLocal()
+    if engines_replica:
+        db.info["cliente"] = chave_cliente(request)
     try:
         yield db
     finally:
         db.close()
 
 
+def sessao_leitura(*tabelas: str) -> Callable[[Request], Generator[Session, None, None]]:
+    """
+    Cria uma dependency de sessão para rotas somente leitura
+
+    A sessão vem de uma réplica (em rodízio), exceto quando:
+    - o cliente (X-Cliente-Id ou IP) gravou algo há menos de
+      DB_LEITURA_PRIMARIO_SEGUNDOS (lê as próprias escritas);
+    - alguma das `tabelas` mudou nessa janela: rotas com ETag não podem
+      devolver dados atrasados da réplica sob a versão nova.
+
+    Args:
+        tabelas: Tabelas cujas versões a rota usa no ETag
+    """
+
+    def dependencia(request: Request) -> Generator[Session, None, None]:
+        if not sessoes_replica or roteador_leitura.usar_primario(chave_cliente(request), *tabelas):
+            fabrica = SessionLocal
+        else:
+            fabrica = roteador_leitura.escolher(sessoes_replica)
+
+        db = fabrica()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return dependencia
+
+
+# Leituras sem ETag: réplica, salvo escrita recente do próprio cliente
+get_db_leitura = sessao_leitura()
+
+
+def iniciar_escrita(db: Session) -> None:
+    """
+    Marca a transação da sessão como de escrita
+
+    Deve ser chamada antes da primeira consulta de uma operação que lê e
+    depois grava (ex.: movimentação de estoque). No SQLite a transação
+    começa com BEGIN IMMEDIATE; nos demais bancos não muda nada.
+    """
+    db.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+
+
+def deadlock(erro: BaseException) -> bool:
+    """
+    Indica se o erro é um deadlock do InnoDB
+
+    O banco já desfez a transação inteira: depois do rollback da sessão,
+    ela pode ser executada de novo desde o início.
+    """
+    orig = getattr(erro, "orig", None)
+    return (
+        isinstance(erro, OperationalError)
+        and bool(getattr(orig, "args", None))
+        and orig.args[0] == ER_LOCK_DEADLOCK
+    )
+
+
+def preparar_banco():
+    """
+    Cria o schema do SQLite se o arquivo ainda não tiver todas as tabelas e índices
+
+    No MySQL o schema é aplicado fora da aplicação (database/schema.sql e
+    database/migrations).
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    # O script é idempotente: roda de novo quando uma versão nova traz tabelas
+    # ou índices
+    with engine.connect() as conexao:
+        indices = set(conexao.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        ).scalars())
+    if set(TABELAS_SQLITE) <= set(inspect(engine).get_table_names()) and set(INDICES_SQLITE) <= indices:
+        return
+
+    with open(SCHEMA_SQLITE, encoding="utf-8") as arquivo:
+        script = arquivo.read()
+
+    conexao = engine.raw_connection()
+    try:
+        conexao.driver_connection.executescript(script)
+    finally:
+        conexao.close()
+    print(f"✅ Schema SQLite aplicado em {settings.DB_SQLITE_PATH}")
+
+
 def init_db():
     """
     Inicializa o banco de dados criando todas as tabelas
@@ -1,34 +1,37 @@
 """
 Estoque Engenho - Rotas de Cores
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List
-from app.database import get_db
+from app.database import get_db, iniciar_escrita
 from app.models import Cor
 from app.schemas import CorCreate, CorUpdate, CorResponse
+from app.services.catalogo_cache import catalogo_cache
+from app.services.versoes import versoes_tabelas
 
 router = APIRouter(prefix="/cores", tags=["Cores"])
 
 
 @router.get("/", response_model=List[CorResponse])
 def listar_cores(
+    request: Request,
+    response: Response,
     ativo: bool = None,
     db: Session = Depends(get_db)
 ):
     """Lista todas as cores"""
-    query = db.query(Cor)
+    nao_modificado = versoes_tabelas.verificar(request, response, "cores")
+    if nao_modificado:
+        return nao_modificado
     
-    if ativo is not None:
-        query = query.filter(Cor.ativo == ativo)
-    
-    return query.all()
+    return catalogo_cache.listar_cores(db, ativo)
 
 
 @router.get("/{cor_id}", response_model=CorResponse)
 def obter_cor(cor_id: int, db: Session = Depends(get_db)):
     """Obtém uma cor específica"""
-    cor = db.query(Cor).filter(Cor.id == cor_id).first()
+    cor = catalogo_cache.obter_cor(db, cor_id)
     
     if not cor:
         raise HTTPException(
@@ -42,6 +45,7 @@ def obter_cor(cor_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=CorResponse, status_code=status.HTTP_201_CREATED)
 def criar_cor(cor_data: CorCreate, db: Session = Depends(get_db)):
     """Cria uma nova cor"""
+    iniciar_escrita(db)
     
     # Verifica se o código já existe
     cor_existente = db.query(Cor).filter(Cor.codigo == cor_data.codigo).first()
@@ -54,7 +58,9 @@ def criar_cor(cor_data: CorCreate, db: Session = Depends(get_db)):
     nova_cor = Cor(**cor_data.model_dump())
     db.add(nova_cor)
     db.commit()
+    versoes_tabelas.incrementar("cores")
     db.refresh(nova_cor)
+    catalogo_cache.registrar_cor(nova_cor)
     
     return nova_cor
 
@@ -66,6 +72,7 @@ def atualizar_cor(
     db: Session = Depends(get_db)
 ):
     """Atualiza uma cor"""
+    iniciar_escrita(db)
     cor = db.query(Cor).filter(Cor.id == cor_id).first()
     
     if not cor:
@@ -89,7 +96,9 @@ def atualizar_cor(
         setattr(cor, field, value)
     
     db.commit()
+    versoes_tabelas.incrementar("cores")
     db.refresh(cor)
+    catalogo_cache.registrar_cor(cor)
     
     return cor
 
@@ -97,6 +106,7 @@ def atualizar_cor(
 @router.delete("/{cor_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_cor(cor_id: int, db: Session = Depends(get_db)):
     """Desativa uma cor (soft delete)"""
+    iniciar_escrita(db)
     cor = db.query(Cor).filter(Cor.id == cor_id).first()
     
     if not cor:
@@ -107,5 +117,7 @@ def deletar_cor(cor_id: int, db: Session = Depends(get_db)):
     
     cor.ativo = False
     db.commit()
+    versoes_tabelas.incrementar("cores")
+    catalogo_cache.registrar_cor(cor)
     
     return None
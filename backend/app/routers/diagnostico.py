@@ -0,0 +1,45 @@
+"""
+Estoque Engenho - Rotas de Diagnóstico
+"""
+from fastapi import APIRouter
+from app.database import engine, engines_replica, pool_metricas
+from app.schemas import ProfilerConfig, ProfilerConfigUpdate
+from app.services.profiler_sql import profiler_sql
+
+router = APIRouter(prefix="/diagnostico", tags=["Diagnóstico"])
+
+
+@router.get("/pool")
+def metricas_pool():
+    """
+    Estado do pool de conexões: conexões em uso, overflow, invalidações e
+    histograma (acumulado, em segundos) do tempo de espera por conexão
+
+    O resumo é o do primário; `replicas` traz o de cada réplica de leitura
+    configurada em DB_REPLICA_URLS.
+    """
+    resumo = pool_metricas.resumo(engine.pool)
+    resumo["replicas"] = [
+        replica.pool_metricas.resumo(replica.pool) for replica in engines_replica
+    ]
+    return resumo
+
+
+@router.get("/profiler", response_model=ProfilerConfig)
+def obter_profiler():
+    """Configuração atual do profiler de SQL"""
+    return profiler_sql.configuracao()
+
+
+@router.put("/profiler", response_model=ProfilerConfig)
+def configurar_profiler(config: ProfilerConfigUpdate):
+    """
+    Liga/desliga o profiler de SQL em tempo de execução
+
+    Com o profiler ativo, as respostas trazem o cabeçalho Server-Timing e as
+    consultas acima de `limite_lento_ms` são registradas (amostradas) no log
+    `estoque_engenho.slow_query` com rota e EXPLAIN. Vale para todos os
+    workers.
+    """
+    profiler_sql.configurar(**config.model_dump(exclude_unset=True))
+    return profiler_sql.configuracao()
@@ -0,0 +1,69 @@
+"""
+Estoque Engenho - Rotas de Eventos (Server-Sent Events)
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.services.eventos import eventos_service, FiltroEventos
+
+router = APIRouter(prefix="/eventos", tags=["Eventos"])
+
+
+@router.get("/stream")
+async def stream_eventos(
+    request: Request,
+    produto_id: Optional[int] = None,
+    tipo_id: Optional[int] = None,
+    apenas_baixo_estoque: bool = False,
+    buffer: Optional[int] = Query(None, ge=1, le=10000)
+):
+    """
+    Stream de eventos de estoque (text/event-stream)
+
+    Publica um evento compacto para cada movimentação confirmada e cada
+    produto criado, alterado ou desativado. Se o buffer do cliente
+    transbordar, é enviado um evento `perdidos`: o cliente deve então
+    ressincronizar via GET /sync.
+    """
+    filtro = FiltroEventos(
+        produto_id=produto_id,
+        tipo_id=tipo_id,
+        apenas_baixo_estoque=apenas_baixo_estoque
+    )
+    assinante = eventos_service.assinar(filtro, buffer or settings.EVENTOS_BUFFER)
+
+    async def gerar():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        assinante.sinal.wait(),
+                        timeout=settings.EVENTOS_HEARTBEAT_SEGUNDOS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentário SSE mantém a conexão viva em proxies
+                    yield ": ping\n\n"
+                    continue
+
+                eventos, perdidos = assinante.retirar()
+                if perdidos:
+                    yield f"event: perdidos\ndata: {perdidos}\n\n"
+                for sequencia, dados in eventos:
+                    yield f"id: {sequencia}\ndata: {dados}\n\n"
+        finally:
+            eventos_service.cancelar(assinante)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
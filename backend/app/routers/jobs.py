@@ -0,0 +1,185 @@
+"""
+Estoque Engenho - Rotas de Jobs (exportações e lotes de etiquetas)
+"""
+import csv
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session, joinedload
+
+from app.config import settings
+from app.database import get_db, iniciar_escrita
+from app.models import Produto
+from app.schemas import ExportacaoProdutosJob, JobResponse
+from app.services.barcode_service import barcode_service
+from app.services.etiquetas_store import armazem_etiquetas, dados_etiqueta
+from app.services.jobs import CONCLUIDO, EXPIRADO, Job, fila_jobs
+from app.services.metricas import pdf_bytes, pdf_etiquetas
+from app.services.previsao import TIPO_JOB as TIPO_PREVISAO, previsao_service
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Produtos lidos por vez na exportação CSV
+LOTE_EXPORTACAO = 500
+
+
+# ============= EXECUTORES =============
+
+def _executar_etiquetas_pdf(db: Session, parametros: dict, progresso):
+    """PDF de etiquetas de muitos produtos (mesmo layout de POST /produtos/etiquetas-pdf)"""
+    produtos = (
+        db.query(Produto)
+        .options(joinedload(Produto.tipo), joinedload(Produto.cor))
+        .filter(Produto.id.in_(parametros["produto_ids"]))
+        .all()
+    )
+    if not produtos:
+        raise ValueError("Nenhum produto encontrado")
+
+    conteudo_pdf = barcode_service.gerar_pdf_etiquetas(
+        [dados_etiqueta(produto) for produto in produtos], progresso, imagem=armazem_etiquetas.obter
+    )
+
+    pdf_bytes.observar(len(conteudo_pdf))
+    pdf_etiquetas.observar(len(produtos))
+    return conteudo_pdf, f"etiquetas_{len(produtos)}_produtos.pdf", "application/pdf"
+
+
+def _executar_produtos_csv(db: Session, parametros: dict, progresso):
+    """Exportação do catálogo de produtos em CSV (separador ";", como o Excel em pt-BR)"""
+    query = db.query(Produto).options(joinedload(Produto.tipo), joinedload(Produto.cor))
+    if parametros.get("ativo") is not None:
+        query = query.filter(Produto.ativo == parametros["ativo"])
+    if parametros.get("tipo_id"):
+        query = query.filter(Produto.tipo_id == parametros["tipo_id"])
+    if parametros.get("cor_id"):
+        query = query.filter(Produto.cor_id == parametros["cor_id"])
+
+    total = query.count()
+    # O CSV vai direto para um arquivo em JOBS_DIR: a memória não cresce com o catálogo
+    caminho = fila_jobs.arquivo_temporario()
+    try:
+        # BOM (utf-8-sig): o Excel reconhece o UTF-8 e mostra os acentos
+        with open(caminho, "w", encoding="utf-8-sig", newline="") as saida:
+            escritor = csv.writer(saida, delimiter=";")
+            escritor.writerow([
+                "id", "codigo_produto", "codigo_barras", "nome", "tipo", "cor",
+                "estoque_atual", "estoque_minimo", "preco_custo", "preco_venda", "ativo"
+            ])
+
+            # Paginação por id: só um lote de produtos carregado por vez
+            ultimo_id = 0
+            exportados = 0
+            while True:
+                lote = query.filter(Produto.id > ultimo_id).order_by(Produto.id).limit(LOTE_EXPORTACAO).all()
+                if not lote:
+                    break
+                for produto in lote:
+                    escritor.writerow([
+                        produto.id, produto.codigo_produto, produto.codigo_barras, produto.nome,
+                        produto.tipo.nome, produto.cor.nome, produto.estoque_atual,
+                        produto.estoque_minimo, produto.preco_custo, produto.preco_venda,
+                        int(produto.ativo)
+                    ])
+                ultimo_id = lote[-1].id
+                exportados += len(lote)
+                db.expunge_all()
+                progresso(exportados, total)
+    except BaseException:
+        os.remove(caminho)
+        raise
+
+    nome_arquivo = f"produtos_{datetime.now():%Y%m%d_%H%M%S}.csv"
+    return caminho, nome_arquivo, "text/csv; charset=utf-8"
+
+
+fila_jobs.registrar("etiquetas_pdf", _executar_etiquetas_pdf)
+fila_jobs.registrar("produtos_csv", _executar_produtos_csv)
+fila_jobs.registrar(TIPO_PREVISAO, previsao_service.executar_job)
+
+
+# ============= ROTAS =============
+
+def _resposta(job: Job) -> JobResponse:
+    resposta = JobResponse.model_validate(job)
+    if job.status == CONCLUIDO:
+        resposta.url_resultado = f"{router.prefix}/{job.id}/resultado"
+    return resposta
+
+
+def _submeter(db: Session, tipo: str, parametros: dict) -> JobResponse:
+    iniciar_escrita(db)
+    # Fila cheia: o cliente tenta de novo depois em vez de acumular trabalho
+    if fila_jobs.pendentes(db) >= settings.JOBS_MAX_PENDENTES:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de jobs cheia, tente novamente em instantes",
+            headers={"Retry-After": str(int(settings.JOBS_VARREDURA_SEGUNDOS))}
+        )
+    return _resposta(fila_jobs.submeter(db, tipo, parametros))
+
+
+@router.post("/etiquetas-pdf", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submeter_etiquetas_pdf(produto_ids: list[int], db: Session = Depends(get_db)):
+    """Gera o PDF de etiquetas em segundo plano (lotes grandes)"""
+    if not produto_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe ao menos um produto"
+        )
+    return _submeter(db, "etiquetas_pdf", {"produto_ids": produto_ids})
+
+
+@router.post("/produtos-csv", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submeter_produtos_csv(filtros: ExportacaoProdutosJob, db: Session = Depends(get_db)):
+    """Exporta o catálogo de produtos em CSV em segundo plano"""
+    return _submeter(db, "produtos_csv", filtros.model_dump())
+
+
+@router.post("/previsao-reposicao", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submeter_previsao_reposicao(db: Session = Depends(get_db)):
+    """
+    Recalcula agora a previsão de demanda (normalmente roda toda noite)
+
+    O resultado é lido em GET /relatorios/previsoes; o arquivo do job é só
+    um resumo em JSON.
+    """
+    return _submeter(db, TIPO_PREVISAO, {})
+
+
+def _obter_job(db: Session, job_id: str) -> Job:
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado"
+        )
+    return job
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def obter_job(job_id: str, db: Session = Depends(get_db)):
+    """Estado e progresso (0 a 100) do job"""
+    return _resposta(_obter_job(db, job_id))
+
+
+@router.get("/{job_id}/resultado")
+def baixar_resultado(job_id: str, db: Session = Depends(get_db)):
+    """Arquivo gerado pelo job"""
+    job = _obter_job(db, job_id)
+    caminho = fila_jobs.caminho_resultado(job.id)
+
+    if job.status == EXPIRADO or (job.status == CONCLUIDO and not os.path.exists(caminho)):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Resultado expirado, submeta o job novamente"
+        )
+    if job.status != CONCLUIDO:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job ainda não concluído (status: {job.status})"
+        )
+
+    return FileResponse(caminho, media_type=job.media_type, filename=job.nome_arquivo)
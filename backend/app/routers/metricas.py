@@ -0,0 +1,68 @@
+"""
+Estoque Engenho - Rota de Métricas (Prometheus)
+"""
+from typing import List, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.engine import Engine
+from app.database import engine, engines_replica
+from app.services.metricas import registro
+
+router = APIRouter(tags=["Métricas"])
+
+
+def _engines() -> List[Tuple[str, Engine]]:
+    """Primário e réplicas de leitura, com o rótulo usado nas métricas"""
+    return [("primario", engine)] + [
+        (f"replica_{i}", replica) for i, replica in enumerate(engines_replica, 1)
+    ]
+
+
+def _coletar_pool() -> List[str]:
+    """Estado dos pools de conexões no formato Prometheus (um rótulo por engine)"""
+    resumos = [
+        (nome, alvo.pool_metricas.resumo(alvo.pool)) for nome, alvo in _engines()
+    ]
+    metricas_simples = [
+        ("db_pool_checked_out", "gauge", "em_uso"),
+        ("db_pool_overflow", "gauge", "overflow"),
+        ("db_pool_checkouts_total", "counter", "checkouts"),
+        ("db_pool_invalidations_total", "counter", "invalidacoes"),
+        ("db_pool_timeouts_total", "counter", "timeouts"),
+    ]
+
+    linhas = []
+    for metrica, tipo, campo in metricas_simples:
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        for nome, resumo in resumos:
+            linhas.append(f'{metrica}{{engine="{nome}"}} {resumo[campo]}')
+
+    linhas.append("# TYPE db_pool_wait_seconds histogram")
+    for nome, resumo in resumos:
+        for limite, acumulado in resumo["espera"]["histograma"].items():
+            linhas.append(
+                f'db_pool_wait_seconds_bucket{{engine="{nome}",le="{limite}"}} {acumulado}'
+            )
+        linhas.append(
+            f'db_pool_wait_seconds_sum{{engine="{nome}"}} {resumo["espera"]["total_segundos"]}'
+        )
+        # _count é o bucket +Inf: as mesmas esperas do histograma. O contador de
+        # checkouts diverge (timeouts não chegam a um checkout; um ping que
+        # falha dispara o checkout de novo)
+        linhas.append(
+            f'db_pool_wait_seconds_count{{engine="{nome}"}} {resumo["espera"]["histograma"]["+Inf"]}'
+        )
+    return linhas
+
+
+registro.registrar_coletor(_coletar_pool)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metricas():
+    """Métricas no formato de exposição de texto do Prometheus"""
+    return PlainTextResponse(
+        registro.renderizar(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,22 +1,40 @@
 """
 Estoque Engenho - Rotas de Movimentações
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy.exc import IntegrityError, OperationalError
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from app.database import get_db
+from app.config import settings
+from app.database import (
+    TENTATIVAS_DEADLOCK, deadlock, get_db, get_db_leitura, iniciar_escrita,
+    registrar_escrita_cliente
+)
 from app.models import Movimentacao, Produto, TipoMovimento
 from app.schemas import (
     MovimentacaoCreate, MovimentacaoResponse,
-    MovimentacaoComProduto
+    MovimentacaoComProduto, MovimentacoesNormalizadas,
+    ProdutoResumo, TipoResponse, CorResponse
 )
+from app.services.catalogo_cache import catalogo_cache
+from app.services.estoque_faixas import estoque_faixas_service
+from app.services.eventos import eventos_service
+from app.services.gravacao_grupo import gravacao_em_grupo
+from app.services.idempotencia import idempotencia_service
+from app.services.versoes import versoes_tabelas
 
 router = APIRouter(prefix="/movimentacoes", tags=["Movimentações"])
 
+# formato=normalizado: produtos, tipos e cores em listas à parte, sem repetição
+FORMATO_LISTAGEM = Query("completo", regex="^(completo|normalizado)$")
+RESPOSTA_NORMALIZADA = {
+    200: {"description": "Com formato=normalizado", "model": MovimentacoesNormalizadas}
+}
+
 
-@router.get("/", response_model=List[MovimentacaoComProduto])
+@router.get("/", response_model=List[MovimentacaoComProduto], responses=RESPOSTA_NORMALIZADA)
 def listar_movimentacoes(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
@@ -24,7 +42,8 @@ def listar_movimentacoes(
     tipo_movimento: Optional[str] = None,
     data_inicio: Optional[datetime] = None,
     data_fim: Optional[datetime] = None,
-    db: Session = Depends(get_db)
+    formato: str = FORMATO_LISTAGEM,
+    db: Session = Depends(get_db_leitura)
 ):
     """Lista movimentações com filtros e paginação"""
     query = db.query(Movimentacao)
@@ -47,13 +66,16 @@ def listar_movimentacoes(
         desc(Movimentacao.data_movimento)
     ).offset(skip).limit(limit).all()
     
+    if formato == "normalizado":
+        return _normalizadas(db, movimentacoes)
     return movimentacoes
 
 
-@router.get("/recentes", response_model=List[MovimentacaoComProduto])
+@router.get("/recentes", response_model=List[MovimentacaoComProduto], responses=RESPOSTA_NORMALIZADA)
 def listar_movimentacoes_recentes(
     horas: int = Query(24, ge=1, le=720),
-    db: Session = Depends(get_db)
+    formato: str = FORMATO_LISTAGEM,
+    db: Session = Depends(get_db_leitura)
 ):
     """Lista movimentações das últimas N horas"""
     data_limite = datetime.now() - timedelta(hours=horas)
@@ -62,11 +84,38 @@ def listar_movimentacoes_recentes(
         Movimentacao.data_movimento >= data_limite
     ).order_by(desc(Movimentacao.data_movimento)).all()
     
+    if formato == "normalizado":
+        return _normalizadas(db, movimentacoes)
     return movimentacoes
 
 
+def _normalizadas(db: Session, movimentacoes: List[Movimentacao]) -> Response:
+    """
+    Resposta com cada produto, tipo e cor uma única vez
+
+    Os produtos vêm de uma consulta só e tipos/cores do cache em memória.
+    O JSON é gerado direto pelo pydantic: a resposta não passa pela
+    validação do response_model da rota, feita para o formato completo.
+    """
+    produto_ids = {mov.produto_id for mov in movimentacoes}
+    produtos = (
+        db.query(Produto).filter(Produto.id.in_(produto_ids)).order_by(Produto.id).all()
+        if produto_ids else []
+    )
+    tipos = {produto.tipo_id: catalogo_cache.obter_tipo(db, produto.tipo_id) for produto in produtos}
+    cores = {produto.cor_id: catalogo_cache.obter_cor(db, produto.cor_id) for produto in produtos}
+    
+    resposta = MovimentacoesNormalizadas(
+        movimentacoes=[MovimentacaoResponse.model_validate(mov) for mov in movimentacoes],
+        produtos=[ProdutoResumo.model_validate(produto) for produto in produtos],
+        tipos=[TipoResponse.model_validate(tipos[i]) for i in sorted(tipos) if tipos[i]],
+        cores=[CorResponse.model_validate(cores[i]) for i in sorted(cores) if cores[i]]
+    )
+    return Response(content=resposta.model_dump_json(), media_type="application/json")
+
+
 @router.get("/{movimentacao_id}", response_model=MovimentacaoResponse)
-def obter_movimentacao(movimentacao_id: int, db: Session = Depends(get_db)):
+def obter_movimentacao(movimentacao_id: int, db: Session = Depends(get_db_leitura)):
     """Obtém uma movimentação específica"""
     movimentacao = db.query(Movimentacao).filter(
         Movimentacao.id == movimentacao_id
@@ -82,43 +131,176 @@ def obter_movimentacao(movimentacao_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/entrada", response_model=MovimentacaoResponse, status_code=status.HTTP_201_CREATED)
-def dar_entrada(movimentacao_data: MovimentacaoCreate, db: Session = Depends(get_db)):
+def dar_entrada(
+    movimentacao_data: MovimentacaoCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: Session = Depends(get_db)
+):
     """Registra entrada de estoque"""
     return _processar_movimentacao(
         movimentacao_data,
         TipoMovimento.ENTRADA,
-        db
+        db,
+        idempotency_key
     )
 
 
 @router.post("/saida", response_model=MovimentacaoResponse, status_code=status.HTTP_201_CREATED)
-def dar_saida(movimentacao_data: MovimentacaoCreate, db: Session = Depends(get_db)):
+def dar_saida(
+    movimentacao_data: MovimentacaoCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: Session = Depends(get_db)
+):
     """Registra saída de estoque"""
     return _processar_movimentacao(
         movimentacao_data,
         TipoMovimento.SAIDA,
-        db
+        db,
+        idempotency_key
     )
 
 
 @router.post("/ajuste", response_model=MovimentacaoResponse, status_code=status.HTTP_201_CREATED)
-def ajustar_estoque(movimentacao_data: MovimentacaoCreate, db: Session = Depends(get_db)):
+def ajustar_estoque(
+    movimentacao_data: MovimentacaoCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: Session = Depends(get_db)
+):
     """Registra ajuste de estoque"""
     return _processar_movimentacao(
         movimentacao_data,
         TipoMovimento.AJUSTE,
-        db
+        db,
+        idempotency_key
     )
 
 
 def _processar_movimentacao(
     movimentacao_data: MovimentacaoCreate,
     tipo_movimento: TipoMovimento,
-    db: Session
+    db: Session,
+    chave_idempotencia: Optional[str] = None
 ) -> Movimentacao:
     """
     Processa uma movimentação de estoque
+
+    Com `chave_idempotencia`, uma chave já utilizada devolve a movimentação
+    original sem aplicá-la de novo. Com DB_GROUP_COMMIT a movimentação é
+    gravada no próximo lote da gravação em grupo, em vez de na sessão `db`.
+    """
+    assinatura = None
+    if chave_idempotencia:
+        assinatura = idempotencia_service.assinatura(
+            tipo_movimento.name,
+            movimentacao_data.codigo_barras,
+            movimentacao_data.quantidade
+        )
+    
+    try:
+        if settings.DB_GROUP_COMMIT:
+            movimentacao, evento = _gravar_em_grupo(
+                movimentacao_data, tipo_movimento, chave_idempotencia, assinatura
+            )
+            registrar_escrita_cliente(db)
+        else:
+            movimentacao, evento = _gravar(
+                db, movimentacao_data, tipo_movimento, chave_idempotencia, assinatura
+            )
+    except IntegrityError:
+        # Outra requisição com a mesma chave confirmou primeiro
+        if not chave_idempotencia:
+            raise
+        original = _movimentacao_idempotente(db, chave_idempotencia, assinatura)
+        if original:
+            return original
+        raise
+    
+    if evento is None:
+        # Chave já utilizada: movimentação original
+        return movimentacao
+    
+    if chave_idempotencia:
+        idempotencia_service.memorizar(chave_idempotencia, assinatura, movimentacao.id)
+    versoes_tabelas.incrementar("produtos", "movimentacoes")
+    eventos_service.publicar(evento)
+    
+    return movimentacao
+
+
+def _gravar(
+    db: Session,
+    movimentacao_data: MovimentacaoCreate,
+    tipo_movimento: TipoMovimento,
+    chave_idempotencia: Optional[str],
+    assinatura: Optional[str]
+) -> Tuple[Movimentacao, Optional[Dict]]:
     """
+    Aplica a movimentação em uma transação própria
+
+    Uma transação desfeita por deadlock (MySQL) é repetida do início.
+    """
+    for tentativa in range(1, TENTATIVAS_DEADLOCK + 1):
+        try:
+            iniciar_escrita(db)
+            movimentacao, evento = _aplicar_movimentacao(
+                db, movimentacao_data, tipo_movimento, chave_idempotencia, assinatura
+            )
+            if evento is None:
+                return movimentacao, None
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            raise
+        except OperationalError as e:
+            db.rollback()
+            if tentativa == TENTATIVAS_DEADLOCK or not deadlock(e):
+                raise
+    
+    db.refresh(movimentacao)
+    return movimentacao, evento
+
+
+def _gravar_em_grupo(
+    movimentacao_data: MovimentacaoCreate,
+    tipo_movimento: TipoMovimento,
+    chave_idempotencia: Optional[str],
+    assinatura: Optional[str]
+) -> Tuple[Movimentacao, Optional[Dict]]:
+    """Aplica a movimentação no lote da gravação em grupo e aguarda o commit"""
+    
+    def operacao(sessao: Session):
+        movimentacao, evento = _aplicar_movimentacao(
+            sessao, movimentacao_data, tipo_movimento, chave_idempotencia, assinatura
+        )
+        if evento is not None:
+            # Carrega os valores gerados pelo banco antes de a sessão do lote fechar
+            sessao.flush()
+            sessao.refresh(movimentacao)
+        return movimentacao, evento
+    
+    return gravacao_em_grupo.executar(operacao)
+
+
+def _aplicar_movimentacao(
+    db: Session,
+    movimentacao_data: MovimentacaoCreate,
+    tipo_movimento: TipoMovimento,
+    chave_idempotencia: Optional[str],
+    assinatura: Optional[str]
+) -> Tuple[Movimentacao, Optional[Dict]]:
+    """
+    Valida e aplica a movimentação na sessão, sem commit
+    
+    Returns:
+        A movimentação e o evento a publicar após o commit; o evento é None
+        quando a chave de idempotência já foi usada (movimentação original)
+    """
+    if chave_idempotencia:
+        original = _movimentacao_idempotente(db, chave_idempotencia, assinatura)
+        if original:
+            return original, None
+    
     # Busca produto pelo código de barras
     produto = db.query(Produto).filter(
         Produto.codigo_barras == movimentacao_data.codigo_barras
@@ -136,12 +318,21 @@ def _processar_movimentacao(
             detail="Produto está inativo"
         )
     
-    # Calcula novo estoque
-    estoque_anterior = produto.estoque_atual
+    # Produto distribuído em faixas: a movimentação altera só uma faixa
+    estoques = None
+    if settings.DB_ESTOQUE_FAIXAS:
+        estoques = estoque_faixas_service.movimentar(
+            db, produto, tipo_movimento, movimentacao_data.quantidade
+        )
     
-    if tipo_movimento == TipoMovimento.ENTRADA:
+    # Calcula novo estoque
+    if estoques:
+        estoque_anterior, novo_estoque = estoques
+    elif tipo_movimento == TipoMovimento.ENTRADA:
+        estoque_anterior = produto.estoque_atual
         novo_estoque = estoque_anterior + movimentacao_data.quantidade
     elif tipo_movimento == TipoMovimento.SAIDA:
+        estoque_anterior = produto.estoque_atual
         novo_estoque = estoque_anterior - movimentacao_data.quantidade
         if novo_estoque < 0:
             raise HTTPException(
@@ -150,6 +341,7 @@ def _processar_movimentacao(
             )
     else:  # AJUSTE
         # Para ajuste, a quantidade é o valor absoluto desejado
+        estoque_anterior = produto.estoque_atual
         novo_estoque = movimentacao_data.quantidade
     
     # Cria movimentação
@@ -163,21 +355,48 @@ def _processar_movimentacao(
         usuario=movimentacao_data.usuario or "App"
     )
     
-    # Atualiza estoque do produto
-    produto.estoque_atual = novo_estoque
+    # Atualiza estoque do produto (distribuído: atualizado na consolidação)
+    if not estoques:
+        produto.estoque_atual = novo_estoque
     
     db.add(movimentacao)
-    db.commit()
-    db.refresh(movimentacao)
+    evento = eventos_service.evento_movimentacao(movimentacao, produto)
     
-    return movimentacao
+    if chave_idempotencia:
+        db.flush()  # Para obter o ID antes do commit
+        idempotencia_service.limpar_expiradas(db)
+        idempotencia_service.registrar(
+            db, chave_idempotencia, assinatura, movimentacao.id
+        )
+    
+    return movimentacao, evento
+
+
+def _movimentacao_idempotente(
+    db: Session,
+    chave_idempotencia: str,
+    assinatura: str
+) -> Optional[Movimentacao]:
+    """Retorna a movimentação já registrada para a chave, se houver"""
+    registrado = idempotencia_service.buscar(db, chave_idempotencia)
+    if not registrado:
+        return None
+    
+    assinatura_original, movimentacao_id = registrado
+    if assinatura_original != assinatura:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key já utilizada em outra movimentação"
+        )
+    
+    return db.get(Movimentacao, movimentacao_id)
 
 
 @router.get("/produto/{produto_id}/historico", response_model=List[MovimentacaoResponse])
 def listar_historico_produto(
     produto_id: int,
     limit: int = Query(50, ge=1, le=500),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
     """Lista histórico de movimentações de um produto específico"""
     
@@ -1,32 +1,55 @@
 """
 Estoque Engenho - Rotas de Produtos
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+import base64
+from functools import partial
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc, or_
 from typing import List, Optional
-from app.database import get_db
-from app.models import Produto, Tipo, Cor, Movimentacao, TipoMovimento
+from app.config import settings
+from app.database import get_db, get_db_leitura, iniciar_escrita, sessao_leitura
+from app.models import Produto, Movimentacao, TipoMovimento
 from app.schemas import (
     ProdutoCreate, ProdutoUpdate, ProdutoResponse,
-    ProdutoListResponse, BarcodeResponse
+    ProdutoListResponse, BarcodeResponse, ImagensZipRequest
 )
 from app.services.barcode_service import barcode_service
+from app.services.catalogo_cache import catalogo_cache
+from app.services.estoque_faixas import estoque_faixas_service
+from app.services.etiquetas_store import armazem_etiquetas, dados_etiqueta
+from app.services.eventos import eventos_service
+from app.services.imagens_zip import pacote_imagens
+from app.services.metricas import pdf_bytes, pdf_etiquetas
+from app.services.versoes import versoes_tabelas
 
 router = APIRouter(prefix="/produtos", tags=["Produtos"])
 
+# Listagens com ETag: primário enquanto produtos/tipos/cores mudaram há pouco
+get_db_catalogo = sessao_leitura("produtos", "tipos", "cores")
+
 
 @router.get("/", response_model=List[ProdutoResponse])
 def listar_produtos(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     ativo: Optional[bool] = None,
     tipo_id: Optional[int] = None,
     cor_id: Optional[int] = None,
     busca: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_catalogo)
 ):
     """Lista produtos com filtros e paginação"""
+    nao_modificado = versoes_tabelas.verificar(
+        request, response, "produtos", "tipos", "cores"
+    )
+    if nao_modificado:
+        return nao_modificado
+    
     query = db.query(Produto)
     
     # Filtros
@@ -40,10 +63,12 @@ def listar_produtos(
         query = query.filter(Produto.cor_id == cor_id)
     
     if busca:
+        # LIKE já ignora maiúsculas no MySQL (collation *_ci) e no SQLite
+        # (ASCII); ilike envolveria as colunas em lower()
         query = query.filter(
             or_(
-                Produto.nome.ilike(f"%{busca}%"),
-                Produto.codigo_barras.ilike(f"%{busca}%")
+                Produto.nome.like(f"%{busca}%"),
+                Produto.codigo_barras.like(f"%{busca}%")
             )
         )
     
@@ -54,8 +79,18 @@ def listar_produtos(
 
 
 @router.get("/baixo-estoque", response_model=List[ProdutoResponse])
-def listar_produtos_baixo_estoque(db: Session = Depends(get_db)):
+def listar_produtos_baixo_estoque(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db_catalogo)
+):
     """Lista produtos com estoque abaixo do mínimo"""
+    nao_modificado = versoes_tabelas.verificar(
+        request, response, "produtos", "tipos", "cores"
+    )
+    if nao_modificado:
+        return nao_modificado
+    
     produtos = db.query(Produto).filter(
         Produto.estoque_atual <= Produto.estoque_minimo,
         Produto.ativo == True
@@ -65,7 +100,7 @@ def listar_produtos_baixo_estoque(db: Session = Depends(get_db)):
 
 
 @router.get("/codigo-barras/{codigo_barras}", response_model=ProdutoResponse)
-def buscar_por_codigo_barras(codigo_barras: str, db: Session = Depends(get_db)):
+def buscar_por_codigo_barras(codigo_barras: str, db: Session = Depends(get_db_leitura)):
     """Busca produto pelo código de barras"""
     produto = db.query(Produto).filter(
         Produto.codigo_barras == codigo_barras
@@ -77,11 +112,11 @@ def buscar_por_codigo_barras(codigo_barras: str, db: Session = Depends(get_db)):
             detail="Produto não encontrado"
         )
     
-    return produto
+    return _com_estoque_real(db, produto)
 
 
 @router.get("/{produto_id}", response_model=ProdutoResponse)
-def obter_produto(produto_id: int, db: Session = Depends(get_db)):
+def obter_produto(produto_id: int, db: Session = Depends(get_db_leitura)):
     """Obtém um produto específico"""
     produto = db.query(Produto).filter(Produto.id == produto_id).first()
     
@@ -91,15 +126,32 @@ def obter_produto(produto_id: int, db: Session = Depends(get_db)):
             detail="Produto não encontrado"
         )
     
-    return produto
+    return _com_estoque_real(db, produto)
+
+
+def _com_estoque_real(db: Session, produto: Produto):
+    """Produto distribuído em faixas: estoque somado das faixas, sem esperar a consolidação"""
+    if not settings.DB_ESTOQUE_FAIXAS:
+        return produto
+    
+    total = estoque_faixas_service.total(db, produto.id)
+    if total is None or total == produto.estoque_atual:
+        return produto
+    # Só a resposta muda, nada é gravado
+    return ProdutoResponse.model_validate(produto).model_copy(update={"estoque_atual": total})
 
 
 @router.post("/", response_model=ProdutoResponse, status_code=status.HTTP_201_CREATED)
-def criar_produto(produto_data: ProdutoCreate, db: Session = Depends(get_db)):
+def criar_produto(
+    produto_data: ProdutoCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """Cria um novo produto e gera código de barras automaticamente"""
+    iniciar_escrita(db)
     
-    # Valida se tipo existe
-    tipo = db.query(Tipo).filter(Tipo.id == produto_data.tipo_id).first()
+    # Valida se tipo existe (cache em memória, sem consulta ao banco)
+    tipo = catalogo_cache.obter_tipo(db, produto_data.tipo_id)
     if not tipo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,7 +159,7 @@ def criar_produto(produto_data: ProdutoCreate, db: Session = Depends(get_db)):
         )
     
     # Valida se cor existe
-    cor = db.query(Cor).filter(Cor.id == produto_data.cor_id).first()
+    cor = catalogo_cache.obter_cor(db, produto_data.cor_id)
     if not cor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -163,7 +215,12 @@ def criar_produto(produto_data: ProdutoCreate, db: Session = Depends(get_db)):
         db.add(movimentacao)
     
     db.commit()
+    versoes_tabelas.incrementar("produtos", "movimentacoes")
     db.refresh(novo_produto)
+    eventos_service.publicar(eventos_service.evento_produto(novo_produto, "criado"))
+    
+    # Etiqueta renderizada depois da resposta: a primeira impressão só lê o arquivo
+    background_tasks.add_task(armazem_etiquetas.pre_renderizar, dados_etiqueta(novo_produto))
     
     return novo_produto
 
@@ -172,9 +229,11 @@ def criar_produto(produto_data: ProdutoCreate, db: Session = Depends(get_db)):
 def atualizar_produto(
     produto_id: int,
     produto_data: ProdutoUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Atualiza um produto"""
+    iniciar_escrita(db)
     produto = db.query(Produto).filter(Produto.id == produto_id).first()
     
     if not produto:
@@ -185,7 +244,7 @@ def atualizar_produto(
     
     # Valida tipo se foi alterado
     if produto_data.tipo_id:
-        tipo = db.query(Tipo).filter(Tipo.id == produto_data.tipo_id).first()
+        tipo = catalogo_cache.obter_tipo(db, produto_data.tipo_id)
         if not tipo:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -194,20 +253,29 @@ def atualizar_produto(
     
     # Valida cor se foi alterada
     if produto_data.cor_id:
-        cor = db.query(Cor).filter(Cor.id == produto_data.cor_id).first()
+        cor = catalogo_cache.obter_cor(db, produto_data.cor_id)
         if not cor:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Cor não encontrada"
             )
     
+    etiqueta_anterior = dados_etiqueta(produto)
+    
     # Atualiza apenas os campos fornecidos
     update_data = produto_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(produto, field, value)
     
     db.commit()
+    versoes_tabelas.incrementar("produtos")
     db.refresh(produto)
+    eventos_service.publicar(eventos_service.evento_produto(produto, "atualizado"))
+    
+    # Nome, preço, tipo ou cor mudaram: etiqueta nova no armazém
+    etiqueta = dados_etiqueta(produto)
+    if etiqueta != etiqueta_anterior:
+        background_tasks.add_task(armazem_etiquetas.pre_renderizar, etiqueta, etiqueta_anterior)
     
     return produto
 
@@ -215,6 +283,7 @@ def atualizar_produto(
 @router.delete("/{produto_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_produto(produto_id: int, db: Session = Depends(get_db)):
     """Desativa um produto (soft delete)"""
+    iniciar_escrita(db)
     produto = db.query(Produto).filter(Produto.id == produto_id).first()
     
     if not produto:
@@ -224,15 +293,70 @@ def deletar_produto(produto_id: int, db: Session = Depends(get_db)):
         )
     
     produto.ativo = False
+    evento = eventos_service.evento_produto(produto, "desativado")
     db.commit()
+    versoes_tabelas.incrementar("produtos")
+    eventos_service.publicar(evento)
     
     return None
 
+@router.put("/{produto_id}/estoque-faixas", response_model=ProdutoResponse)
+def distribuir_estoque(
+    produto_id: int,
+    faixas: int = Query(settings.DB_ESTOQUE_FAIXAS_PADRAO, ge=2, le=64),
+    db: Session = Depends(get_db)
+):
+    """
+    Marca o produto como concorrido: o estoque passa a ser dividido em faixas
+
+    Movimentações simultâneas do produto alteram faixas diferentes em vez
+    de disputar a mesma linha. `estoque_atual` continua sendo o total (nas
+    listagens, atualizado a cada DB_ESTOQUE_FAIXAS_CONSOLIDAR_SEGUNDOS).
+    """
+    return _alterar_distribuicao(db, produto_id, faixas)
+
+
+@router.delete("/{produto_id}/estoque-faixas", response_model=ProdutoResponse)
+def remover_distribuicao_estoque(produto_id: int, db: Session = Depends(get_db)):
+    """Volta o estoque do produto para uma linha só (fim da promoção)"""
+    return _alterar_distribuicao(db, produto_id, None)
+
+
+def _alterar_distribuicao(db: Session, produto_id: int, faixas: Optional[int]) -> Produto:
+    if not settings.DB_ESTOQUE_FAIXAS:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Estoque em faixas desligado (DB_ESTOQUE_FAIXAS)"
+        )
+    
+    iniciar_escrita(db)
+    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    if not produto:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produto não encontrado"
+        )
+    
+    if faixas:
+        estoque_faixas_service.distribuir(db, produto, faixas)
+    else:
+        estoque_faixas_service.remover(db, produto)
+    
+    db.commit()
+    versoes_tabelas.incrementar("produtos")
+    db.refresh(produto)
+    return produto
+
+
 @router.get("/{produto_id}/etiqueta")
-def gerar_etiqueta(produto_id: int, db: Session = Depends(get_db)):
+def gerar_etiqueta(
+    produto_id: int,
+    imagem: str = Query("png", regex="^(png|webp)$"),
+    largura: Optional[int] = Query(None, ge=32, le=400, description="Miniatura para prévia"),
+    db: Session = Depends(get_db_leitura)
+):
     """Gera etiqueta completa do produto para impressão - RETORNA IMAGEM"""
     from fastapi.responses import Response
-    import base64
     
     produto = db.query(Produto).filter(Produto.id == produto_id).first()
     
@@ -242,37 +366,27 @@ def gerar_etiqueta(produto_id: int, db: Session = Depends(get_db)):
             detail="Produto não encontrado"
         )
     
-    image_base64 = barcode_service.gerar_etiqueta_produto(
-        codigo_barras=produto.codigo_barras,
-        nome_produto=produto.nome,
-        tipo_nome=produto.tipo.nome,
-        cor_nome=produto.cor.nome,
-        preco=float(produto.preco_venda) if produto.preco_venda else None
+    # Etiqueta do armazém (renderiza na hora só se ainda não existir);
+    # WebP e miniaturas são convertidos do PNG gravado
+    image_bytes = barcode_service.converter(
+        armazem_etiquetas.obter(dados_etiqueta(produto)), imagem, largura
     )
     
-    # Decodifica base64 e retorna como imagem PNG
-    image_bytes = base64.b64decode(image_base64)
-    
     return Response(
         content=image_bytes,
-        media_type="image/png",
+        media_type=f"image/{imagem}",
         headers={
-            "Content-Disposition": f"inline; filename=etiqueta_{produto_id}.png"
+            "Content-Disposition": f"inline; filename=etiqueta_{produto_id}.{imagem}"
         }
     )
 
 @router.post("/etiquetas-pdf")
 def gerar_pdf_etiquetas(
     produto_ids: list[int],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
     """Gera PDF com múltiplas etiquetas"""
     from fastapi.responses import Response
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.utils import ImageReader
-    from io import BytesIO
-    import base64
     
     # Busca produtos
     produtos = db.query(Produto).filter(Produto.id.in_(produto_ids)).all()
@@ -283,74 +397,104 @@ def gerar_pdf_etiquetas(
             detail="Nenhum produto encontrado"
         )
     
-    # Cria PDF
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
+    # Páginas montadas com as etiquetas pré-renderizadas do armazém
+    conteudo_pdf = barcode_service.gerar_pdf_etiquetas(
+        [dados_etiqueta(produto) for produto in produtos],
+        imagem=armazem_etiquetas.obter
+    )
     
-    # Configuração: 2 etiquetas por linha, 4 por página
-    etiqueta_width = (width - 60) / 2
-    etiqueta_height = 150
+    pdf_bytes.observar(len(conteudo_pdf))
+    pdf_etiquetas.observar(len(produtos))
     
-    x_start = 30
-    y_start = height - 180
+    return Response(
+        content=conteudo_pdf,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename=etiquetas_{len(produtos)}_produtos.pdf"
+        }
+    )
+
+@router.post("/imagens-zip")
+def baixar_imagens_zip(pedido: ImagensZipRequest, db: Session = Depends(get_db_leitura)):
+    """
+    ZIP com códigos de barras e etiquetas de vários produtos
+    
+    Substitui uma chamada a /{id}/barcode por produto: as imagens são
+    renderizadas em paralelo e cada arquivo é enviado assim que fica pronto.
+    Sem `produto_ids`, usa os filtros (ativo, tipo_id, cor_id).
+    """
+    query = db.query(Produto).options(joinedload(Produto.tipo), joinedload(Produto.cor))
+    if pedido.produto_ids is not None:
+        query = query.filter(Produto.id.in_(pedido.produto_ids))
+    if pedido.ativo is not None:
+        query = query.filter(Produto.ativo == pedido.ativo)
+    if pedido.tipo_id:
+        query = query.filter(Produto.tipo_id == pedido.tipo_id)
+    if pedido.cor_id:
+        query = query.filter(Produto.cor_id == pedido.cor_id)
+    
+    produtos = query.order_by(Produto.id).limit(settings.ZIP_MAX_PRODUTOS + 1).all()
     
-    x = x_start
-    y = y_start
-    count = 0
+    if not produtos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum produto encontrado"
+        )
+    if len(produtos) > settings.ZIP_MAX_PRODUTOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.ZIP_MAX_PRODUTOS} produtos por ZIP; refine os filtros"
+        )
     
+    # Dados lidos antes do streaming: as renderizações não usam a sessão
+    itens = []
     for produto in produtos:
-        # Gera etiqueta
-        image_base64 = barcode_service.gerar_etiqueta_produto(
-            codigo_barras=produto.codigo_barras,
-            nome_produto=produto.nome,
-            tipo_nome=produto.tipo.nome,
-            cor_nome=produto.cor.nome,
-            preco=float(produto.preco_venda) if produto.preco_venda else None
-        )
-        
-        # Decodifica imagem
-        image_data = base64.b64decode(image_base64)
-        img = ImageReader(BytesIO(image_data))
-        
-        # Adiciona ao PDF
-        c.drawImage(img, x, y, width=etiqueta_width, height=etiqueta_height)
-        
-        # Próxima posição
-        count += 1
-        if count % 2 == 0:  # A cada 2 etiquetas, desce
-            x = x_start
-            y -= etiqueta_height + 20
-        else:  # Vai para a direita
-            x += etiqueta_width + 30
-        
-        # Nova página a cada 4 etiquetas
-        if count % 4 == 0:
-            c.showPage()
-            x = x_start
-            y = y_start
-    
-    c.save()
-    
-    # Retorna PDF
-    buffer.seek(0)
-    pdf_bytes = buffer.getvalue()
+        for tipo in pedido.conteudo:
+            itens.append(_item_zip(tipo, pedido.imagem, produto.codigo_barras, dados_etiqueta(produto)))
     
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
+    return StreamingResponse(
+        pacote_imagens.gerar(itens),
+        media_type="application/zip",
         headers={
-            "Content-Disposition": f"attachment; filename=etiquetas_{len(produtos)}_produtos.pdf"
+            "Content-Disposition": f"attachment; filename=codigos_{len(produtos)}_produtos.zip"
         }
     )
 
+
+def _imagem_codigo(tipo: str, imagem: str, codigo: str) -> bytes:
+    if imagem == "svg":
+        if tipo == "qrcode":
+            return barcode_service.gerar_svg_qrcode(codigo)
+        return barcode_service.gerar_svg_code128(codigo)
+    if tipo == "qrcode":
+        return base64.b64decode(barcode_service.gerar_imagem_qrcode(codigo, formato=imagem))
+    return base64.b64decode(barcode_service.gerar_imagem_code128(codigo, formato=imagem))
+
+
+def _imagem_etiqueta(imagem: str, dados: dict) -> bytes:
+    formato = "png" if imagem == "svg" else imagem
+    return barcode_service.converter(armazem_etiquetas.obter(dados), formato)
+
+
+def _item_zip(tipo: str, imagem: str, codigo: str, dados: dict):
+    """(nome no ZIP, renderização) de uma imagem de um produto"""
+    if tipo == "etiqueta":
+        extensao = "png" if imagem == "svg" else imagem
+        return f"etiquetas/{codigo}.{extensao}", partial(_imagem_etiqueta, imagem, dados)
+    return f"{tipo}/{codigo}.{imagem}", partial(_imagem_codigo, tipo, imagem, codigo)
+
+
 @router.get("/{produto_id}/barcode", response_model=BarcodeResponse)
 def gerar_codigo_barras_imagem(
     produto_id: int,
     formato: str = Query("code128", regex="^(code128|qrcode)$"),
-    db: Session = Depends(get_db)
+    imagem: str = Query("png", regex="^(png|webp)$"),
+    dpi: int = Query(300, ge=72, le=1200),
+    modulo: Optional[int] = Query(None, ge=1, le=40, description="Barra mais fina, em pixels"),
+    largura: Optional[int] = Query(None, ge=32, le=2000, description="Miniatura para prévia"),
+    db: Session = Depends(get_db_leitura)
 ):
-    """Gera imagem do código de barras do produto"""
+    """Gera imagem do código de barras do produto (PNG de 1 bit ou WebP)"""
     produto = db.query(Produto).filter(Produto.id == produto_id).first()
     
     if not produto:
@@ -359,20 +503,22 @@ def gerar_codigo_barras_imagem(
             detail="Produto não encontrado"
         )
     
+    opcoes = {"formato": imagem, "dpi": dpi, "modulo": modulo, "largura": largura}
     if formato == "qrcode":
-        image_base64 = barcode_service.gerar_imagem_qrcode(produto.codigo_barras)
+        image_base64 = barcode_service.gerar_imagem_qrcode(produto.codigo_barras, **opcoes)
     else:
-        image_base64 = barcode_service.gerar_imagem_code128(produto.codigo_barras)
+        image_base64 = barcode_service.gerar_imagem_code128(produto.codigo_barras, **opcoes)
     
     return BarcodeResponse(
         codigo_barras=produto.codigo_barras,
         formato=formato,
+        media_type=f"image/{imagem}",
         image_base64=image_base64
     )
 
 
 @router.get("/{produto_id}/etiqueta")
-def gerar_etiqueta(produto_id: int, db: Session = Depends(get_db)):
+def gerar_etiqueta(produto_id: int, db: Session = Depends(get_db_leitura)):
     """Gera etiqueta completa do produto para impressão"""
     produto = db.query(Produto).filter(Produto.id == produto_id).first()
     
@@ -382,13 +528,7 @@ def gerar_etiqueta(produto_id: int, db: Session = Depends(get_db)):
             detail="Produto não encontrado"
         )
     
-    image_base64 = barcode_service.gerar_etiqueta_produto(
-        codigo_barras=produto.codigo_barras,
-        nome_produto=produto.nome,
-        tipo_nome=produto.tipo.nome,
-        cor_nome=produto.cor.nome,
-        preco=float(produto.preco_venda) if produto.preco_venda else None
-    )
+    image_base64 = base64.b64encode(armazem_etiquetas.obter(dados_etiqueta(produto))).decode()
     
     return {
         "produto_id": produto.id,
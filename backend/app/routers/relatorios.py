@@ -0,0 +1,72 @@
+"""
+Estoque Engenho - Rotas de Relatórios
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db_leitura
+from app.schemas import AnaliseEstoque, PrevisoesReposicao, RelatorioEstoque
+from app.services.analise import analise_estoque_service
+from app.services.catalogo_cache import catalogo_cache
+from app.services.dashboard import dashboard_service
+from app.services.previsao import previsao_service
+
+router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
+
+
+@router.get("/dashboard", response_model=RelatorioEstoque)
+def obter_dashboard(db: Session = Depends(get_db_leitura)):
+    """
+    Totais da tela inicial: produtos, itens, valor do estoque, estoque
+    baixo/zerado e movimentações do dia
+
+    O resultado pode ter até DASHBOARD_CACHE_SEGUNDOS de atraso.
+    """
+    return dashboard_service.obter(db)
+
+
+@router.get("/analise", response_model=AnaliseEstoque)
+def obter_analise(
+    dias: int = Query(90, ge=1, le=730),
+    classe: Optional[str] = Query(None, regex="^(A|B|C)$"),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Curva ABC (por receita), giro, dias de cobertura e valorização do
+    estoque por tipo e por cor, considerando as saídas dos últimos `dias`
+
+    Produtos em ordem decrescente de receita; `classe` filtra a curva ABC.
+    """
+    analise = analise_estoque_service.calcular(db, dias)
+    
+    if classe:
+        analise["produtos"] = [p for p in analise["produtos"] if p["classe_abc"] == classe]
+    
+    for grupo in analise["por_tipo"]:
+        tipo = catalogo_cache.obter_tipo(db, grupo["id"])
+        grupo["nome"] = tipo.nome if tipo else None
+    for grupo in analise["por_cor"]:
+        cor = catalogo_cache.obter_cor(db, grupo["id"])
+        grupo["nome"] = cor.nome if cor else None
+    
+    return analise
+
+
+@router.get("/previsoes", response_model=PrevisoesReposicao)
+def listar_previsoes(
+    repor: bool = Query(False),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Demanda diária prevista, estoque de segurança, ponto de reposição e
+    dias até a ruptura de cada produto ativo
+
+    Lê o resultado do job noturno (PREVISAO_HORA), sem recalcular; para
+    recalcular agora use POST /jobs/previsao-reposicao. `repor=true` lista
+    só os produtos com estoque no ponto de reposição ou abaixo.
+    """
+    return previsao_service.listar(db, repor, skip, limit)
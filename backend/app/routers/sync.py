@@ -0,0 +1,90 @@
+"""
+Estoque Engenho - Rotas de Sincronização
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_db
+from app.models import Produto, Tipo, Cor
+from app.schemas import (
+    SyncResponse, RemovidosSync, ProdutoSync,
+    CorResponse, TipoResponse
+)
+
+router = APIRouter(prefix="/sync", tags=["Sincronização"])
+
+
+def _gerar_token(momento: datetime) -> str:
+    """Codifica o instante da sincronização em um token opaco"""
+    return base64.urlsafe_b64encode(momento.isoformat().encode()).decode()
+
+
+def _ler_token(token: str) -> datetime:
+    """Decodifica o token recebido do cliente"""
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(token.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token de sincronização inválido"
+        )
+
+
+def _alterados(db: Session, modelo, desde: Optional[datetime]):
+    """Busca registros alterados desde o instante informado (usa idx_updated_at)"""
+    query = db.query(modelo)
+
+    if desde is None:
+        # Sincronização completa: apenas registros ativos
+        return query.filter(modelo.ativo == True).all()
+
+    return query.filter(modelo.updated_at >= desde).all()
+
+
+@router.get("/", response_model=SyncResponse)
+def sincronizar(
+    since: Optional[str] = Query(None, description="Token retornado pela sincronização anterior"),
+    # Sempre no primário: numa réplica atrasada o token ficaria à frente dos
+    # dados lidos, perdendo alterações
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna produtos, cores e tipos alterados desde o token informado
+
+    Sem token, retorna o catálogo ativo completo. Registros desativados
+    (ativo=False) aparecem apenas como IDs em `removidos`. O cliente deve
+    guardar o `token` retornado e enviá-lo na próxima chamada.
+    """
+    # Mesmo relógio que grava updated_at (default/onupdate da aplicação, hora
+    # local da API): o do banco pode estar em outro fuso (ex.: MySQL em UTC)
+    # e adiantaria o token em horas. Lido antes das consultas
+    agora = datetime.now()
+
+    desde = None
+    if since:
+        # Margem cobre a resolução de segundos do TIMESTAMP, transações que
+        # gravaram updated_at pouco antes do token anterior ser gerado e
+        # pequenas diferenças de relógio entre servidores da API (use NTP)
+        desde = _ler_token(since) - timedelta(seconds=settings.SYNC_MARGEM_SEGUNDOS)
+
+    produtos = _alterados(db, Produto, desde)
+    cores = _alterados(db, Cor, desde)
+    tipos = _alterados(db, Tipo, desde)
+
+    return SyncResponse(
+        token=_gerar_token(agora),
+        completo=desde is None,
+        produtos=[ProdutoSync.model_validate(p) for p in produtos if p.ativo],
+        cores=[CorResponse.model_validate(c) for c in cores if c.ativo],
+        tipos=[TipoResponse.model_validate(t) for t in tipos if t.ativo],
+        removidos=RemovidosSync(
+            produtos=[p.id for p in produtos if not p.ativo],
+            cores=[c.id for c in cores if not c.ativo],
+            tipos=[t.id for t in tipos if not t.ativo]
+        )
+    )
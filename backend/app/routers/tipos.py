@@ -1,34 +1,37 @@
 """
 Estoque Engenho - Rotas de Tipos
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List
-from app.database import get_db
+from app.database import get_db, iniciar_escrita
 from app.models import Tipo
 from app.schemas import TipoCreate, TipoUpdate, TipoResponse
+from app.services.catalogo_cache import catalogo_cache
+from app.services.versoes import versoes_tabelas
 
 router = APIRouter(prefix="/tipos", tags=["Tipos"])
 
 
 @router.get("/", response_model=List[TipoResponse])
 def listar_tipos(
+    request: Request,
+    response: Response,
     ativo: bool = None,
     db: Session = Depends(get_db)
 ):
     """Lista todos os tipos de produtos"""
-    query = db.query(Tipo)
+    nao_modificado = versoes_tabelas.verificar(request, response, "tipos")
+    if nao_modificado:
+        return nao_modificado
     
-    if ativo is not None:
-        query = query.filter(Tipo.ativo == ativo)
-    
-    return query.all()
+    return catalogo_cache.listar_tipos(db, ativo)
 
 
 @router.get("/{tipo_id}", response_model=TipoResponse)
 def obter_tipo(tipo_id: int, db: Session = Depends(get_db)):
     """Obtém um tipo específico"""
-    tipo = db.query(Tipo).filter(Tipo.id == tipo_id).first()
+    tipo = catalogo_cache.obter_tipo(db, tipo_id)
     
     if not tipo:
         raise HTTPException(
@@ -42,6 +45,7 @@ def obter_tipo(tipo_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=TipoResponse, status_code=status.HTTP_201_CREATED)
 def criar_tipo(tipo_data: TipoCreate, db: Session = Depends(get_db)):
     """Cria um novo tipo de produto"""
+    iniciar_escrita(db)
     
     # Verifica se o código já existe
     tipo_existente = db.query(Tipo).filter(Tipo.codigo == tipo_data.codigo).first()
@@ -54,7 +58,9 @@ def criar_tipo(tipo_data: TipoCreate, db: Session = Depends(get_db)):
     novo_tipo = Tipo(**tipo_data.model_dump())
     db.add(novo_tipo)
     db.commit()
+    versoes_tabelas.incrementar("tipos")
     db.refresh(novo_tipo)
+    catalogo_cache.registrar_tipo(novo_tipo)
     
     return novo_tipo
 
@@ -66,6 +72,7 @@ def atualizar_tipo(
     db: Session = Depends(get_db)
 ):
     """Atualiza um tipo de produto"""
+    iniciar_escrita(db)
     tipo = db.query(Tipo).filter(Tipo.id == tipo_id).first()
     
     if not tipo:
@@ -89,7 +96,9 @@ def atualizar_tipo(
         setattr(tipo, field, value)
     
     db.commit()
+    versoes_tabelas.incrementar("tipos")
     db.refresh(tipo)
+    catalogo_cache.registrar_tipo(tipo)
     
     return tipo
 
@@ -97,6 +106,7 @@ def atualizar_tipo(
 @router.delete("/{tipo_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_tipo(tipo_id: int, db: Session = Depends(get_db)):
     """Desativa um tipo (soft delete)"""
+    iniciar_escrita(db)
     tipo = db.query(Tipo).filter(Tipo.id == tipo_id).first()
     
     if not tipo:
@@ -107,5 +117,7 @@ def deletar_tipo(tipo_id: int, db: Session = Depends(get_db)):
     
     tipo.ativo = False
     db.commit()
+    versoes_tabelas.incrementar("tipos")
+    catalogo_cache.registrar_tipo(tipo)
     
     return None
@@ -2,7 +2,7 @@
 Estoque Engenho - Schemas Pydantic
 """
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 from decimal import Decimal
 
@@ -95,20 +95,24 @@ class ProdutoUpdate(BaseModel):
     ativo: Optional[bool] = None
 
 
-class ProdutoResponse(ProdutoBase):
+class ProdutoResumo(ProdutoBase):
+    """Produto sem tipo/cor aninhados (referenciados por tipo_id e cor_id)"""
     id: int
     codigo_produto: str
     codigo_barras: str
     estoque_atual: int
     ativo: bool
     created_at: datetime
-    tipo: TipoResponse
-    cor: CorResponse
     
     class Config:
         from_attributes = True
 
 
+class ProdutoResponse(ProdutoResumo):
+    tipo: TipoResponse
+    cor: CorResponse
+
+
 class ProdutoListResponse(BaseModel):
     id: int
     nome: str
@@ -152,14 +156,89 @@ class MovimentacaoComProduto(MovimentacaoResponse):
     produto: ProdutoResponse
 
 
+class MovimentacoesNormalizadas(BaseModel):
+    """
+    Movimentações sem o produto aninhado (formato=normalizado)
+
+    Cada produto, tipo e cor aparece uma única vez; as movimentações os
+    referenciam por produto_id, e os produtos por tipo_id e cor_id.
+    """
+    movimentacoes: List[MovimentacaoResponse]
+    produtos: List[ProdutoResumo]
+    tipos: List[TipoResponse]
+    cores: List[CorResponse]
+
+
 # ============= RELATÓRIOS =============
 
 class RelatorioEstoque(BaseModel):
-    """Relatório de estoque atual"""
+    """Relatório de estoque atual (produtos ativos)"""
     total_produtos: int
     total_itens: int
     produtos_abaixo_minimo: int
     produtos_zerados: int
+    valor_estoque_custo: Decimal
+    valor_estoque_venda: Decimal
+    movimentacoes_hoje: int
+    entradas_hoje: int
+    saidas_hoje: int
+    atualizado_em: datetime
+
+
+class AnaliseProduto(BaseModel):
+    """Indicadores de um produto no período analisado"""
+    produto_id: int
+    codigo_barras: str
+    nome: str
+    tipo_id: int
+    cor_id: int
+    classe_abc: str
+    saidas: int
+    receita: float
+    estoque_atual: int
+    giro: Optional[float]  # saídas / estoque médio; None sem estoque
+    dias_cobertura: Optional[float]  # None sem saídas no período
+    valor_custo: float
+    valor_venda: float
+
+
+class ValorizacaoGrupo(BaseModel):
+    """Estoque e valor por tipo ou por cor"""
+    id: int
+    nome: Optional[str]
+    produtos: int
+    itens: int
+    valor_custo: float
+    valor_venda: float
+
+
+class AnaliseEstoque(BaseModel):
+    """Curva ABC, giro, cobertura e valorização (produtos ativos)"""
+    dias: int
+    inicio: datetime
+    produtos: List[AnaliseProduto]
+    por_tipo: List[ValorizacaoGrupo]
+    por_cor: List[ValorizacaoGrupo]
+
+
+class PrevisaoProduto(BaseModel):
+    """Demanda prevista e ponto de reposição de um produto (último cálculo)"""
+    produto_id: int
+    codigo_barras: str
+    nome: str
+    demanda_diaria: float
+    desvio_diario: float
+    estoque_seguranca: int
+    ponto_reposicao: int
+    estoque_atual: int  # estoque de agora, não o do cálculo
+    dias_ate_ruptura: Optional[float]  # no cálculo; None sem demanda prevista
+    repor: bool  # estoque atual no ponto de reposição ou abaixo
+
+
+class PrevisoesReposicao(BaseModel):
+    """Resultado do job noturno de previsão de demanda"""
+    calculado_em: Optional[datetime]  # None se o job ainda não rodou
+    produtos: List[PrevisaoProduto]
 
 
 class ProdutoBaixoEstoque(BaseModel):
@@ -175,8 +254,100 @@ class ProdutoBaixoEstoque(BaseModel):
 
 # ============= BARCODE =============
 
+class ImagensZipRequest(BaseModel):
+    """Produtos (IDs ou filtros) e imagens do ZIP de códigos de barras"""
+    produto_ids: Optional[List[int]] = None
+    ativo: Optional[bool] = None
+    tipo_id: Optional[int] = None
+    cor_id: Optional[int] = None
+    conteudo: List[Literal["code128", "qrcode", "etiqueta"]] = Field(
+        default=["code128", "etiqueta"], min_length=1
+    )
+    imagem: str = Field("png", pattern="^(png|webp|svg)$")  # etiquetas não têm SVG: saem em PNG
+
+
 class BarcodeResponse(BaseModel):
     """Resposta com imagem do código de barras"""
     codigo_barras: str
     formato: str
+    media_type: str = "image/png"
     image_base64: str
+
+
+# ============= SINCRONIZAÇÃO =============
+
+class ProdutoSync(BaseModel):
+    """Produto no formato compacto da sincronização (sem tipo/cor aninhados)"""
+    id: int
+    codigo_produto: str
+    codigo_barras: str
+    nome: str
+    tipo_id: int
+    cor_id: int
+    estoque_atual: int
+    estoque_minimo: int
+    preco_custo: Optional[Decimal]
+    preco_venda: Optional[Decimal]
+    observacoes: Optional[str]
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class RemovidosSync(BaseModel):
+    """IDs desativados (ativo=False) desde o último token"""
+    produtos: List[int] = []
+    cores: List[int] = []
+    tipos: List[int] = []
+
+
+class SyncResponse(BaseModel):
+    """Alterações do catálogo desde o token informado"""
+    token: str
+    completo: bool
+    produtos: List[ProdutoSync]
+    cores: List[CorResponse]
+    tipos: List[TipoResponse]
+    removidos: RemovidosSync
+
+
+# ============= DIAGNÓSTICO =============
+
+class ProfilerConfig(BaseModel):
+    """Configuração do profiler de SQL"""
+    ativo: bool
+    limite_lento_ms: float = Field(..., ge=0)
+    amostragem: float = Field(..., ge=0, le=1)
+
+
+class ProfilerConfigUpdate(BaseModel):
+    ativo: Optional[bool] = None
+    limite_lento_ms: Optional[float] = Field(None, ge=0)
+    amostragem: Optional[float] = Field(None, ge=0, le=1)
+
+
+# ============= JOBS =============
+
+class ExportacaoProdutosJob(BaseModel):
+    """Filtros da exportação de produtos em CSV"""
+    ativo: Optional[bool] = None
+    tipo_id: Optional[int] = None
+    cor_id: Optional[int] = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    tipo: str
+    status: str
+    progresso: int
+    erro: Optional[str]
+    nome_arquivo: Optional[str]
+    tamanho_bytes: Optional[int]
+    criado_em: datetime
+    concluido_em: Optional[datetime]
+    expira_em: Optional[datetime]
+    url_resultado: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
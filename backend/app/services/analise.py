@@ -0,0 +1,247 @@
+"""
+Estoque Engenho - Análise de Estoque (curva ABC, giro, cobertura e valorização)
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Movimentações lidas por vez: memória constante com qualquer histórico
+LOTE_MOVIMENTACOES = 200_000
+
+# Participação acumulada na receita que fecha as classes A e B
+LIMITE_CLASSE_A = 0.80
+LIMITE_CLASSE_B = 0.95
+
+EPOCA = np.datetime64("1970-01-01", "D")
+
+
+def carregar_produtos(db: Session) -> Dict[str, np.ndarray]:
+    """Colunas dos produtos ativos, ordenadas por id"""
+    linhas = db.execute(text(
+        "SELECT id, tipo_id, cor_id, estoque_atual, preco_custo, preco_venda, codigo_barras, nome "
+        "FROM produtos WHERE ativo = :ativo ORDER BY id"
+    ), {"ativo": True}).all()
+
+    colunas = list(zip(*linhas)) or [()] * 8
+    return {
+        "id": np.array(colunas[0], dtype=np.int64),
+        "tipo_id": np.array(colunas[1], dtype=np.int64),
+        "cor_id": np.array(colunas[2], dtype=np.int64),
+        "estoque": np.array(colunas[3], dtype=np.float64),
+        "preco_custo": np.array([float(p or 0) for p in colunas[4]], dtype=np.float64),
+        "preco_venda": np.array([float(p or 0) for p in colunas[5]], dtype=np.float64),
+        "codigo_barras": list(colunas[6]),
+        "nome": list(colunas[7]),
+    }
+
+
+def carregar_movimentacoes(db: Session, inicio: datetime) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Movimentações desde `inicio` em lotes de colunas
+
+    Cada lote traz produto_id, saida (quantidade das saídas, 0 nas demais),
+    variacao (estoque_atual - estoque_anterior) e dia (dias desde 1970).
+    A paginação é por id, sem OFFSET; o SQL devolve os valores crus do
+    driver (text() sem tipos), sem criar objetos por linha.
+    """
+    ultimo_id = db.execute(text(
+        "SELECT MIN(id) FROM movimentacoes WHERE data_movimento >= :inicio"
+    ), {"inicio": inicio}).scalar()
+    if ultimo_id is None:
+        return
+    ultimo_id -= 1
+
+    consulta = text(
+        "SELECT id, produto_id, "
+        "CASE WHEN tipo_movimento = 'SAIDA' THEN quantidade ELSE 0 END, "
+        "estoque_atual - estoque_anterior, data_movimento "
+        "FROM movimentacoes WHERE id > :ultimo AND data_movimento >= :inicio "
+        "ORDER BY id LIMIT :lote"
+    )
+    while True:
+        linhas = db.execute(
+            consulta, {"ultimo": ultimo_id, "inicio": inicio, "lote": LOTE_MOVIMENTACOES}
+        ).all()
+        if not linhas:
+            return
+
+        ids, produtos, saidas, variacoes, datas = zip(*linhas)
+        ultimo_id = ids[-1]
+        yield {
+            "produto_id": np.array(produtos, dtype=np.int64),
+            "saida": np.array(saidas, dtype=np.float64),
+            "variacao": np.array(variacoes, dtype=np.float64),
+            # SQLite devolve texto ISO, o MySQL devolve datetime: o NumPy lê os dois
+            "dia": (np.array(datas, dtype="datetime64[s]").astype("datetime64[D]") - EPOCA).astype(np.int64),
+        }
+        if len(linhas) < LOTE_MOVIMENTACOES:
+            return
+
+
+def indices_produtos(ids_produtos: np.ndarray, produto_id: np.ndarray) -> np.ndarray:
+    """
+    Posição de cada produto_id em `ids_produtos` (ordenado); -1 se não estiver lá
+
+    Movimentações de produtos inativos ou removidos ficam com -1.
+    """
+    if not len(ids_produtos):
+        return np.full(len(produto_id), -1, dtype=np.int64)
+    indices = np.searchsorted(ids_produtos, produto_id)
+    indices = np.minimum(indices, len(ids_produtos) - 1)
+    return np.where(ids_produtos[indices] == produto_id, indices, -1)
+
+
+def acumular_por_produto(ids_produtos: np.ndarray, lotes: Iterator[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Soma saídas e variação de estoque por produto, lote a lote (bincount)"""
+    quantidade = len(ids_produtos)
+    saidas = np.zeros(quantidade)
+    variacao = np.zeros(quantidade)
+
+    for lote in lotes:
+        indices = indices_produtos(ids_produtos, lote["produto_id"])
+        validos = indices >= 0
+        indices = indices[validos]
+        saidas += np.bincount(indices, weights=lote["saida"][validos], minlength=quantidade)
+        variacao += np.bincount(indices, weights=lote["variacao"][validos], minlength=quantidade)
+
+    return {"saidas": saidas, "variacao": variacao}
+
+
+def classificar_abc(receita: np.ndarray) -> np.ndarray:
+    """
+    Classe ABC de cada produto pela participação na receita
+
+    Em ordem decrescente de receita, o produto é A enquanto a participação
+    acumulada antes dele for menor que 80%, B até 95% e C no restante.
+    Produtos sem receita são sempre C.
+    """
+    classes = np.full(len(receita), "C", dtype="<U1")
+    total = receita.sum()
+    if total <= 0:
+        return classes
+
+    ordem = np.argsort(-receita, kind="stable")
+    acumulada_antes = (np.cumsum(receita[ordem]) - receita[ordem]) / total
+    classes_ordenadas = np.where(
+        acumulada_antes < LIMITE_CLASSE_A, "A",
+        np.where(acumulada_antes < LIMITE_CLASSE_B, "B", "C")
+    )
+    classes_ordenadas[receita[ordem] <= 0] = "C"
+    classes[ordem] = classes_ordenadas
+    return classes
+
+
+def valorizar_por_grupo(grupos: np.ndarray, estoque: np.ndarray, preco_custo: np.ndarray,
+                        preco_venda: np.ndarray) -> Dict[str, np.ndarray]:
+    """Itens e valor do estoque a custo e a preço de venda por grupo (tipo ou cor)"""
+    ids, inverso = np.unique(grupos, return_inverse=True)
+    return {
+        "id": ids,
+        "produtos": np.bincount(inverso, minlength=len(ids)),
+        "itens": np.bincount(inverso, weights=estoque, minlength=len(ids)),
+        "valor_custo": np.bincount(inverso, weights=estoque * preco_custo, minlength=len(ids)),
+        "valor_venda": np.bincount(inverso, weights=estoque * preco_venda, minlength=len(ids)),
+    }
+
+
+def analisar(produtos: Dict[str, np.ndarray], acumulado: Dict[str, np.ndarray], dias: int) -> Dict[str, np.ndarray]:
+    """
+    Indicadores por produto a partir das colunas carregadas
+
+    - receita: saídas do período x preço de venda atual
+    - giro: saídas / estoque médio (média entre o início e o fim do período)
+    - dias_cobertura: estoque atual / média diária de saídas
+    NaN quando o indicador não se aplica (sem estoque ou sem saídas).
+    """
+    estoque = produtos["estoque"]
+    saidas = acumulado["saidas"]
+    receita = saidas * produtos["preco_venda"]
+
+    estoque_inicio = estoque - acumulado["variacao"]
+    estoque_medio = (estoque + estoque_inicio) / 2
+    demanda_diaria = saidas / dias
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        giro = np.where(estoque_medio > 0, saidas / estoque_medio, np.nan)
+        cobertura = np.where(demanda_diaria > 0, estoque / demanda_diaria, np.nan)
+
+    return {
+        "saidas": saidas,
+        "receita": receita,
+        "classe_abc": classificar_abc(receita),
+        "estoque_medio": estoque_medio,
+        "giro": giro,
+        "dias_cobertura": cobertura,
+        "valor_custo": estoque * produtos["preco_custo"],
+        "valor_venda": estoque * produtos["preco_venda"],
+    }
+
+
+def _valor(numero: float, casas: int = 2) -> Optional[float]:
+    return None if np.isnan(numero) else round(float(numero), casas)
+
+
+class AnaliseEstoqueService:
+    """
+    Relatórios analíticos calculados em memória com NumPy
+
+    Em vez de um GROUP BY por relatório, as colunas de produtos e
+    movimentações são lidas em lotes para arrays e todos os indicadores saem
+    de uma passada só (bincount por produto, tipo e cor).
+    """
+
+    def calcular(self, db: Session, dias: int) -> Dict:
+        """Curva ABC, giro, cobertura e valorização dos produtos ativos"""
+        inicio = datetime.now() - timedelta(days=dias)
+        produtos = carregar_produtos(db)
+        acumulado = acumular_por_produto(produtos["id"], carregar_movimentacoes(db, inicio))
+        indicadores = analisar(produtos, acumulado, dias)
+
+        lista: List[Dict] = [
+            {
+                "produto_id": int(produtos["id"][i]),
+                "codigo_barras": produtos["codigo_barras"][i],
+                "nome": produtos["nome"][i],
+                "tipo_id": int(produtos["tipo_id"][i]),
+                "cor_id": int(produtos["cor_id"][i]),
+                "classe_abc": str(indicadores["classe_abc"][i]),
+                "saidas": int(indicadores["saidas"][i]),
+                "receita": _valor(indicadores["receita"][i]),
+                "estoque_atual": int(produtos["estoque"][i]),
+                "giro": _valor(indicadores["giro"][i], 3),
+                "dias_cobertura": _valor(indicadores["dias_cobertura"][i], 1),
+                "valor_custo": _valor(indicadores["valor_custo"][i]),
+                "valor_venda": _valor(indicadores["valor_venda"][i]),
+            }
+            for i in np.argsort(-indicadores["receita"], kind="stable")
+        ]
+
+        def grupos(coluna: str) -> List[Dict]:
+            valores = valorizar_por_grupo(
+                produtos[coluna], produtos["estoque"], produtos["preco_custo"], produtos["preco_venda"]
+            )
+            return [
+                {
+                    "id": int(valores["id"][i]),
+                    "produtos": int(valores["produtos"][i]),
+                    "itens": int(valores["itens"][i]),
+                    "valor_custo": _valor(valores["valor_custo"][i]),
+                    "valor_venda": _valor(valores["valor_venda"][i]),
+                }
+                for i in range(len(valores["id"]))
+            ]
+
+        return {
+            "dias": dias,
+            "inicio": inicio,
+            "produtos": lista,
+            "por_tipo": grupos("tipo_id"),
+            "por_cor": grupos("cor_id"),
+        }
+
+
+# Instância global do serviço
+analise_estoque_service = AnaliseEstoqueService()
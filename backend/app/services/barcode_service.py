@@ -1,12 +1,138 @@
 """
 Estoque Engenho - Serviço de Código de Barras
 """
-import barcode
-from barcode.writer import ImageWriter
-import qrcode
+from functools import lru_cache
 from io import BytesIO
+from typing import Callable, Dict, List, Optional
 import base64
-from PIL import Image, ImageDraw, ImageFont
+from app.services.metricas import medir_render
+
+# barcode, qrcode e PIL são importados dentro dos métodos: a API sobe sem
+# carregá-los e só a primeira renderização paga o custo da importação
+
+
+@lru_cache(maxsize=1)
+def _fontes_etiqueta():
+    """Fontes da etiqueta (título, informações, preço), carregadas uma única vez"""
+    from PIL import ImageFont
+
+    try:
+        # Tenta carregar fonte do sistema
+        return (
+            ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16),
+            ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12),
+            ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20),
+        )
+    except OSError:
+        # Fallback para fonte padrão
+        padrao = ImageFont.load_default()
+        return padrao, padrao, padrao
+
+
+@lru_cache(maxsize=8)
+def _fonte_codigo(tamanho: int):
+    """Fonte do texto sob o código de barras, em pixels"""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", tamanho)
+    except OSError:
+        pass
+    try:
+        return ImageFont.load_default(tamanho)
+    except TypeError:
+        # Pillow < 10.1: fonte padrão só em bitmap, sem tamanho
+        return ImageFont.load_default()
+
+
+# Resolução das etiquetas (impressoras térmicas de 8 pontos/mm)
+DPI_ETIQUETA = 203
+
+# Margem branca de cada lado do código de barras da etiqueta, em módulos
+ZONA_SILENCIO_ETIQUETA = 10
+
+# Área do código de barras na etiqueta, em pixels
+LARGURA_BARRAS_ETIQUETA = 350
+ALTURA_BARRAS_ETIQUETA = 100
+
+
+def _mm(milimetros: float, dpi: int) -> int:
+    return max(1, round(milimetros * dpi / 25.4))
+
+
+def _modulos_code128(codigo: str) -> str:
+    """Sequência de módulos do Code128 ("1" barra, "0" espaço)"""
+    import barcode
+
+    return barcode.get_barcode_class('code128')(codigo).build()[0]
+
+
+def _desenhar_code128(
+    codigo: str,
+    modulo: int,
+    altura_barras: int,
+    zona_silencio: int,
+    tamanho_fonte: int = 0,
+    distancia_texto: int = 0
+):
+    """
+    Desenha o Code128 em 1 bit com cada módulo em `modulo` pixels inteiros
+
+    O ImageWriter do python-barcode recebe a largura em mm e converte de
+    volta para pixels com arredondamentos que deixam barras desiguais e,
+    com 1 pixel por módulo, retângulos de largura negativa.
+    `zona_silencio` é em módulos; sem `tamanho_fonte` não escreve o código.
+    """
+    from PIL import Image, ImageDraw
+
+    modulos = _modulos_code128(codigo)
+    largura = (len(modulos) + 2 * zona_silencio) * modulo
+    altura_texto = tamanho_fonte + 2 * distancia_texto if tamanho_fonte else 0
+    img = Image.new('1', (largura, altura_barras + altura_texto), 1)
+    draw = ImageDraw.Draw(img)
+
+    inicio = None
+    for posicao, valor in enumerate(modulos + "0"):
+        if valor == "1" and inicio is None:
+            inicio = posicao
+        elif valor == "0" and inicio is not None:
+            x = (zona_silencio + inicio) * modulo
+            draw.rectangle([x, 0, x + (posicao - inicio) * modulo - 1, altura_barras - 1], fill=0)
+            inicio = None
+
+    if tamanho_fonte:
+        fonte = _fonte_codigo(tamanho_fonte)
+        esquerda, _, direita, _ = draw.textbbox((0, 0), codigo, font=fonte)
+        draw.text(
+            ((largura - (direita - esquerda)) // 2 - esquerda, altura_barras + distancia_texto),
+            codigo, fill=0, font=fonte
+        )
+    return img
+
+
+def _codificar(img, formato: str = "png", dpi: int = 300, largura: Optional[int] = None) -> bytes:
+    """
+    Codifica a imagem em preto e branco (1 bit por pixel)
+
+    Miniaturas (`largura` menor que a imagem) saem com 4 tons de cinza:
+    reduzir barras finas mantendo só preto e branco faria parte delas sumir.
+    """
+    from PIL import Image
+
+    if largura and img.width > largura:
+        altura = max(1, round(img.height * largura / img.width))
+        img = img.convert('L').resize((largura, altura), Image.Resampling.LANCZOS).quantize(4)
+    elif img.mode != '1':
+        img = img.convert('L').point(lambda valor: 255 if valor >= 128 else 0, mode='1')
+
+    buffer = BytesIO()
+    if formato == "webp":
+        # WebP não tem 1 bit por pixel; sem perdas, as barras continuam nítidas
+        img.convert('L').save(buffer, format='WEBP', lossless=True)
+    else:
+        bits = {'bits': 2} if img.mode == 'P' else {}
+        img.save(buffer, format='PNG', optimize=True, dpi=(dpi, dpi), **bits)
+    return buffer.getvalue()
 
 
 class BarcodeService:
@@ -46,80 +172,165 @@ class BarcodeService:
         return f"{numero:04d}"
     
     @staticmethod
-    def gerar_imagem_code128(codigo: str, with_text: bool = True) -> str:
+    @medir_render
+    def gerar_imagem_code128(
+        codigo: str,
+        with_text: bool = True,
+        formato: str = "png",
+        dpi: int = 300,
+        modulo: Optional[int] = None,
+        largura: Optional[int] = None
+    ) -> str:
         """
         Gera imagem do código de barras Code128
         
         Args:
             codigo: Código a ser convertido em barcode
             with_text: Se deve mostrar o texto abaixo do código
+            formato: "png" (1 bit por pixel) ou "webp"
+            dpi: Resolução da impressão (gravada no PNG)
+            modulo: Largura da barra mais fina em pixels (padrão: ~0,3 mm)
+            largura: Largura máxima em pixels (miniatura para prévia)
             
         Returns:
             Imagem em base64
         """
-        # Cria o código de barras
-        CODE128 = barcode.get_barcode_class('code128')
-        code_instance = CODE128(codigo, writer=ImageWriter())
+        # Módulo com número inteiro de pixels: 0,3 mm a 300 dpi dá 3,54 px
+        # e as barras sairiam com larguras desiguais
+        modulo = modulo or _mm(0.3, dpi)
         
-        # Gera a imagem em memória
-        buffer = BytesIO()
-        code_instance.write(
-            buffer,
-            options={
-                'write_text': with_text,
-                'text_distance': 5,
-                'module_height': 15,
-                'module_width': 0.3,
-                'font_size': 10,
-                'quiet_zone': 6.5
-            }
+        # Barras de 15 mm, zona de silêncio de ~6,5 mm e texto de 10 pt
+        img = _desenhar_code128(
+            codigo,
+            modulo,
+            altura_barras=_mm(15, dpi),
+            zona_silencio=max(10, -(-_mm(6.5, dpi) // modulo)),
+            tamanho_fonte=max(8, round(10 * dpi / 72)) if with_text else 0,
+            distancia_texto=_mm(1, dpi)
         )
         
-        # Converte para base64
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        return image_base64
+        return base64.b64encode(_codificar(img, formato, dpi, largura)).decode('utf-8')
     
     @staticmethod
-    def gerar_imagem_qrcode(codigo: str, size: int = 200) -> str:
+    @medir_render
+    def gerar_imagem_qrcode(
+        codigo: str,
+        size: int = 200,
+        formato: str = "png",
+        dpi: int = 300,
+        modulo: Optional[int] = None,
+        largura: Optional[int] = None
+    ) -> str:
         """
         Gera imagem QR Code
         
         Args:
             codigo: Código a ser convertido em QR Code
             size: Tamanho da imagem em pixels
+            formato: "png" (1 bit por pixel) ou "webp"
+            dpi: Resolução da impressão (gravada no PNG)
+            modulo: Lado de cada módulo em pixels (padrão: o maior que cabe em `size`)
+            largura: Tamanho máximo em pixels (miniatura para prévia)
             
         Returns:
             Imagem em base64
         """
+        import qrcode
+        from PIL import Image
+        
+        if largura:
+            size = min(size, largura)
+        
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
+            box_size=1,
             border=4,
         )
         qr.add_data(codigo)
         qr.make(fit=True)
         
-        img = qr.make_image(fill_color="black", back_color="white")
-        img = img.resize((size, size))
+        # Desenha no tamanho final com módulos de pixels inteiros em vez de
+        # reescalar a imagem (o que deixa módulos com tamanhos diferentes)
+        modulos = qr.modules_count + 2 * qr.border
+        qr.box_size = modulo or max(1, size // modulos)
+        img = qr.make_image(fill_color="black", back_color="white").get_image()
         
-        # Converte para base64
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        if not modulo:
+            if img.width > size:
+                # Menor que um pixel por módulo: NEAREST mantém preto e branco
+                img = img.resize((size, size), Image.Resampling.NEAREST)
+            elif img.width < size:
+                # Completa a margem branca até o tamanho pedido
+                fundo = Image.new('1', (size, size), 1)
+                deslocamento = (size - img.width) // 2
+                fundo.paste(img, (deslocamento, deslocamento))
+                img = fundo
+        
+        return base64.b64encode(_codificar(img, formato, dpi)).decode('utf-8')
+    
+    @staticmethod
+    @medir_render
+    def gerar_svg_code128(codigo: str, with_text: bool = True) -> bytes:
+        """
+        Gera o código de barras Code128 em SVG (vetorial, qualquer resolução)
+        
+        Args:
+            codigo: Código a ser convertido em barcode
+            with_text: Se deve mostrar o texto abaixo do código
+            
+        Returns:
+            Conteúdo do SVG
+        """
+        import barcode
+        from barcode.writer import SVGWriter
+        
+        CODE128 = barcode.get_barcode_class('code128')
+        return CODE128(codigo, writer=SVGWriter()).render({
+            'write_text': with_text,
+            'text_distance': 5,
+            'module_height': 15,
+            'module_width': 0.3,
+            'font_size': 10,
+            'quiet_zone': 6.5,
+            'compress': False
+        })
+    
+    @staticmethod
+    @medir_render
+    def gerar_svg_qrcode(codigo: str) -> bytes:
+        """
+        Gera o QR Code em SVG (vetorial, qualquer resolução)
+        
+        Args:
+            codigo: Código a ser convertido em QR Code
+            
+        Returns:
+            Conteúdo do SVG
+        """
+        import qrcode
+        from qrcode.image.svg import SvgPathImage
         
-        return image_base64
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=4,
+            image_factory=SvgPathImage
+        )
+        qr.add_data(codigo)
+        qr.make(fit=True)
+        return qr.make_image().to_string()
     
     @staticmethod
+    @medir_render
     def gerar_etiqueta_produto(
         codigo_barras: str,
         nome_produto: str,
         tipo_nome: str,
         cor_nome: str,
-        preco: float = None
+        preco: float = None,
+        formato: str = "png",
+        largura: Optional[int] = None
     ) -> str:
         """
         Gera etiqueta completa com código de barras e informações do produto
@@ -130,70 +341,148 @@ class BarcodeService:
             tipo_nome: Nome do tipo/categoria
             cor_nome: Nome da cor
             preco: Preço (opcional)
+            formato: "png" (1 bit por pixel) ou "webp"
+            largura: Largura máxima em pixels (miniatura para prévia)
             
         Returns:
             Imagem da etiqueta em base64
         """
-        # Cria imagem base
+        from PIL import Image, ImageDraw
+        
+        # Cria imagem base em preto e branco (impressoras térmicas são 1 bit)
         width, height = 400, 250
-        img = Image.new('RGB', (width, height), color='white')
+        img = Image.new('1', (width, height), color=1)
         draw = ImageDraw.Draw(img)
         
-        try:
-            # Tenta carregar fonte do sistema
-            font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-            font_info = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
-            font_price = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-        except:
-            # Fallback para fonte padrão
-            font_title = ImageFont.load_default()
-            font_info = ImageFont.load_default()
-            font_price = ImageFont.load_default()
+        font_title, font_info, font_price = _fontes_etiqueta()
         
         # Adiciona nome do produto
         y_position = 10
-        draw.text((10, y_position), nome_produto[:30], fill='black', font=font_title)
+        draw.text((10, y_position), nome_produto[:30], fill=0, font=font_title)
         
         # Adiciona tipo e cor
         y_position += 25
-        draw.text((10, y_position), f"{tipo_nome} - {cor_nome}", fill='black', font=font_info)
+        draw.text((10, y_position), f"{tipo_nome} - {cor_nome}", fill=0, font=font_info)
         
         # Adiciona preço se fornecido
         if preco:
             y_position += 25
-            draw.text((10, y_position), f"R$ {preco:.2f}", fill='black', font=font_price)
+            draw.text((10, y_position), f"R$ {preco:.2f}", fill=0, font=font_price)
         
-        # Gera código de barras
-        CODE128 = barcode.get_barcode_class('code128')
-        code_instance = CODE128(codigo_barras, writer=ImageWriter())
-        
-        barcode_buffer = BytesIO()
-        code_instance.write(
-            barcode_buffer,
-            options={
-                'write_text': True,
-                'text_distance': 3,
-                'module_height': 10,
-                'module_width': 0.25,
-                'font_size': 8,
-                'quiet_zone': 3
-            }
+        # Código de barras com a maior barra de pixels inteiros que cabe na
+        # área, sem reescalar na horizontal
+        modulos = len(_modulos_code128(codigo_barras)) + 2 * ZONA_SILENCIO_ETIQUETA
+        tamanho_fonte, distancia_texto = 16, 3
+        barcode_img = _desenhar_code128(
+            codigo_barras,
+            max(1, LARGURA_BARRAS_ETIQUETA // modulos),
+            altura_barras=ALTURA_BARRAS_ETIQUETA - tamanho_fonte - 2 * distancia_texto,
+            zona_silencio=ZONA_SILENCIO_ETIQUETA,
+            tamanho_fonte=tamanho_fonte,
+            distancia_texto=distancia_texto
         )
+        if barcode_img.width > LARGURA_BARRAS_ETIQUETA:
+            # Código longo demais até para 1 pixel por módulo: reduz a
+            # largura (as barras ficam desiguais, mas cabem na etiqueta)
+            barcode_img = barcode_img.convert('L').resize(
+                (LARGURA_BARRAS_ETIQUETA, barcode_img.height), Image.Resampling.LANCZOS
+            ).point(lambda valor: 255 if valor >= 128 else 0, mode='1')
         
-        # Adiciona código de barras na etiqueta
-        barcode_buffer.seek(0)
-        barcode_img = Image.open(barcode_buffer)
-        barcode_img = barcode_img.resize((350, 100))
+        # Adiciona código de barras centralizado na área
+        img.paste(barcode_img, (25 + (LARGURA_BARRAS_ETIQUETA - barcode_img.width) // 2, 120))
         
-        img.paste(barcode_img, (25, 120))
+        return base64.b64encode(_codificar(img, formato, DPI_ETIQUETA, largura)).decode('utf-8')
+    
+    @staticmethod
+    def converter(conteudo: bytes, formato: str = "png", largura: Optional[int] = None) -> bytes:
+        """
+        Converte um PNG já gerado (ex.: etiqueta do armazém) para outro formato ou miniatura
+        
+        Args:
+            conteudo: PNG gerado por este serviço
+            formato: "png" ou "webp"
+            largura: Largura máxima em pixels
+            
+        Returns:
+            Imagem convertida (o próprio conteúdo se não houver o que mudar)
+        """
+        if formato == "png" and not largura:
+            return conteudo
+        
+        from PIL import Image
+        
+        img = Image.open(BytesIO(conteudo))
+        dpi = int(img.info.get('dpi', (DPI_ETIQUETA,))[0])
+        return _codificar(img, formato, dpi, largura)
+
+    @staticmethod
+    @medir_render
+    def gerar_pdf_etiquetas(
+        etiquetas: List[Dict],
+        progresso: Optional[Callable[[int, int], None]] = None,
+        imagem: Optional[Callable[[Dict], bytes]] = None
+    ) -> bytes:
+        """
+        Gera PDF A4 com etiquetas (2 por linha, 4 por página)
+        
+        Args:
+            etiquetas: Argumentos de gerar_etiqueta_produto para cada etiqueta
+            progresso: Chamado a cada página com (etiquetas prontas, total)
+            imagem: PNG de cada etiqueta a partir dos argumentos (ex.:
+                armazem_etiquetas.obter); sem ela, cada etiqueta é renderizada
+            
+        Returns:
+            Conteúdo do PDF
+        """
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
         
-        # Converte para base64
         buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        c = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        
+        # Configuração: 2 etiquetas por linha, 4 por página
+        etiqueta_width = (width - 60) / 2
+        etiqueta_height = 150
+        
+        x_start = 30
+        y_start = height - 180
+        
+        x = x_start
+        y = y_start
+        count = 0
+        
+        for dados in etiquetas:
+            # Etiqueta pronta (armazém) ou gerada agora
+            if imagem:
+                image_data = imagem(dados)
+            else:
+                image_data = base64.b64decode(BarcodeService.gerar_etiqueta_produto(**dados))
+            img = ImageReader(BytesIO(image_data))
+            
+            # Adiciona ao PDF
+            c.drawImage(img, x, y, width=etiqueta_width, height=etiqueta_height)
+            
+            # Próxima posição
+            count += 1
+            if count % 2 == 0:  # A cada 2 etiquetas, desce
+                x = x_start
+                y -= etiqueta_height + 20
+            else:  # Vai para a direita
+                x += etiqueta_width + 30
+            
+            # Nova página a cada 4 etiquetas
+            if count % 4 == 0:
+                if progresso:
+                    progresso(count, len(etiquetas))
+                c.showPage()
+                x = x_start
+                y = y_start
+        
+        c.save()
         
-        return image_base64
+        return buffer.getvalue()
 
 
 # Instância global do serviço
@@ -0,0 +1,130 @@
+"""
+Estoque Engenho - Cache de Cores e Tipos
+"""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Cor, Tipo
+from app.services.versoes import versoes_tabelas
+
+
+@dataclass(frozen=True)
+class ItemCatalogo:
+    """Cópia imutável de uma cor ou tipo, independente da sessão"""
+    id: int
+    nome: str
+    codigo: str
+    ativo: bool
+    created_at: datetime
+    descricao: Optional[str] = None
+
+    @classmethod
+    def de_modelo(cls, obj) -> "ItemCatalogo":
+        return cls(
+            id=obj.id,
+            nome=obj.nome,
+            codigo=obj.codigo,
+            ativo=obj.ativo,
+            created_at=obj.created_at,
+            descricao=getattr(obj, "descricao", None)
+        )
+
+
+class CatalogoCache:
+    """
+    Cache em memória das tabelas de cores e tipos
+
+    As tabelas têm poucas dezenas de linhas, então são mantidas inteiras em
+    memória. O cache é carregado na inicialização, atualizado pelas rotas de
+    escrita (write-through) e recarregado sempre que a versão da tabela em
+    `versoes_tabelas` não bate com a versão carregada.
+    """
+
+    MODELOS = {"cores": Cor, "tipos": Tipo}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._itens: Dict[str, Dict[int, ItemCatalogo]] = {
+            tabela: {} for tabela in self.MODELOS
+        }
+        self._versao: Dict[str, Optional[int]] = {
+            tabela: None for tabela in self.MODELOS
+        }
+
+    @property
+    def carregado(self) -> bool:
+        """Indica se cores e tipos já foram carregados (ex.: antes do fork)"""
+        return all(versao is not None for versao in self._versao.values())
+
+    def carregar(self, db: Session) -> None:
+        """Carrega cores e tipos do banco"""
+        for tabela in self.MODELOS:
+            self._recarregar(db, tabela)
+
+    def _recarregar(self, db: Session, tabela: str) -> None:
+        # A versão é lida antes da consulta: se houver escrita no meio,
+        # a próxima leitura detecta a diferença e recarrega de novo
+        versao = versoes_tabelas.atual(tabela)
+        itens = {
+            obj.id: ItemCatalogo.de_modelo(obj)
+            for obj in db.query(self.MODELOS[tabela]).all()
+        }
+        with self._lock:
+            self._itens[tabela] = itens
+            self._versao[tabela] = versao
+
+    def _tabela(self, db: Session, tabela: str) -> Dict[int, ItemCatalogo]:
+        if self._versao[tabela] != versoes_tabelas.atual(tabela):
+            self._recarregar(db, tabela)
+        return self._itens[tabela]
+
+    def _registrar(self, tabela: str, obj) -> None:
+        item = ItemCatalogo.de_modelo(obj)
+        with self._lock:
+            itens = dict(self._itens[tabela])
+            itens[item.id] = item
+            self._itens[tabela] = itens
+            if self._versao[tabela] is not None:
+                self._versao[tabela] = versoes_tabelas.atual(tabela)
+
+    def _listar(self, db: Session, tabela: str, ativo: Optional[bool]) -> List[ItemCatalogo]:
+        itens = sorted(self._tabela(db, tabela).values(), key=lambda item: item.id)
+        if ativo is not None:
+            itens = [item for item in itens if item.ativo == ativo]
+        return itens
+
+    # ============= CORES =============
+
+    def listar_cores(self, db: Session, ativo: Optional[bool] = None) -> List[ItemCatalogo]:
+        """Lista as cores em cache, opcionalmente filtrando por ativo"""
+        return self._listar(db, "cores", ativo)
+
+    def obter_cor(self, db: Session, cor_id: int) -> Optional[ItemCatalogo]:
+        """Obtém uma cor do cache"""
+        return self._tabela(db, "cores").get(cor_id)
+
+    def registrar_cor(self, cor: Cor) -> None:
+        """Atualiza o cache após uma escrita na tabela de cores"""
+        self._registrar("cores", cor)
+
+    # ============= TIPOS =============
+
+    def listar_tipos(self, db: Session, ativo: Optional[bool] = None) -> List[ItemCatalogo]:
+        """Lista os tipos em cache, opcionalmente filtrando por ativo"""
+        return self._listar(db, "tipos", ativo)
+
+    def obter_tipo(self, db: Session, tipo_id: int) -> Optional[ItemCatalogo]:
+        """Obtém um tipo do cache"""
+        return self._tabela(db, "tipos").get(tipo_id)
+
+    def registrar_tipo(self, tipo: Tipo) -> None:
+        """Atualiza o cache após uma escrita na tabela de tipos"""
+        self._registrar("tipos", tipo)
+
+
+# Instância global do cache
+catalogo_cache = CatalogoCache()
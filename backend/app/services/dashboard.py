@@ -0,0 +1,103 @@
+"""
+Estoque Engenho - Dashboard (números da tela inicial)
+"""
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Optional
+
+from sqlalchemy import Integer, Numeric, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Movimentacao, Produto, TipoMovimento
+from app.services.metricas import registro
+
+dashboard_total = registro.contador(
+    "dashboard_total", "Consultas ao dashboard servidas do cache ou calculadas", ("resultado",)
+)
+
+CENTAVOS = Decimal("0.01")
+
+
+class DashboardService:
+    """
+    Totais do estoque calculados numa consulta só e guardados em memória
+
+    Quando vários celulares abrem a tela inicial ao mesmo tempo, só o
+    primeiro consulta o banco: os demais esperam por ele e recebem o mesmo
+    resultado (single-flight), que vale por DASHBOARD_CACHE_SEGUNDOS. O
+    cache é de cada worker do gunicorn.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados: Optional[Dict] = None
+        self._expira_em = 0.0
+
+    def obter(self, db: Session) -> Dict:
+        """Totais do cache ou, se expirados, recalculados"""
+        dados = self._dados
+        if dados is not None and time.monotonic() < self._expira_em:
+            dashboard_total.inc(resultado="cache")
+            return dados
+
+        with self._lock:
+            # Quem esperou pelo lock recebe o que acabou de ser calculado
+            if self._dados is not None and time.monotonic() < self._expira_em:
+                dashboard_total.inc(resultado="cache")
+                return self._dados
+
+            dados = self.calcular(db)
+            self._dados = dados
+            self._expira_em = time.monotonic() + settings.DASHBOARD_CACHE_SEGUNDOS
+            dashboard_total.inc(resultado="consulta")
+            return dados
+
+    @staticmethod
+    def calcular(db: Session) -> Dict:
+        """Calcula todos os totais num único SELECT (movimentações do dia por subconsulta)"""
+        agora = datetime.now()
+        inicio_dia = datetime.combine(date.today(), datetime.min.time())
+
+        def conta(condicao):
+            return func.coalesce(func.sum(case((condicao, 1), else_=0)), 0)
+
+        def valor(preco):
+            return func.coalesce(
+                func.sum(cast(Produto.estoque_atual * func.coalesce(preco, 0), Numeric(16, 2))), 0
+            )
+
+        def movimentacoes_hoje(*filtros):
+            return (
+                select(func.count(Movimentacao.id))
+                .where(Movimentacao.data_movimento >= inicio_dia, *filtros)
+                .scalar_subquery()
+            )
+
+        consulta = select(
+            func.count(Produto.id).label("total_produtos"),
+            cast(func.coalesce(func.sum(Produto.estoque_atual), 0), Integer).label("total_itens"),
+            conta(Produto.estoque_atual <= Produto.estoque_minimo).label("produtos_abaixo_minimo"),
+            conta(Produto.estoque_atual == 0).label("produtos_zerados"),
+            valor(Produto.preco_custo).label("valor_estoque_custo"),
+            valor(Produto.preco_venda).label("valor_estoque_venda"),
+            movimentacoes_hoje().label("movimentacoes_hoje"),
+            movimentacoes_hoje(
+                Movimentacao.tipo_movimento == TipoMovimento.ENTRADA
+            ).label("entradas_hoje"),
+            movimentacoes_hoje(
+                Movimentacao.tipo_movimento == TipoMovimento.SAIDA
+            ).label("saidas_hoje"),
+        ).where(Produto.ativo == True)
+
+        linha = db.execute(consulta).one()._asdict()
+        for campo in ("valor_estoque_custo", "valor_estoque_venda"):
+            linha[campo] = Decimal(str(linha[campo])).quantize(CENTAVOS)
+        linha["atualizado_em"] = agora
+        return linha
+
+
+# Instância global do dashboard
+dashboard_service = DashboardService()
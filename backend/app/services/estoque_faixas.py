@@ -0,0 +1,253 @@
+"""
+Estoque Engenho - Estoque Distribuído em Faixas (SKUs concorridos)
+"""
+import asyncio
+import random
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Column, ForeignKey, Integer, func, update
+from sqlalchemy.orm import Session
+
+from app.database import iniciar_escrita, nova_sessao
+from app.models import Base, Produto, TipoMovimento
+from app.services.versoes import versoes_tabelas
+
+
+class FaixaEstoque(Base):
+    """Parte do estoque de um produto concorrido (uma linha por faixa)"""
+    __tablename__ = "produtos_estoque_faixas"
+
+    produto_id = Column(Integer, ForeignKey("produtos.id"), primary_key=True)
+    faixa = Column(Integer, primary_key=True, autoincrement=False)
+    saldo = Column(Integer, nullable=False, default=0)
+
+
+class EstoqueFaixasService:
+    """
+    Estoque de produtos concorridos dividido em N faixas
+
+    Em promoções, todas as saídas de um SKU disputam a mesma linha de
+    `produtos`. Com o produto distribuído, cada movimentação altera só uma
+    faixa (UPDATE condicional `saldo >= quantidade`), e movimentações
+    simultâneas do mesmo produto raramente esperam umas pelas outras.
+
+    O estoque real é a soma dos saldos das faixas; nenhuma faixa fica
+    negativa. `produtos.estoque_atual` é atualizado na consolidação
+    (periódica e em ajustes), que também redistribui o saldo igualmente
+    entre as faixas.
+
+    Ordem de locks, em todos os caminhos: produto, depois faixas em ordem
+    crescente. Entradas e saídas de produtos distribuídos travam o produto
+    compartilhado (FOR SHARE) e não esperam umas pelas outras; consolidação,
+    ajuste, distribuição e movimentações de produtos sem faixas travam o
+    produto exclusivo e esperam as movimentações em andamento.
+    Com a mesma ordem em todo lugar, um deadlock no InnoDB só acontece
+    quando uma saída passa para o caminho lento; a transação é repetida
+    (ver `database.deadlock`).
+    """
+
+    TENTATIVAS_RAPIDAS = 3
+
+    @staticmethod
+    def _travar_produto(db: Session, produto_id: int, exclusivo: bool) -> Produto:
+        return db.query(Produto).filter(
+            Produto.id == produto_id
+        ).populate_existing().with_for_update(read=not exclusivo).one()
+
+    @staticmethod
+    def _travar_faixas(db: Session, produto_id: int) -> List[FaixaEstoque]:
+        return db.query(FaixaEstoque).filter(
+            FaixaEstoque.produto_id == produto_id
+        ).order_by(FaixaEstoque.faixa).populate_existing().with_for_update().all()
+
+    def _travar(self, db: Session, produto_id: int) -> Tuple[Produto, List[FaixaEstoque]]:
+        """Trava o produto (exclusivo) e as faixas, nessa ordem, e os relê do banco"""
+        produto = self._travar_produto(db, produto_id, exclusivo=True)
+        return produto, self._travar_faixas(db, produto_id)
+
+    @staticmethod
+    def _redistribuir(faixas: List[FaixaEstoque], total: int) -> None:
+        base, resto = divmod(total, len(faixas))
+        for i, faixa in enumerate(faixas):
+            faixa.saldo = base + (1 if i < resto else 0)
+
+    def quantidade_faixas(self, db: Session, produto_id: int) -> int:
+        """Número de faixas do produto (0 = estoque em uma linha só)"""
+        return db.query(func.count(FaixaEstoque.faixa)).filter(
+            FaixaEstoque.produto_id == produto_id
+        ).scalar()
+
+    def total(self, db: Session, produto_id: int) -> Optional[int]:
+        """Estoque real do produto distribuído (None se não estiver distribuído)"""
+        return db.query(func.sum(FaixaEstoque.saldo)).filter(
+            FaixaEstoque.produto_id == produto_id
+        ).scalar()
+
+    def distribuir(self, db: Session, produto: Produto, quantidade_faixas: int) -> None:
+        """Divide o estoque do produto em faixas (ou muda a quantidade de faixas)"""
+        produto, atuais = self._travar(db, produto.id)
+        if atuais:
+            produto.estoque_atual = sum(faixa.saldo for faixa in atuais)
+            for faixa in atuais:
+                db.delete(faixa)
+            db.flush()
+
+        faixas = [
+            FaixaEstoque(produto_id=produto.id, faixa=i) for i in range(quantidade_faixas)
+        ]
+        self._redistribuir(faixas, produto.estoque_atual)
+        db.add_all(faixas)
+
+    def remover(self, db: Session, produto: Produto) -> None:
+        """Volta o estoque do produto para a linha de `produtos`"""
+        produto, faixas = self._travar(db, produto.id)
+        if faixas:
+            produto.estoque_atual = sum(faixa.saldo for faixa in faixas)
+        for faixa in faixas:
+            db.delete(faixa)
+
+    def consolidar(self, db: Session, produto_id: int) -> bool:
+        """
+        Grava a soma das faixas em `produtos.estoque_atual` e redistribui
+
+        Trava o produto e todas as faixas até o fim da transação.
+
+        Returns:
+            True se `produtos.estoque_atual` mudou
+        """
+        produto, faixas = self._travar(db, produto_id)
+        if not faixas:
+            return False
+
+        total = sum(faixa.saldo for faixa in faixas)
+        self._redistribuir(faixas, total)
+        if produto.estoque_atual == total:
+            return False
+        produto.estoque_atual = total
+        return True
+
+    def consolidar_todos(self, db: Session) -> int:
+        """
+        Consolida cada produto distribuído em uma transação curta
+
+        Returns:
+            Quantidade de produtos cujo `estoque_atual` mudou
+        """
+        alterados = 0
+        produto_ids = [
+            produto_id for (produto_id,) in
+            db.query(FaixaEstoque.produto_id).distinct().order_by(FaixaEstoque.produto_id)
+        ]
+        db.rollback()
+        for produto_id in produto_ids:
+            iniciar_escrita(db)
+            if self.consolidar(db, produto_id):
+                alterados += 1
+            db.commit()
+        return alterados
+
+    async def consolidar_periodicamente(self, intervalo: float) -> None:
+        """Consolida os produtos distribuídos a cada `intervalo` segundos (tarefa do worker)"""
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                alterados = await asyncio.to_thread(self._consolidar_em_sessao)
+            except Exception as e:
+                print(f"⚠️ Falha ao consolidar estoque em faixas: {e}")
+                continue
+            if alterados:
+                versoes_tabelas.incrementar("produtos")
+
+    def _consolidar_em_sessao(self) -> int:
+        db = nova_sessao()
+        try:
+            return self.consolidar_todos(db)
+        finally:
+            db.close()
+
+    def movimentar(
+        self,
+        db: Session,
+        produto: Produto,
+        tipo_movimento: TipoMovimento,
+        quantidade: int
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Aplica a movimentação nas faixas do produto, se ele estiver distribuído
+
+        Returns:
+            (estoque_anterior, estoque_atual), ou None se o produto não
+            estiver distribuído (a movimentação segue pelo caminho normal)
+
+        Raises:
+            HTTPException 400 se a saída deixaria o estoque negativo
+        """
+        # O produto é travado antes de qualquer faixa (ordem de locks da classe).
+        # O ajuste e o caminho normal (produto sem faixas) regravam
+        # `produtos.estoque_atual`: travam exclusivo já aqui. Promover um lock
+        # compartilhado depois faria duas movimentações simultâneas do mesmo
+        # produto terminarem em deadlock. A contagem sem lock só escolhe o modo
+        ajuste = tipo_movimento == TipoMovimento.AJUSTE
+        distribuido = self.quantidade_faixas(db, produto.id) > 0
+        self._travar_produto(db, produto.id, exclusivo=ajuste or not distribuido)
+
+        # Leitura por colunas: sempre do banco, nunca do identity map da sessão
+        faixas = db.query(FaixaEstoque.faixa, FaixaEstoque.saldo).filter(
+            FaixaEstoque.produto_id == produto.id
+        ).all()
+        if not faixas:
+            return None
+
+        if tipo_movimento == TipoMovimento.ENTRADA:
+            self._alterar_faixa(db, produto.id, random.choice(faixas)[0], quantidade)
+            atual = self.total(db, produto.id)
+            return atual - quantidade, atual
+
+        if tipo_movimento == TipoMovimento.SAIDA:
+            # Caminho rápido: uma faixa que (pela leitura acima) tem saldo.
+            # Sorteia as faixas, mas tenta em ordem crescente, como as travas
+            candidatas = [faixa for faixa, saldo in faixas if saldo >= quantidade]
+            sorteadas = random.sample(candidatas, min(len(candidatas), self.TENTATIVAS_RAPIDAS))
+            for faixa in sorted(sorteadas):
+                if self._alterar_faixa(db, produto.id, faixa, -quantidade):
+                    atual = self.total(db, produto.id)
+                    return atual + quantidade, atual
+
+        # Ajuste, ou saída que nenhuma faixa atende sozinha: trava todas as faixas.
+        # A saída não mexe no produto (o lock compartilhado basta); o ajuste
+        # já está com o produto travado exclusivo
+        if ajuste:
+            produto, faixas_travadas = self._travar(db, produto.id)
+        else:
+            faixas_travadas = self._travar_faixas(db, produto.id)
+        anterior = sum(faixa.saldo for faixa in faixas_travadas)
+        if tipo_movimento == TipoMovimento.SAIDA:
+            atual = anterior - quantidade
+            if atual < 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Estoque insuficiente. Atual: {anterior}, Solicitado: {quantidade}"
+                )
+        else:  # AJUSTE
+            atual = quantidade
+            produto.estoque_atual = atual
+
+        self._redistribuir(faixas_travadas, atual)
+        return anterior, atual
+
+    @staticmethod
+    def _alterar_faixa(db: Session, produto_id: int, faixa: int, delta: int) -> bool:
+        """Soma `delta` ao saldo da faixa sem deixá-lo negativo"""
+        condicoes = [FaixaEstoque.produto_id == produto_id, FaixaEstoque.faixa == faixa]
+        if delta < 0:
+            condicoes.append(FaixaEstoque.saldo >= -delta)
+        resultado = db.execute(
+            update(FaixaEstoque).where(*condicoes).values(saldo=FaixaEstoque.saldo + delta),
+            execution_options={"synchronize_session": False}
+        )
+        return resultado.rowcount == 1
+
+
+# Instância global do serviço
+estoque_faixas_service = EstoqueFaixasService()
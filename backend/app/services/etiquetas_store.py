@@ -0,0 +1,143 @@
+"""
+Estoque Engenho - Armazém de Etiquetas Pré-renderizadas
+"""
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from app.config import settings
+from app.services.barcode_service import barcode_service
+from app.services.metricas import registro
+
+etiquetas_armazem_total = registro.contador(
+    "etiquetas_armazem_total", "Etiquetas servidas do armazém ou renderizadas na hora", ("resultado",)
+)
+
+# Muda quando o layout da etiqueta muda: invalida todas as etiquetas gravadas
+VERSAO_LAYOUT = "3"
+
+
+def dados_etiqueta(produto) -> Dict:
+    """Campos do produto que aparecem na etiqueta"""
+    return {
+        "codigo_barras": produto.codigo_barras,
+        "nome_produto": produto.nome,
+        "tipo_nome": produto.tipo.nome,
+        "cor_nome": produto.cor.nome,
+        "preco": float(produto.preco_venda) if produto.preco_venda else None
+    }
+
+
+class ArmazemEtiquetas:
+    """
+    Etiquetas PNG gravadas em disco, endereçadas pelo conteúdo
+
+    A chave é o hash dos campos impressos na etiqueta: quando nome, preço,
+    tipo ou cor mudam, a chave muda e a etiqueta antiga simplesmente deixa
+    de ser encontrada. Criação e edição de produtos agendam a renderização
+    em segundo plano; a rota de etiqueta só renderiza na hora quando o
+    arquivo ainda não existe. O diretório é compartilhado pelos workers.
+    """
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        self._em_andamento: Dict[str, threading.Event] = {}
+
+    @staticmethod
+    def chave(dados: Dict) -> str:
+        conteudo = json.dumps([VERSAO_LAYOUT, dados], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode()).hexdigest()
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, chave[:2], f"{chave}.png")
+
+    def ler(self, chave: str) -> Optional[bytes]:
+        """Conteúdo gravado para a chave, se existir"""
+        try:
+            with open(self._caminho(chave), "rb") as arquivo:
+                return arquivo.read()
+        except FileNotFoundError:
+            return None
+
+    def obter(self, dados: Dict) -> bytes:
+        """Etiqueta do armazém; renderiza e grava se ainda não existir"""
+        chave = self.chave(dados)
+        conteudo = self.ler(chave)
+        if conteudo is not None:
+            etiquetas_armazem_total.inc(resultado="armazem")
+            return conteudo
+
+        etiquetas_armazem_total.inc(resultado="renderizada")
+        return self._renderizar(chave, dados)
+
+    def pre_renderizar(self, dados: Dict, anteriores: Optional[Dict] = None) -> None:
+        """
+        Grava a etiqueta se ainda não existir (tarefa em segundo plano)
+
+        Args:
+            dados: Campos atuais da etiqueta
+            anteriores: Campos antes da edição; a etiqueta antiga é removida
+        """
+        chave = self.chave(dados)
+        if self.ler(chave) is None:
+            self._renderizar(chave, dados)
+
+        if anteriores:
+            chave_anterior = self.chave(anteriores)
+            if chave_anterior != chave:
+                try:
+                    os.remove(self._caminho(chave_anterior))
+                except FileNotFoundError:
+                    pass
+
+    def _renderizar(self, chave: str, dados: Dict) -> bytes:
+        # Uma renderização por chave no worker: quem chega durante a
+        # pré-renderização espera por ela em vez de renderizar de novo
+        with self._lock:
+            evento = self._em_andamento.get(chave)
+            dono = evento is None
+            if dono:
+                evento = self._em_andamento[chave] = threading.Event()
+
+        if not dono:
+            evento.wait()
+            conteudo = self.ler(chave)
+            if conteudo is not None:
+                return conteudo
+            return base64.b64decode(barcode_service.gerar_etiqueta_produto(**dados))
+
+        try:
+            conteudo = base64.b64decode(barcode_service.gerar_etiqueta_produto(**dados))
+            try:
+                self._gravar(chave, conteudo)
+            except OSError as e:
+                # Sem disco a etiqueta ainda é servida, só não fica guardada
+                print(f"⚠️ Etiqueta não gravada no armazém: {e}")
+            return conteudo
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            evento.set()
+
+    def _gravar(self, chave: str, conteudo: bytes) -> None:
+        # Grava num temporário e renomeia: quem lê nunca vê um arquivo pela metade
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+        try:
+            with os.fdopen(descritor, "wb") as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+
+# Instância global do armazém
+armazem_etiquetas = ArmazemEtiquetas(settings.ETIQUETAS_DIR)
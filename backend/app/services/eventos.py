@@ -0,0 +1,237 @@
+"""
+Estoque Engenho - Eventos de Estoque em Tempo Real
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class FiltroEventos:
+    """Filtros de um assinante do stream"""
+    produto_id: Optional[int] = None
+    tipo_id: Optional[int] = None
+    apenas_baixo_estoque: bool = False
+
+    def aceita(self, evento: Dict) -> bool:
+        if self.produto_id is not None and evento["produto_id"] != self.produto_id:
+            return False
+        if self.tipo_id is not None and evento["tipo_id"] != self.tipo_id:
+            return False
+        if self.apenas_baixo_estoque and evento["estoque_atual"] > evento["estoque_minimo"]:
+            return False
+        return True
+
+
+class Assinante:
+    """
+    Conexão inscrita no stream, com buffer limitado
+
+    Quando o cliente não consome rápido o bastante, os eventos mais antigos
+    são descartados e contados em `perdidos`, para que o cliente saiba que
+    precisa ressincronizar (GET /sync).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, filtro: FiltroEventos, tamanho_buffer: int):
+        self.loop = loop
+        self.filtro = filtro
+        self.sinal = asyncio.Event()
+        self._lock = threading.Lock()
+        self._fila: Deque[Tuple[int, str]] = deque()
+        self._tamanho_buffer = tamanho_buffer
+        self.perdidos = 0
+
+    def entregar(self, sequencia: int, dados: str) -> None:
+        """Enfileira um evento (chamado de qualquer thread)"""
+        with self._lock:
+            if len(self._fila) >= self._tamanho_buffer:
+                self._fila.popleft()
+                self.perdidos += 1
+            self._fila.append((sequencia, dados))
+        try:
+            self.loop.call_soon_threadsafe(self.sinal.set)
+        except RuntimeError:
+            # Loop já encerrado: a conexão está sendo finalizada
+            pass
+
+    def marcar_perdidos(self, quantidade: int) -> None:
+        """Conta eventos que não chegaram até este worker (anel sobrescrito)"""
+        with self._lock:
+            self.perdidos += quantidade
+        try:
+            self.loop.call_soon_threadsafe(self.sinal.set)
+        except RuntimeError:
+            pass
+
+    def retirar(self) -> Tuple[List[Tuple[int, str]], int]:
+        """Retira todos os eventos pendentes e a contagem de descartados"""
+        with self._lock:
+            eventos = list(self._fila)
+            self._fila.clear()
+            perdidos, self.perdidos = self.perdidos, 0
+            self.sinal.clear()
+        return eventos, perdidos
+
+
+class _Contador:
+    """Substituto de multiprocessing.Value sem memória compartilhada"""
+    value = 0
+
+
+class CanalEventos:
+    """
+    Anel de eventos em memória compartilhada entre os workers
+
+    Com o gunicorn em preload, o anel é criado no processo mestre e todos os
+    workers publicam e leem nele: um assinante recebe as movimentações
+    atendidas por qualquer worker, na mesma sequência. Cada evento ocupa uma
+    posição de TAMANHO_EVENTO bytes; um worker que atrase mais de EVENTOS
+    posições perde os eventos sobrescritos (seus assinantes recebem
+    `perdidos`).
+    """
+
+    EVENTOS = 4096
+    TAMANHO_EVENTO = 1024
+
+    def __init__(self):
+        try:
+            sequencia = multiprocessing.Value("q", 0)
+            self._lock = sequencia.get_lock()
+            self._sequencia = sequencia.get_obj()
+            self._dados = multiprocessing.RawArray("c", self.EVENTOS * self.TAMANHO_EVENTO)
+            self._tamanhos = multiprocessing.RawArray("H", self.EVENTOS)
+        except (ImportError, OSError):
+            # Sem semáforos POSIX (ex.: /dev/shm indisponível): anel por processo
+            self._lock = threading.Lock()
+            self._sequencia = _Contador()
+            self._dados = bytearray(self.EVENTOS * self.TAMANHO_EVENTO)
+            self._tamanhos = [0] * self.EVENTOS
+
+    @property
+    def sequencia(self) -> int:
+        """Sequência do último evento publicado"""
+        return self._sequencia.value
+
+    def publicar(self, dados: bytes) -> None:
+        if len(dados) > self.TAMANHO_EVENTO:
+            print(f"⚠️ Evento de {len(dados)} bytes descartado (limite: {self.TAMANHO_EVENTO})")
+            return
+        with self._lock:
+            sequencia = self._sequencia.value + 1
+            posicao = sequencia % self.EVENTOS
+            inicio = posicao * self.TAMANHO_EVENTO
+            self._dados[inicio:inicio + len(dados)] = dados
+            self._tamanhos[posicao] = len(dados)
+            self._sequencia.value = sequencia
+
+    def ler(self, ultima: int) -> Tuple[List[Tuple[int, bytes]], int]:
+        """Eventos publicados depois da sequência `ultima` e quantos foram sobrescritos"""
+        with self._lock:
+            atual = self._sequencia.value
+            primeira = max(ultima + 1, atual - self.EVENTOS + 1)
+            eventos = []
+            for sequencia in range(primeira, atual + 1):
+                posicao = sequencia % self.EVENTOS
+                inicio = posicao * self.TAMANHO_EVENTO
+                eventos.append((sequencia, bytes(self._dados[inicio:inicio + self._tamanhos[posicao]])))
+        return eventos, primeira - (ultima + 1)
+
+
+class EventosService:
+    """
+    Publica eventos de movimentação e de produto para os assinantes
+
+    Os eventos passam pelo `CanalEventos` compartilhado. Em cada worker com
+    assinantes, uma thread lê o canal a cada INTERVALO_LEITURA segundos e
+    entrega os eventos aos assinantes daquele worker.
+    """
+
+    INTERVALO_LEITURA = 0.05
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assinantes: List[Assinante] = []
+        self._canal = CanalEventos()
+        # Processo em que a thread de leitura roda (ela não sobrevive ao fork)
+        self._pid_leitor: Optional[int] = None
+
+    def assinar(self, filtro: FiltroEventos, tamanho_buffer: int) -> Assinante:
+        assinante = Assinante(asyncio.get_running_loop(), filtro, tamanho_buffer)
+        with self._lock:
+            self._assinantes = self._assinantes + [assinante]
+            if self._pid_leitor != os.getpid():
+                self._pid_leitor = os.getpid()
+                threading.Thread(
+                    target=self._ler_canal, args=(self._canal.sequencia,),
+                    name="eventos", daemon=True
+                ).start()
+        return assinante
+
+    def cancelar(self, assinante: Assinante) -> None:
+        with self._lock:
+            self._assinantes = [a for a in self._assinantes if a is not assinante]
+
+    def publicar(self, evento: Dict) -> None:
+        """Publica o evento para os assinantes de todos os workers"""
+        self._canal.publicar(json.dumps(evento, default=str, separators=(",", ":")).encode())
+
+    def _ler_canal(self, ultima: int) -> None:
+        """Thread do worker: entrega os eventos do canal aos assinantes locais"""
+        while True:
+            time.sleep(self.INTERVALO_LEITURA)
+            if self._canal.sequencia == ultima:
+                continue
+            eventos, perdidos = self._canal.ler(ultima)
+            ultima = eventos[-1][0]
+            self._entregar(eventos, perdidos)
+
+    def _entregar(self, eventos: List[Tuple[int, bytes]], perdidos: int) -> None:
+        """Entrega aos assinantes cujo filtro aceita cada evento"""
+        assinantes = self._assinantes
+        if not assinantes:
+            return
+        if perdidos:
+            for assinante in assinantes:
+                assinante.marcar_perdidos(perdidos)
+        for sequencia, dados in eventos:
+            evento = json.loads(dados)
+            texto = dados.decode()
+            for assinante in assinantes:
+                if assinante.filtro.aceita(evento):
+                    assinante.entregar(sequencia, texto)
+
+    @staticmethod
+    def evento_movimentacao(movimentacao, produto) -> Dict:
+        """Monta o evento compacto de uma movimentação (antes do commit)"""
+        return {
+            "evento": "movimentacao",
+            "tipo_movimento": movimentacao.tipo_movimento.name,
+            "quantidade": movimentacao.quantidade,
+            "produto_id": produto.id,
+            "tipo_id": produto.tipo_id,
+            "estoque_atual": movimentacao.estoque_atual,
+            "estoque_minimo": produto.estoque_minimo
+        }
+
+    @staticmethod
+    def evento_produto(produto, acao: str) -> Dict:
+        """Monta o evento compacto de alteração de produto"""
+        return {
+            "evento": "produto",
+            "acao": acao,
+            "produto_id": produto.id,
+            "tipo_id": produto.tipo_id,
+            "estoque_atual": produto.estoque_atual,
+            "estoque_minimo": produto.estoque_minimo,
+            "ativo": produto.ativo
+        }
+
+
+# Instância global do serviço
+eventos_service = EventosService()
@@ -0,0 +1,156 @@
+"""
+Estoque Engenho - Gravação em Grupo (group commit)
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import TENTATIVAS_DEADLOCK, deadlock, iniciar_escrita, nova_sessao
+from app.services.metricas import registro
+
+lote_tamanho = registro.histograma(
+    "db_group_commit_batch_size", "Movimentações confirmadas por transação (group commit)",
+    faixas=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+lote_segundos = registro.histograma(
+    "db_group_commit_batch_duration_seconds", "Tempo de gravação de cada lote (group commit)",
+    faixas=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+class GravacaoEmGrupo:
+    """
+    Agrupa escritas concorrentes em uma única transação
+
+    Cada chamada de `executar` entra numa fila; uma thread gravadora junta
+    as que chegarem dentro da janela (até o tamanho máximo do lote) e roda
+    todas na mesma transação, cada uma em seu SAVEPOINT. Uma operação que
+    falha (ex.: estoque insuficiente) desfaz só o próprio savepoint; as
+    demais seguem e o lote tem um único commit (um fsync).
+
+    O resultado ou o erro de cada operação só é entregue depois do commit,
+    então quem chamou nunca vê uma escrita que ainda pode ser desfeita.
+    Erros do banco (deadlock, conexão perdida) desfazem a transação inteira,
+    não só o savepoint: derrubam o lote, que é repetido se foi um deadlock.
+    """
+
+    def __init__(
+        self,
+        fabrica_sessao: Callable[..., Session],
+        janela_ms: float,
+        lote_max: int,
+        preparar_sessao: Optional[Callable[[Session], None]] = None
+    ):
+        self._fabrica_sessao = fabrica_sessao
+        self.janela = janela_ms / 1000
+        self.lote_max = lote_max
+        self._preparar_sessao = preparar_sessao
+        self._fila: "queue.Queue[Tuple[Callable[[Session], Any], Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+
+    def executar(self, operacao: Callable[[Session], Any]) -> Any:
+        """
+        Executa `operacao(sessao)` no próximo lote e aguarda o commit
+
+        A operação não deve chamar commit/rollback. Exceções levantadas por
+        ela (ou pelo commit do lote) são relançadas aqui.
+        """
+        self._garantir_gravadora()
+        futuro: Future = Future()
+        self._fila.put((operacao, futuro))
+        return futuro.result()
+
+    def _garantir_gravadora(self) -> None:
+        # Threads não sobrevivem ao fork: cada worker inicia a sua
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._fila = queue.Queue()
+                threading.Thread(
+                    target=self._gravar_continuamente, name="gravacao-em-grupo", daemon=True
+                ).start()
+                self._pid = pid
+
+    def _gravar_continuamente(self) -> None:
+        fila = self._fila
+        while True:
+            lote = [fila.get()]
+            limite = time.monotonic() + self.janela
+            while len(lote) < self.lote_max:
+                restante = limite - time.monotonic()
+                try:
+                    lote.append(fila.get(timeout=restante) if restante > 0 else fila.get_nowait())
+                except queue.Empty:
+                    break
+            self._gravar_lote(lote)
+
+    def _gravar_lote(self, lote: List[Tuple[Callable[[Session], Any], Future]]) -> None:
+        inicio = time.perf_counter()
+        for tentativa in range(1, TENTATIVAS_DEADLOCK + 1):
+            try:
+                resultados = self._executar_lote(lote)
+                break
+            except Exception as e:
+                if tentativa < TENTATIVAS_DEADLOCK and deadlock(e):
+                    continue
+                # Falha do lote inteiro (ex.: conexão perdida): todos recebem o erro
+                for _, futuro in lote:
+                    futuro.set_exception(e)
+                return
+
+        lote_tamanho.observar(len(lote))
+        lote_segundos.observar(time.perf_counter() - inicio)
+        for futuro, resultado, erro in resultados:
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(resultado)
+
+    def _executar_lote(
+        self,
+        lote: List[Tuple[Callable[[Session], Any], Future]]
+    ) -> List[Tuple[Future, Any, Optional[BaseException]]]:
+        """Roda as operações do lote numa transação e faz o commit"""
+        resultados: List[Tuple[Future, Any, Optional[BaseException]]] = []
+
+        # expire_on_commit=False: os objetos devolvidos continuam legíveis
+        # depois que a sessão do lote é fechada
+        db = self._fabrica_sessao(expire_on_commit=False)
+        try:
+            if self._preparar_sessao:
+                self._preparar_sessao(db)
+            for operacao, futuro in lote:
+                try:
+                    with db.begin_nested():
+                        resultado = operacao(db)
+                    resultados.append((futuro, resultado, None))
+                except OperationalError:
+                    raise
+                except Exception as e:
+                    resultados.append((futuro, None, e))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return resultados
+
+
+# Instância global (usada quando DB_GROUP_COMMIT=True)
+gravacao_em_grupo = GravacaoEmGrupo(
+    nova_sessao,
+    settings.DB_GROUP_COMMIT_JANELA_MS,
+    settings.DB_GROUP_COMMIT_LOTE_MAX,
+    preparar_sessao=iniciar_escrita
+)
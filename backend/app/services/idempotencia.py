@@ -0,0 +1,124 @@
+"""
+Estoque Engenho - Chaves de Idempotência
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import Column, String, Integer, DateTime, CHAR, Index
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Base
+
+
+class ChaveIdempotencia(Base):
+    """Chave enviada no cabeçalho Idempotency-Key e a movimentação que ela gerou"""
+    __tablename__ = "idempotencia_movimentacoes"
+    __table_args__ = (Index("idx_criado_em", "criado_em"),)
+
+    chave = Column(String(64), primary_key=True)
+    assinatura = Column(CHAR(64), nullable=False)
+    movimentacao_id = Column(Integer, nullable=False)
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class IdempotenciaService:
+    """
+    Registro de chaves de idempotência das movimentações
+
+    A chave é gravada na mesma transação da movimentação, então uma
+    movimentação nunca é aplicada duas vezes para a mesma chave. Um LRU em
+    memória atende as repetições mais comuns sem ir ao banco; fora dele a
+    busca é por chave primária.
+    """
+
+    def __init__(self, tamanho_lru: int = 4096):
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self._tamanho_lru = tamanho_lru
+        self._ultima_limpeza = 0.0
+
+    @staticmethod
+    def assinatura(tipo_movimento: str, codigo_barras: str, quantidade: int) -> str:
+        """Resumo da requisição, para recusar chaves reaproveitadas em outra operação"""
+        conteudo = f"{tipo_movimento}|{codigo_barras}|{quantidade}"
+        return hashlib.sha256(conteudo.encode()).hexdigest()
+
+    def buscar(self, db: Session, chave: str) -> Optional[Tuple[str, int]]:
+        """
+        Busca uma chave já utilizada
+
+        Returns:
+            Tupla (assinatura, movimentacao_id) ou None se a chave é nova
+        """
+        with self._lock:
+            encontrado = self._lru.get(chave)
+            if encontrado and encontrado[2] > time.monotonic():
+                self._lru.move_to_end(chave)
+                return encontrado[:2]
+
+        registro = db.get(ChaveIdempotencia, chave)
+        if not registro:
+            return None
+
+        if registro.criado_em < self._limite_expiracao():
+            # Chave expirada que ainda não passou pela limpeza: libera para reuso
+            db.delete(registro)
+            db.flush()
+            return None
+
+        self.memorizar(
+            chave, registro.assinatura, registro.movimentacao_id, registro.criado_em
+        )
+        return registro.assinatura, registro.movimentacao_id
+
+    def registrar(self, db: Session, chave: str, assinatura: str, movimentacao_id: int) -> None:
+        """
+        Adiciona a chave à transação atual (o commit fica a cargo de quem chama)
+        """
+        db.add(ChaveIdempotencia(
+            chave=chave,
+            assinatura=assinatura,
+            movimentacao_id=movimentacao_id
+        ))
+
+    def memorizar(
+        self,
+        chave: str,
+        assinatura: str,
+        movimentacao_id: int,
+        criado_em: Optional[datetime] = None
+    ) -> None:
+        """Guarda a chave no LRU; chamar apenas depois do commit"""
+        validade = timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+        if criado_em is not None:
+            validade -= datetime.now() - criado_em
+        expira = time.monotonic() + validade.total_seconds()
+        with self._lock:
+            self._lru[chave] = (assinatura, movimentacao_id, expira)
+            self._lru.move_to_end(chave)
+            while len(self._lru) > self._tamanho_lru:
+                self._lru.popitem(last=False)
+
+    def limpar_expiradas(self, db: Session) -> None:
+        """Remove chaves expiradas, no máximo uma vez por minuto"""
+        agora = time.monotonic()
+        if agora - self._ultima_limpeza < 60:
+            return
+        self._ultima_limpeza = agora
+
+        db.query(ChaveIdempotencia).filter(
+            ChaveIdempotencia.criado_em < self._limite_expiracao()
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def _limite_expiracao() -> datetime:
+        return datetime.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+
+
+# Instância global do serviço
+idempotencia_service = IdempotenciaService()
@@ -0,0 +1,117 @@
+"""
+Estoque Engenho - ZIP de Códigos de Barras e Etiquetas (streaming)
+"""
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+# Item do pacote: (nome do arquivo no ZIP, função que renderiza o conteúdo)
+ItemZip = Tuple[str, Callable[[], bytes]]
+
+
+class _SaidaZip:
+    """
+    Destino do ZipFile que só acumula o que foi escrito
+
+    Sem tell()/seek() o zipfile grava cada entrada com data descriptor, sem
+    voltar ao cabeçalho: o ZIP pode ir para o cliente enquanto é montado.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self) -> None:
+        pass
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+class PacoteImagens:
+    """
+    Monta ZIPs de imagens renderizadas em paralelo
+
+    As renderizações rodam num pool de ZIP_WORKERS threads por worker do
+    gunicorn, compartilhado pelos pedidos. Cada entrada vai para o ZIP (e
+    para o cliente) assim que fica pronta, na ordem em que terminam; no
+    máximo 2 x ZIP_WORKERS renderizações ficam à frente do cliente, então a
+    memória não cresce com o tamanho do pedido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def _obter_pool(self) -> ThreadPoolExecutor:
+        # Threads não sobrevivem ao fork: cada worker cria o seu pool
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=settings.ZIP_WORKERS, thread_name_prefix="zip"
+                    )
+                    self._pid = pid
+        return self._pool
+
+    def gerar(self, itens: Iterable[ItemZip]) -> Iterator[bytes]:
+        """
+        Gera o ZIP em pedaços (para StreamingResponse)
+
+        Uma renderização que falha não interrompe o pacote: o arquivo fica
+        de fora e o motivo vai para `erros.txt` no fim do ZIP.
+        """
+        pool = self._obter_pool()
+        janela = 2 * settings.ZIP_WORKERS
+        saida = _SaidaZip()
+        pendentes: Dict[Future, str] = {}
+        erros: List[str] = []
+        restantes = iter(itens)
+
+        try:
+            with zipfile.ZipFile(saida, "w") as arquivo_zip:
+                while True:
+                    while len(pendentes) < janela:
+                        item = next(restantes, None)
+                        if item is None:
+                            break
+                        nome, funcao = item
+                        pendentes[pool.submit(funcao)] = nome
+                    if not pendentes:
+                        break
+
+                    prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for futuro in prontos:
+                        nome = pendentes.pop(futuro)
+                        try:
+                            conteudo = futuro.result()
+                        except Exception as e:
+                            erros.append(f"{nome}: {e}")
+                            continue
+                        # PNG/WebP já são comprimidos; SVG é texto e comprime bem
+                        compressao = zipfile.ZIP_DEFLATED if nome.endswith(".svg") else zipfile.ZIP_STORED
+                        arquivo_zip.writestr(nome, conteudo, compress_type=compressao)
+                    yield saida.esvaziar()
+
+                if erros:
+                    arquivo_zip.writestr("erros.txt", "\n".join(erros), compress_type=zipfile.ZIP_DEFLATED)
+            yield saida.esvaziar()
+        finally:
+            # Cliente desconectou (ou erro): não renderiza o que ainda não começou
+            for futuro in pendentes:
+                futuro.cancel()
+
+
+# Instância global do pacote
+pacote_imagens = PacoteImagens()
@@ -0,0 +1,342 @@
+"""
+Estoque Engenho - Fila de Jobs (exportações e lotes de etiquetas)
+"""
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set, Tuple, Union
+
+from sqlalchemy import CHAR, Column, DateTime, Index, Integer, String, Text, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import nova_sessao
+from app.models import Base
+
+# Estados de um job
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+EXPIRADO = "expirado"
+
+# Resultado de um executor: (conteúdo, nome do arquivo, media type); o conteúdo
+# pode ser o caminho de um arquivo de `FilaJobs.arquivo_temporario`
+Resultado = Tuple[Union[bytes, str], str, str]
+FuncaoJob = Callable[[Session, Dict, Callable[[int, int], None]], Resultado]
+
+
+class Job(Base):
+    """Job em segundo plano e o arquivo que ele gerou"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("idx_jobs_status", "status"),
+        Index("idx_jobs_expira_em", "expira_em"),
+    )
+
+    id = Column(CHAR(32), primary_key=True)
+    tipo = Column(String(30), nullable=False)
+    status = Column(String(12), nullable=False, default=PENDENTE)
+    parametros = Column(Text, nullable=False)
+    progresso = Column(Integer, nullable=False, default=0)  # 0 a 100
+    erro = Column(String(255))
+    processo = Column(String(100))  # host:pid que está executando
+    nome_arquivo = Column(String(255))
+    media_type = Column(String(100))
+    tamanho_bytes = Column(Integer)
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.now)
+    concluido_em = Column(DateTime)
+    expira_em = Column(DateTime)
+
+
+class JobInterrompido(Exception):
+    """O worker está encerrando: o job volta para a fila"""
+
+
+class JobPerdido(Exception):
+    """O job voltou para a fila e foi reivindicado de novo: este worker para sem gravar nada"""
+
+
+class FilaJobs:
+    """
+    Fila local de jobs com estado persistido no banco
+
+    Cada job é uma linha em `jobs`; o resultado vai para um arquivo em
+    JOBS_DIR. Os jobs rodam num pool de threads limitado (JOBS_WORKERS por
+    worker do gunicorn), fora das threads que atendem requisições. Um job é
+    reivindicado com um UPDATE condicional (status pendente -> executando),
+    então vários workers podem varrer a mesma fila sem executá-lo duas vezes.
+
+    A varredura periódica retoma jobs pendentes (ex.: após um restart),
+    devolve à fila jobs presos em "executando" por um processo que morreu e
+    apaga resultados expirados.
+    """
+
+    def __init__(self):
+        self._funcoes: Dict[str, FuncaoJob] = {}
+        self._agendados: Set[str] = set()  # jobs já na fila do pool deste processo
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._encerrando = False
+
+    @property
+    def processo(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def registrar(self, tipo: str, funcao: FuncaoJob) -> None:
+        """
+        Registra a função que executa os jobs de um tipo
+
+        A função recebe (sessão, parâmetros, progresso) e devolve
+        (conteúdo, nome do arquivo, media type). Resultados grandes podem
+        ser gravados aos poucos num `arquivo_temporario()`, devolvendo o
+        caminho no lugar do conteúdo. `progresso(feito, total)` deve ser
+        chamado com frequência: também é o sinal de vida do job.
+        """
+        self._funcoes[tipo] = funcao
+
+    def _obter_pool(self) -> ThreadPoolExecutor:
+        # Threads não sobrevivem ao fork: cada worker cria o seu pool
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=settings.JOBS_WORKERS, thread_name_prefix="job"
+                    )
+                    self._agendados = set()
+                    self._pid = pid
+        return self._pool
+
+    # ============= SUBMISSÃO E CONSULTA =============
+
+    def pendentes(self, db: Session) -> int:
+        return db.query(Job).filter(Job.status.in_((PENDENTE, EXECUTANDO))).count()
+
+    def submeter(self, db: Session, tipo: str, parametros: Dict, job_id: Optional[str] = None) -> Job:
+        """
+        Grava o job como pendente e o agenda no pool deste worker
+
+        `job_id` fixo torna a submissão idempotente: a segunda tentativa com
+        o mesmo id falha com IntegrityError (usado pelos jobs agendados).
+        """
+        if tipo not in self._funcoes:
+            raise ValueError(f"Tipo de job desconhecido: {tipo}")
+
+        job = Job(
+            id=job_id or uuid.uuid4().hex,
+            tipo=tipo,
+            status=PENDENTE,
+            parametros=json.dumps(parametros)
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self._agendar(job.id)
+        return job
+
+    def _agendar(self, job_id: str) -> None:
+        pool = self._obter_pool()
+        with self._lock:
+            if job_id in self._agendados:
+                return
+            self._agendados.add(job_id)
+        pool.submit(self._executar, job_id)
+
+    def caminho_resultado(self, job_id: str) -> str:
+        return os.path.join(settings.JOBS_DIR, job_id)
+
+    # ============= EXECUÇÃO =============
+
+    def _reivindicar(self, db: Session, job_id: str) -> bool:
+        agora = datetime.now()
+        resultado = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == PENDENTE)
+            .values(status=EXECUTANDO, processo=self.processo, progresso=0, atualizado_em=agora),
+            execution_options={"synchronize_session": False}
+        )
+        db.commit()
+        return resultado.rowcount == 1
+
+    def _atualizar(self, job_id: str, **valores) -> bool:
+        """
+        Grava o estado do job numa transação curta, se ele ainda for deste processo
+
+        Um worker parado por mais de JOBS_TIMEOUT_SEGUNDOS perde o job para
+        a varredura, e outro worker pode reivindicá-lo: daí em diante as
+        escritas do primeiro não encontram a linha.
+
+        Returns:
+            False se o job não está mais executando neste processo
+        """
+        valores["atualizado_em"] = datetime.now()
+        db = nova_sessao()
+        try:
+            resultado = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == EXECUTANDO, Job.processo == self.processo)
+                .values(**valores),
+                execution_options={"synchronize_session": False}
+            )
+            db.commit()
+            return resultado.rowcount == 1
+        finally:
+            db.close()
+
+    def _executar(self, job_id: str) -> None:
+        try:
+            if not self._encerrando:  # senão continua pendente para o próximo worker
+                self._executar_job(job_id)
+        finally:
+            with self._lock:
+                self._agendados.discard(job_id)
+
+    def _executar_job(self, job_id: str) -> None:
+        db = nova_sessao()
+        try:
+            if not self._reivindicar(db, job_id):
+                return  # já executado por outro worker
+
+            job = db.get(Job, job_id)
+            funcao = self._funcoes[job.tipo]
+            parametros = json.loads(job.parametros)
+
+            ultimo = {"momento": 0.0, "percentual": -1}
+            intervalo_heartbeat = settings.JOBS_TIMEOUT_SEGUNDOS / 3
+
+            def progresso(feito: int, total: int) -> None:
+                if self._encerrando:
+                    raise JobInterrompido()
+                percentual = min(99, int(feito * 100 / total)) if total else 0
+                decorrido = time.monotonic() - ultimo["momento"]
+                # No máximo uma escrita por segundo; com o percentual parado (ou
+                # sem total), escreve mesmo assim antes de a varredura achar o job morto
+                if decorrido >= 1 and (
+                    percentual != ultimo["percentual"] or decorrido >= intervalo_heartbeat
+                ):
+                    ultimo.update(momento=time.monotonic(), percentual=percentual)
+                    if not self._atualizar(job_id, progresso=percentual):
+                        raise JobPerdido()
+
+            try:
+                conteudo, nome_arquivo, media_type = funcao(db, parametros, progresso)
+                tamanho = self._gravar_resultado(job_id, conteudo)
+            except JobPerdido:
+                print(f"⚠️ Job {job_id} reivindicado por outro worker; execução descartada")
+                return
+            except JobInterrompido:
+                self._atualizar(job_id, status=PENDENTE, processo=None, progresso=0)
+                return
+            except Exception as e:
+                self._atualizar(job_id, status=ERRO, erro=str(e)[:255], concluido_em=datetime.now())
+                return
+
+            agora = datetime.now()
+            if not self._atualizar(
+                job_id,
+                status=CONCLUIDO,
+                progresso=100,
+                nome_arquivo=nome_arquivo,
+                media_type=media_type,
+                tamanho_bytes=tamanho,
+                concluido_em=agora,
+                expira_em=agora + timedelta(hours=settings.JOBS_RESULTADO_TTL_HORAS)
+            ):
+                print(f"⚠️ Job {job_id} reivindicado por outro worker ao concluir")
+        finally:
+            db.close()
+
+    def arquivo_temporario(self) -> str:
+        """Arquivo vazio em JOBS_DIR para um executor gravar o resultado aos poucos"""
+        os.makedirs(settings.JOBS_DIR, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=settings.JOBS_DIR, suffix=".tmp")
+        os.close(descritor)
+        return temporario
+
+    def _gravar_resultado(self, job_id: str, conteudo: Union[bytes, str]) -> int:
+        """Move o resultado para o lugar definitivo e devolve o tamanho em bytes"""
+        # Temporário + rename: um download nunca vê o arquivo pela metade
+        temporario = conteudo if isinstance(conteudo, str) else self.arquivo_temporario()
+        try:
+            if isinstance(conteudo, bytes):
+                with open(temporario, "wb") as arquivo:
+                    arquivo.write(conteudo)
+            tamanho = os.path.getsize(temporario)
+            # Sinal de vida logo antes do rename: confirma que o job ainda é
+            # deste processo e afasta a varredura até a conclusão
+            if not self._atualizar(job_id, progresso=99):
+                raise JobPerdido()
+            os.replace(temporario, self.caminho_resultado(job_id))
+            return tamanho
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    # ============= MANUTENÇÃO =============
+
+    def varrer(self) -> None:
+        """Retoma pendentes, recupera jobs de processos mortos e expira resultados"""
+        agora = datetime.now()
+        db = nova_sessao()
+        try:
+            # "executando" sem sinal de vida: o processo morreu no meio
+            limite = agora - timedelta(seconds=settings.JOBS_TIMEOUT_SEGUNDOS)
+            db.execute(
+                update(Job)
+                .where(Job.status == EXECUTANDO, Job.atualizado_em < limite)
+                .values(status=PENDENTE, processo=None, progresso=0, atualizado_em=agora),
+                execution_options={"synchronize_session": False}
+            )
+
+            expirados = db.query(Job).filter(
+                Job.status == CONCLUIDO, Job.expira_em < agora
+            ).all()
+            for job in expirados:
+                try:
+                    os.remove(self.caminho_resultado(job.id))
+                except FileNotFoundError:
+                    pass
+                job.status = EXPIRADO
+                job.atualizado_em = agora
+            db.commit()
+
+            pendentes = [
+                job_id for (job_id,) in
+                db.query(Job.id).filter(Job.status == PENDENTE).order_by(Job.criado_em)
+            ]
+        finally:
+            db.close()
+
+        for job_id in pendentes:
+            self._agendar(job_id)
+
+    async def varrer_periodicamente(self, intervalo: float) -> None:
+        """Tarefa do worker: varre a fila na inicialização e a cada `intervalo` segundos"""
+        while True:
+            try:
+                await asyncio.to_thread(self.varrer)
+            except Exception as e:
+                print(f"⚠️ Falha ao varrer a fila de jobs: {e}")
+            await asyncio.sleep(intervalo)
+
+    def encerrar(self) -> None:
+        """Interrompe os jobs em execução (voltam para a fila) e para o pool"""
+        self._encerrando = True
+        if self._pool and self._pid == os.getpid():
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Instância global da fila
+fila_jobs = FilaJobs()
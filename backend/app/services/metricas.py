@@ -0,0 +1,297 @@
+"""
+Estoque Engenho - Métricas (formato Prometheus)
+"""
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+
+FAIXAS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _formatar_labels(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Contador:
+    """Contador monotônico com labels"""
+
+    tipo = "counter"
+
+    def __init__(self, nome: str, descricao: str, labels: Iterable[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = tuple(str(labels[nome]) for nome in self.labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def amostras(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return [
+            f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}"
+            for chave, valor in itens
+        ]
+
+
+class Histograma:
+    """Histograma com faixas fixas e labels"""
+
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        labels: Iterable[str] = (),
+        faixas: Tuple[float, ...] = FAIXAS_LATENCIA
+    ):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self.faixas = tuple(faixas)
+        self._lock = threading.Lock()
+        # labels -> [contagem por faixa (+Inf no fim), soma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, **labels) -> None:
+        chave = tuple(str(labels[nome]) for nome in self.labels)
+        indice = bisect.bisect_left(self.faixas, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.faixas) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def amostras(self) -> List[str]:
+        with self._lock:
+            itens = [(chave, list(serie[0]), serie[1]) for chave, serie in self._series.items()]
+
+        linhas = []
+        for chave, contagens, soma in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.faixas + (float("inf"),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                labels = _formatar_labels(self.labels, chave, f'le="{le}"')
+                linhas.append(f"{self.nome}_bucket{labels} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {soma}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(self.labels, chave)} {acumulado}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Registro das métricas da aplicação e coletores sob demanda"""
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores: List[Callable[[], List[str]]] = []
+
+    def contador(self, nome: str, descricao: str, labels: Iterable[str] = ()) -> Contador:
+        metrica = Contador(nome, descricao, labels)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(
+        self,
+        nome: str,
+        descricao: str,
+        labels: Iterable[str] = (),
+        faixas: Tuple[float, ...] = FAIXAS_LATENCIA
+    ) -> Histograma:
+        metrica = Histograma(nome, descricao, labels, faixas)
+        self._metricas.append(metrica)
+        return metrica
+
+    def registrar_coletor(self, coletor: Callable[[], List[str]]) -> None:
+        """Coletor chamado a cada renderização (ex.: estado do pool)"""
+        self._coletores.append(coletor)
+
+    def renderizar(self) -> str:
+        """Gera o texto no formato de exposição do Prometheus"""
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.amostras())
+        for coletor in self._coletores:
+            linhas.extend(coletor())
+        return "\n".join(linhas) + "\n"
+
+
+registro = RegistroMetricas()
+
+requisicoes_total = registro.contador(
+    "http_requests_total", "Requisições HTTP atendidas", ("metodo", "rota", "status")
+)
+requisicao_segundos = registro.histograma(
+    "http_request_duration_seconds", "Latência das requisições HTTP", ("metodo", "rota")
+)
+consultas_total = registro.contador(
+    "db_queries_total", "Consultas SQL executadas por rota", ("rota",)
+)
+consultas_segundos_total = registro.contador(
+    "db_query_seconds_total", "Tempo total gasto em SQL por rota", ("rota",)
+)
+consultas_por_requisicao = registro.histograma(
+    "db_queries_per_request", "Consultas SQL por requisição", ("rota",),
+    faixas=(1, 2, 3, 5, 10, 20, 50, 100, 500)
+)
+render_segundos = registro.histograma(
+    "barcode_render_duration_seconds", "Tempo de renderização do BarcodeService", ("metodo",),
+    faixas=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+pdf_bytes = registro.histograma(
+    "etiquetas_pdf_bytes", "Tamanho dos PDFs de etiquetas",
+    faixas=(10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 20_000_000, 100_000_000)
+)
+pdf_etiquetas = registro.histograma(
+    "etiquetas_pdf_labels", "Quantidade de etiquetas por PDF",
+    faixas=(1, 4, 10, 50, 100, 500, 1000, 5000)
+)
+
+
+# ============= SQL POR REQUISIÇÃO =============
+
+class EstatisticasRequisicao:
+    """Consultas SQL contadas durante uma requisição"""
+    __slots__ = ("consultas", "tempo_db")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_db = 0.0
+
+
+_estatisticas: ContextVar[Optional[EstatisticasRequisicao]] = ContextVar(
+    "estatisticas_requisicao", default=None
+)
+
+
+ObservadorConsulta = Callable[[Connection, str, object, float], None]
+
+
+def instrumentar_engine(engine: Engine, *observadores: ObservadorConsulta) -> None:
+    """
+    Conta consultas e tempo de SQL na requisição em andamento
+
+    Cada consulta é cronometrada uma vez só; os observadores (ex.: o
+    profiler de SQL) recebem a conexão, o SQL, os parâmetros e a duração.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info["metricas_inicio"].pop()
+        estatisticas = _estatisticas.get()
+        if estatisticas is not None:
+            estatisticas.consultas += 1
+            estatisticas.tempo_db += duracao
+        for observador in observadores:
+            observador(conn, statement, parameters, duracao)
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        inicios = contexto.connection.info.get("metricas_inicio") if contexto.connection else None
+        if inicios:
+            inicios.pop()
+
+
+# ============= MIDDLEWARE =============
+
+_rotas: Dict[Callable, str] = {}
+
+
+def nome_rota(scope) -> str:
+    """
+    Template do caminho da rota atendida (ex.: /produtos/{produto_id})
+
+    Usa o endpoint que o roteador grava no scope, para que o número de
+    séries não cresça com os IDs.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "nao_encontrada"
+    if not _rotas:
+        _rotas.update({
+            rota.endpoint: rota.path
+            for rota in scope["app"].routes
+            if hasattr(rota, "endpoint")
+        })
+    return _rotas.get(endpoint, "desconhecida")
+
+
+class MetricasMiddleware:
+    """Middleware ASGI que mede latência e SQL de cada rota"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estatisticas = EstatisticasRequisicao()
+        token = _estatisticas.set(estatisticas)
+        status_code = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status_code
+            if mensagem["type"] == "http.response.start":
+                status_code = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _estatisticas.reset(token)
+
+            rota = nome_rota(scope)
+            metodo = scope["method"]
+            requisicoes_total.inc(metodo=metodo, rota=rota, status=status_code)
+            requisicao_segundos.observar(duracao, metodo=metodo, rota=rota)
+            if estatisticas.consultas:
+                consultas_total.inc(estatisticas.consultas, rota=rota)
+                consultas_segundos_total.inc(estatisticas.tempo_db, rota=rota)
+            consultas_por_requisicao.observar(estatisticas.consultas, rota=rota)
+
+
+# ============= BARCODE =============
+
+def medir_render(func):
+    """Decorator que registra o tempo de renderização de um método do BarcodeService"""
+    metodo = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            render_segundos.observar(time.perf_counter() - inicio, metodo=metodo)
+
+    return wrapper
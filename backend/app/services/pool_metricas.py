@@ -0,0 +1,143 @@
+"""
+Estoque Engenho - Métricas do Pool de Conexões
+"""
+import bisect
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+# Limites (em segundos) das faixas do histograma de espera por conexão
+FAIXAS_ESPERA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricasPool:
+    """Contadores e histograma de espera do pool, seguros entre threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.conexoes_criadas = 0
+        self.invalidacoes = 0
+        self.invalidacoes_suaves = 0
+        self.pings = 0
+        self.timeouts = 0
+        self.espera_contagem: List[int] = [0] * (len(FAIXAS_ESPERA) + 1)
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+
+    def registrar_espera(self, segundos: float) -> None:
+        indice = bisect.bisect_left(FAIXAS_ESPERA, segundos)
+        with self._lock:
+            self.espera_contagem[indice] += 1
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def incrementar(self, contador: str) -> None:
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def resumo(self, pool) -> Dict:
+        """Estado atual do pool somado aos contadores acumulados"""
+        with self._lock:
+            acumulado = 0
+            histograma = {}
+            for limite, contagem in zip(FAIXAS_ESPERA + (float("inf"),), self.espera_contagem):
+                acumulado += contagem
+                histograma["+Inf" if limite == float("inf") else str(limite)] = acumulado
+
+            return {
+                "tamanho": pool.size(),
+                "em_uso": pool.checkedout(),
+                "disponiveis": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "conexoes_criadas": self.conexoes_criadas,
+                "invalidacoes": self.invalidacoes,
+                "invalidacoes_suaves": self.invalidacoes_suaves,
+                "pings": self.pings,
+                "timeouts": self.timeouts,
+                "espera": {
+                    "total_segundos": round(self.espera_total, 6),
+                    "maxima_segundos": round(self.espera_maxima, 6),
+                    "histograma": histograma
+                }
+            }
+
+
+class QueuePoolInstrumentado(QueuePool):
+    """QueuePool que mede o tempo de espera de cada checkout"""
+
+    metricas: MetricasPool
+
+    def recreate(self):
+        # engine.dispose() recria o pool: as métricas continuam as mesmas
+        novo = super().recreate()
+        novo.metricas = self.metricas
+        return novo
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.incrementar("timeouts")
+            raise
+        finally:
+            self.metricas.registrar_espera(time.perf_counter() - inicio)
+
+
+def instrumentar(engine: Engine, estrategia_ping: str, ping_ocioso_segundos: int) -> MetricasPool:
+    """
+    Registra os eventos de métricas e a estratégia de pre-ping no pool
+
+    Estratégias:
+        sempre: SELECT 1 em todo checkout (pool_pre_ping do SQLAlchemy)
+        ocioso: SELECT 1 só para conexões paradas há mais de `ping_ocioso_segundos`
+        nunca: sem verificação; conexões quebradas são invalidadas no erro
+    """
+    metricas = MetricasPool()
+    pool = engine.pool
+    pool.metricas = metricas
+
+    @event.listens_for(pool, "connect")
+    def _connect(dbapi_connection, connection_record):
+        metricas.incrementar("conexoes_criadas")
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        metricas.incrementar("checkouts")
+
+        if estrategia_ping != "ocioso":
+            return
+
+        ultimo_uso = connection_record.info.get("ultimo_uso")
+        if ultimo_uso is None or time.monotonic() - ultimo_uso < ping_ocioso_segundos:
+            return
+
+        metricas.incrementar("pings")
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            # O pool descarta a conexão e tenta outra
+            raise exc.DisconnectionError()
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["ultimo_uso"] = time.monotonic()
+
+    @event.listens_for(pool, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        metricas.incrementar("invalidacoes")
+
+    @event.listens_for(pool, "soft_invalidate")
+    def _soft_invalidate(dbapi_connection, connection_record, exception):
+        metricas.incrementar("invalidacoes_suaves")
+
+    return metricas
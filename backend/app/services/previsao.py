@@ -0,0 +1,261 @@
+"""
+Estoque Engenho - Previsão de Demanda e Ponto de Reposição
+"""
+import asyncio
+import json
+import math
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, and_, delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import iniciar_escrita, nova_sessao
+from app.models import Base, Produto
+from app.services.analise import EPOCA, carregar_movimentacoes, carregar_produtos, indices_produtos
+from app.services.jobs import fila_jobs
+
+TIPO_JOB = "previsao_reposicao"
+
+# Fator entre o desvio absoluto médio suavizado e o desvio padrão (distribuição normal)
+FATOR_DESVIO = 1.25
+
+
+class PrevisaoReposicao(Base):
+    """Resultado do último cálculo de previsão de um produto (recalculado toda noite)"""
+    __tablename__ = "previsoes_reposicao"
+
+    produto_id = Column(Integer, ForeignKey("produtos.id"), primary_key=True, autoincrement=False)
+    demanda_diaria = Column(Float, nullable=False)
+    desvio_diario = Column(Float, nullable=False)
+    estoque_seguranca = Column(Integer, nullable=False)
+    ponto_reposicao = Column(Integer, nullable=False)
+    estoque_atual = Column(Integer, nullable=False)  # no momento do cálculo
+    dias_ate_ruptura = Column(Float)  # None sem demanda prevista
+    calculado_em = Column(DateTime, nullable=False)
+
+
+def demanda_por_dia(
+    ids_produtos: np.ndarray,
+    lotes: Iterator[Dict[str, np.ndarray]],
+    primeiro_dia: int,
+    dias: int
+) -> np.ndarray:
+    """Matriz produtos x dias com as saídas de cada dia (bincount num índice linear)"""
+    quantidade = len(ids_produtos)
+    matriz = np.zeros(quantidade * dias)
+
+    for lote in lotes:
+        indices = indices_produtos(ids_produtos, lote["produto_id"])
+        dia = lote["dia"] - primeiro_dia
+        validos = (indices >= 0) & (dia >= 0) & (dia < dias) & (lote["saida"] > 0)
+        matriz += np.bincount(
+            indices[validos] * dias + dia[validos],
+            weights=lote["saida"][validos],
+            minlength=quantidade * dias
+        )
+
+    return matriz.reshape(quantidade, dias)
+
+
+def suavizar(demanda: np.ndarray, alfa: float) -> Dict[str, np.ndarray]:
+    """
+    Suavização exponencial simples de todos os produtos de uma vez
+
+    O laço é só nos dias; cada passo atualiza o vetor de todos os produtos.
+    Junto com o nível (demanda diária prevista) suaviza o erro absoluto de
+    cada previsão, usado para estimar a variabilidade da demanda.
+    """
+    semana = min(7, demanda.shape[1])
+    nivel = demanda[:, :semana].mean(axis=1)
+    erro = np.abs(demanda[:, :semana] - nivel[:, None]).mean(axis=1)
+
+    for dia in range(semana, demanda.shape[1]):
+        observado = demanda[:, dia]
+        erro = alfa * np.abs(observado - nivel) + (1 - alfa) * erro
+        nivel = alfa * observado + (1 - alfa) * nivel
+
+    return {"demanda_diaria": nivel, "desvio_diario": FATOR_DESVIO * erro}
+
+
+def pontos_reposicao(
+    previsao: Dict[str, np.ndarray],
+    estoque: np.ndarray,
+    lead_time: float,
+    z: float
+) -> Dict[str, np.ndarray]:
+    """
+    Estoque de segurança, ponto de reposição e dias até a ruptura
+
+    - segurança = z x desvio diário x raiz(lead time)
+    - ponto de reposição = demanda no lead time + segurança
+    - dias até a ruptura = estoque / demanda diária (NaN sem demanda)
+    """
+    demanda = previsao["demanda_diaria"]
+    seguranca = np.ceil(z * previsao["desvio_diario"] * math.sqrt(lead_time))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ruptura = np.where(demanda > 0, estoque / demanda, np.nan)
+    return {
+        "estoque_seguranca": seguranca,
+        "ponto_reposicao": np.ceil(demanda * lead_time + seguranca),
+        "dias_ate_ruptura": ruptura,
+    }
+
+
+class PrevisaoService:
+    """
+    Previsão de demanda dos produtos ativos a partir das saídas
+
+    Roda como job da fila (toda noite às PREVISAO_HORA ou sob demanda): lê
+    as saídas dos últimos PREVISAO_HISTORICO_DIAS em lotes, monta a matriz
+    produtos x dias e calcula todos os SKUs numa passada só. O resultado
+    substitui a tabela `previsoes_reposicao`, que as rotas apenas leem.
+    """
+
+    def calcular(self, db: Session, progresso: Callable[[int, int], None]) -> Dict:
+        """Recalcula e grava as previsões de todos os produtos ativos"""
+        agora = datetime.now()
+        dias = settings.PREVISAO_HISTORICO_DIAS
+        hoje = np.datetime64(date.today(), "D")
+        # Histórico até ontem: o dia de hoje ainda está incompleto
+        primeiro_dia = int((hoje - EPOCA).astype(np.int64)) - dias
+        inicio = datetime.combine(date.today() - timedelta(days=dias), datetime.min.time())
+
+        produtos = carregar_produtos(db)
+        progresso(1, 4)
+        demanda = demanda_por_dia(produtos["id"], carregar_movimentacoes(db, inicio), primeiro_dia, dias)
+        progresso(2, 4)
+
+        previsao = suavizar(demanda, settings.PREVISAO_ALFA)
+        resultado = pontos_reposicao(
+            previsao, produtos["estoque"],
+            settings.PREVISAO_LEAD_TIME_DIAS, settings.PREVISAO_NIVEL_SERVICO_Z
+        )
+        progresso(3, 4)
+
+        linhas = [
+            {
+                "produto_id": int(produtos["id"][i]),
+                "demanda_diaria": round(float(previsao["demanda_diaria"][i]), 4),
+                "desvio_diario": round(float(previsao["desvio_diario"][i]), 4),
+                "estoque_seguranca": int(resultado["estoque_seguranca"][i]),
+                "ponto_reposicao": int(resultado["ponto_reposicao"][i]),
+                "estoque_atual": int(produtos["estoque"][i]),
+                "dias_ate_ruptura": (
+                    None if np.isnan(resultado["dias_ate_ruptura"][i])
+                    else round(float(resultado["dias_ate_ruptura"][i]), 1)
+                ),
+                "calculado_em": agora,
+            }
+            for i in range(len(produtos["id"]))
+        ]
+
+        # Troca o resultado inteiro numa transação: quem lê vê o anterior ou o novo.
+        # A leitura termina antes: o progresso do job grava em outra sessão e,
+        # no SQLite, a transação de leitura não poderia mais virar de escrita
+        db.commit()
+        iniciar_escrita(db)
+        db.execute(delete(PrevisaoReposicao))
+        if linhas:
+            db.execute(insert(PrevisaoReposicao), linhas)
+        db.commit()
+
+        return {
+            "produtos": len(linhas),
+            "abaixo_ponto_reposicao": int((
+                (previsao["demanda_diaria"] > 0) & (produtos["estoque"] <= resultado["ponto_reposicao"])
+            ).sum()),
+            "calculado_em": agora.isoformat(timespec="seconds"),
+        }
+
+    def listar(self, db: Session, repor: bool, skip: int, limit: int) -> Dict:
+        """
+        Previsões gravadas pelo último cálculo, sem recalcular nada
+
+        Em ordem de dias até a ruptura (quem acaba antes primeiro). `repor`
+        compara o ponto de reposição com o estoque de agora; produtos sem
+        demanda prevista nunca precisam de reposição.
+        """
+        repor_agora = and_(
+            PrevisaoReposicao.demanda_diaria > 0,
+            Produto.estoque_atual <= PrevisaoReposicao.ponto_reposicao
+        )
+        consulta = (
+            select(
+                PrevisaoReposicao.produto_id,
+                Produto.codigo_barras,
+                Produto.nome,
+                PrevisaoReposicao.demanda_diaria,
+                PrevisaoReposicao.desvio_diario,
+                PrevisaoReposicao.estoque_seguranca,
+                PrevisaoReposicao.ponto_reposicao,
+                Produto.estoque_atual,
+                PrevisaoReposicao.dias_ate_ruptura,
+                repor_agora.label("repor"),
+            )
+            .join(Produto, Produto.id == PrevisaoReposicao.produto_id)
+            .where(Produto.ativo == True)
+        )
+        if repor:
+            consulta = consulta.where(repor_agora)
+
+        produtos: List[Dict] = [
+            linha._asdict()
+            for linha in db.execute(
+                consulta.order_by(
+                    PrevisaoReposicao.dias_ate_ruptura.is_(None),
+                    PrevisaoReposicao.dias_ate_ruptura,
+                    PrevisaoReposicao.produto_id
+                ).offset(skip).limit(limit)
+            )
+        ]
+        calculado_em = db.execute(select(func.max(PrevisaoReposicao.calculado_em))).scalar()
+        return {"calculado_em": calculado_em, "produtos": produtos}
+
+    def executar_job(self, db: Session, parametros: Dict, progresso: Callable[[int, int], None]):
+        """Executor do job `previsao_reposicao`: o arquivo do job é o resumo em JSON"""
+        resumo = self.calcular(db, progresso)
+        conteudo = json.dumps(resumo, ensure_ascii=False).encode()
+        return conteudo, f"previsao_reposicao_{date.today():%Y%m%d}.json", "application/json"
+
+    def agendar(self, db: Session, dia: date) -> bool:
+        """
+        Submete o cálculo do dia; False se outro worker já submeteu
+
+        O id do job é fixo por dia: todos os workers tentam e só o primeiro
+        INSERT passa, então o cálculo roda uma vez por noite.
+        """
+        try:
+            fila_jobs.submeter(db, TIPO_JOB, {"dia": dia.isoformat()}, job_id=f"{TIPO_JOB}_{dia:%Y%m%d}")
+        except IntegrityError:
+            db.rollback()
+            return False
+        return True
+
+    def _agendar_em_sessao(self, dia: date) -> bool:
+        db = nova_sessao()
+        try:
+            return self.agendar(db, dia)
+        finally:
+            db.close()
+
+    async def agendar_diariamente(self, hora: int) -> None:
+        """Tarefa do worker: submete o cálculo todo dia às `hora` horas"""
+        while True:
+            agora = datetime.now()
+            execucao = agora.replace(hour=hora, minute=0, second=0, microsecond=0)
+            if execucao <= agora:
+                # Horário de hoje já passou (ex.: restart): garante o de hoje e agenda amanhã
+                try:
+                    await asyncio.to_thread(self._agendar_em_sessao, agora.date())
+                except Exception as e:
+                    print(f"⚠️ Falha ao agendar a previsão de reposição: {e}")
+                execucao += timedelta(days=1)
+            await asyncio.sleep((execucao - datetime.now()).total_seconds())
+
+
+# Instância global do serviço
+previsao_service = PrevisaoService()
@@ -0,0 +1,60 @@
+"""
+Estoque Engenho - Workers do Gunicorn
+"""
+import gc
+
+
+def aquecer_antes_do_fork() -> None:
+    """
+    Carrega no processo mestre tudo que os workers podem compartilhar
+
+    Chamado pelo gunicorn (preload) antes de criar os workers: o cache de
+    cores/tipos, os módulos de imagem/PDF e as fontes das etiquetas ficam na
+    memória do mestre e são herdados pelos workers em copy-on-write.
+    """
+    from app.database import SessionLocal, engine, engines_replica, preparar_banco
+    from app.services.barcode_service import BarcodeService, _fontes_etiqueta
+    from app.services.catalogo_cache import catalogo_cache
+
+    db = SessionLocal()
+    try:
+        preparar_banco()
+        catalogo_cache.carregar(db)
+    except Exception as e:
+        # Sem banco agora, cada worker carrega o cache no próprio startup
+        print(f"⚠️ Cache de cores/tipos não carregado antes do fork: {e}")
+    finally:
+        db.close()
+
+    # Importa barcode, qrcode, PIL e reportlab e carrega fontes e plugins.
+    # As renderizações usam as funções sem o decorator de métricas
+    from PIL import Image
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfgen import canvas  # noqa: F401
+
+    Image.init()
+    pdfmetrics.getFont("Helvetica")
+    _fontes_etiqueta()
+    BarcodeService.gerar_imagem_code128.__wrapped__("00000000")
+    BarcodeService.gerar_imagem_qrcode.__wrapped__("00000000")
+
+    # O mestre não atende requisições: nenhuma conexão deve ir para os workers
+    engine.dispose()
+    for replica in engines_replica:
+        replica.dispose()
+
+    # Objetos já carregados saem do GC: as coletas nos workers não tocam
+    # nessas páginas e o compartilhamento copy-on-write se mantém
+    gc.freeze()
+
+
+def reiniciar_apos_fork() -> None:
+    """Descarta no worker as conexões herdadas do mestre, sem fechá-las"""
+    from app.database import engine, engines_replica
+
+    # close=False: o socket continua válido para o mestre; o worker só
+    # esquece o pool herdado e abre conexões próprias
+    engine.dispose(close=False)
+    for replica in engines_replica:
+        replica.dispose(close=False)
+
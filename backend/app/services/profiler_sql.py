@@ -0,0 +1,180 @@
+"""
+Estoque Engenho - Profiler de SQL por Requisição
+"""
+import logging
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+from app.services.metricas import nome_rota
+
+logger = logging.getLogger("estoque_engenho.slow_query")
+
+
+class PerfilRequisicao:
+    """Consultas executadas durante uma requisição"""
+    __slots__ = ("consultas", "tempo_db", "descartadas")
+
+    def __init__(self):
+        self.consultas: List[Tuple[Engine, str, object, float]] = []
+        self.tempo_db = 0.0
+        self.descartadas = 0
+
+
+_perfil: ContextVar[Optional[PerfilRequisicao]] = ContextVar("perfil_sql", default=None)
+
+
+class ProfilerSQL:
+    """
+    Profiler de SQL sobre a cronometragem de `instrumentar_engine` (metricas)
+
+    Com o profiler ativo, cada requisição guarda suas consultas e durações,
+    devolve um cabeçalho Server-Timing e registra no log `slow_query` as
+    consultas acima do limite (com amostragem), incluindo a rota e o
+    EXPLAIN. O EXPLAIN roda depois da resposta, numa thread separada.
+    A configuração pode ser alterada em tempo de execução via
+    PUT /diagnostico/profiler. Ela fica em memória compartilhada (como as
+    versões de `versoes_tabelas`): com o gunicorn em preload, a alteração
+    vale para todos os workers.
+    """
+
+    # Limite de consultas guardadas por requisição (evita crescer sem fim)
+    MAX_CONSULTAS = 500
+
+    # Posições da configuração no array compartilhado
+    _ATIVO, _LIMITE_LENTO_MS, _AMOSTRAGEM = range(3)
+
+    def __init__(self, ativo: bool, limite_lento_ms: float, amostragem: float):
+        try:
+            compartilhado = multiprocessing.Array("d", 3)
+            self._lock = compartilhado.get_lock()
+            self._config = compartilhado.get_obj()
+        except (ImportError, OSError):
+            # Sem semáforos POSIX (ex.: /dev/shm indisponível): configuração por processo
+            self._lock = threading.Lock()
+            self._config = [0.0] * 3
+        self.configurar(ativo, limite_lento_ms, amostragem)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self._config[self._ATIVO])
+
+    @property
+    def limite_lento_ms(self) -> float:
+        return self._config[self._LIMITE_LENTO_MS]
+
+    @property
+    def amostragem(self) -> float:
+        return self._config[self._AMOSTRAGEM]
+
+    def configurar(
+        self,
+        ativo: Optional[bool] = None,
+        limite_lento_ms: Optional[float] = None,
+        amostragem: Optional[float] = None
+    ) -> None:
+        with self._lock:
+            if ativo is not None:
+                self._config[self._ATIVO] = float(ativo)
+            if limite_lento_ms is not None:
+                self._config[self._LIMITE_LENTO_MS] = limite_lento_ms
+            if amostragem is not None:
+                self._config[self._AMOSTRAGEM] = amostragem
+
+    def configuracao(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "limite_lento_ms": self.limite_lento_ms,
+            "amostragem": self.amostragem
+        }
+
+    def observar_consulta(self, conn: Connection, statement: str, parameters, duracao: float) -> None:
+        """Guarda a consulta no perfil da requisição em andamento (cronometrada por instrumentar_engine)"""
+        perfil = _perfil.get()
+        if perfil is None:
+            return
+        perfil.tempo_db += duracao
+        if len(perfil.consultas) < self.MAX_CONSULTAS:
+            perfil.consultas.append((conn.engine, statement, parameters, duracao))
+        else:
+            perfil.descartadas += 1
+
+    def registrar_lentas(self, rota: str, perfil: PerfilRequisicao) -> None:
+        """Envia as consultas lentas (amostradas) para o log com EXPLAIN"""
+        limite = self.limite_lento_ms / 1000
+        for engine, statement, parametros, duracao in perfil.consultas:
+            if duracao < limite or random.random() >= self.amostragem:
+                continue
+            self._executor.submit(self._registrar, engine, rota, statement, parametros, duracao)
+
+    def _registrar(self, engine: Engine, rota: str, statement: str, parametros, duracao: float) -> None:
+        plano = self._explain(engine, statement, parametros)
+        logger.warning(
+            "Consulta lenta em %s: %.1f ms\n%s\nParâmetros: %r\nEXPLAIN:\n%s",
+            rota, duracao * 1000, statement, parametros, plano
+        )
+
+    @staticmethod
+    def _explain(engine: Engine, statement: str, parametros) -> str:
+        if not statement.lstrip().upper().startswith("SELECT"):
+            return "(não aplicável)"
+        # No SQLite, EXPLAIN devolve o bytecode; o plano vem de EXPLAIN QUERY PLAN
+        explain = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+        try:
+            with engine.connect() as conn:
+                linhas = conn.exec_driver_sql(f"{explain} {statement}", parametros).fetchall()
+            return "\n".join(str(tuple(linha)) for linha in linhas)
+        except Exception as e:
+            return f"(falha ao executar EXPLAIN: {e})"
+
+
+class ProfilerSQLMiddleware:
+    """Middleware ASGI que ativa o profiler e adiciona o cabeçalho Server-Timing"""
+
+    def __init__(self, app, profiler: "ProfilerSQL"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.ativo:
+            await self.app(scope, receive, send)
+            return
+
+        perfil = PerfilRequisicao()
+        token = _perfil.set(perfil)
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - inicio) * 1000
+                quantidade = len(perfil.consultas) + perfil.descartadas
+                valor = (
+                    f'db;dur={perfil.tempo_db * 1000:.1f};desc="{quantidade} consultas", '
+                    f"total;dur={total_ms:.1f}"
+                )
+                mensagem["headers"] = list(mensagem.get("headers", [])) + [
+                    (b"server-timing", valor.encode("latin-1"))
+                ]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil.reset(token)
+            self.profiler.registrar_lentas(nome_rota(scope), perfil)
+
+
+# Instância global do profiler
+profiler_sql = ProfilerSQL(
+    ativo=settings.DB_PROFILER_ATIVO,
+    limite_lento_ms=settings.DB_SLOW_QUERY_MS,
+    amostragem=settings.DB_SLOW_QUERY_AMOSTRAGEM
+)
@@ -0,0 +1,68 @@
+"""
+Estoque Engenho - Roteamento de Leituras para Réplicas
+"""
+import itertools
+import multiprocessing
+import time
+import zlib
+from typing import List
+
+from fastapi import Request
+
+from app.services.versoes import versoes_tabelas
+
+
+def chave_cliente(request: Request) -> str:
+    """
+    Identifica o cliente: cabeçalho X-Cliente-Id (app) ou IP de origem
+
+    Atrás de um proxy, o IP vem de X-Forwarded-For quando o proxy é
+    confiável (`forwarded_allow_ips` no gunicorn.conf.py).
+    """
+    cliente = request.headers.get("x-cliente-id")
+    if cliente:
+        return cliente
+    return request.client.host if request.client else "desconhecido"
+
+
+class RoteadorLeitura:
+    """
+    Decide entre primário e réplicas para cada leitura
+
+    Guarda o instante da última escrita de cada cliente numa tabela de
+    tamanho fixo em memória compartilhada (herdada pelos workers do
+    gunicorn). Clientes que colidem no mesmo slot apenas leem do primário
+    com mais frequência, nunca de uma réplica atrasada.
+    """
+
+    SLOTS = 4096
+
+    def __init__(self, janela_segundos: float):
+        self.janela_segundos = janela_segundos
+        try:
+            self._escritas = multiprocessing.RawArray("d", self.SLOTS)
+        except (ImportError, OSError):
+            self._escritas = [0.0] * self.SLOTS
+        self._rodizio = itertools.count()
+
+    def _slot(self, cliente: str) -> int:
+        return zlib.crc32(cliente.encode()) % self.SLOTS
+
+    def registrar_escrita(self, cliente: str) -> None:
+        """Registra que o cliente acabou de confirmar uma escrita no primário"""
+        self._escritas[self._slot(cliente)] = time.time()
+
+    def usar_primario(self, cliente: str, *tabelas: str) -> bool:
+        """
+        Indica se a leitura deve ir ao primário
+
+        Sim se o cliente gravou dentro da janela ou se alguma das tabelas
+        informadas mudou dentro dela.
+        """
+        if time.time() - self._escritas[self._slot(cliente)] < self.janela_segundos:
+            return True
+        return bool(tabelas) and versoes_tabelas.alterada_recentemente(self.janela_segundos, *tabelas)
+
+    def escolher(self, opcoes: List):
+        """Escolhe a próxima réplica em rodízio"""
+        return opcoes[next(self._rodizio) % len(opcoes)]
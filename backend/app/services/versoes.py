@@ -0,0 +1,100 @@
+"""
+Estoque Engenho - Versões de Tabelas
+"""
+import multiprocessing
+import os
+import threading
+import time
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+
+class VersoesTabelas:
+    """
+    Contador de versão por tabela
+
+    Cada escrita feita pelas rotas incrementa a versão da tabela alterada.
+    As listagens usam essas versões para montar ETags fracos e responder
+    304 sem consultar o banco quando nada mudou.
+
+    Os contadores ficam em memória compartilhada: com o gunicorn em modo
+    preload, a instância é criada no processo mestre e todos os workers
+    enxergam as mesmas versões (e a mesma época) depois do fork.
+    """
+
+    TABELAS = ("cores", "tipos", "produtos", "movimentacoes")
+
+    def __init__(self):
+        self._indices = {tabela: indice for indice, tabela in enumerate(self.TABELAS)}
+        try:
+            compartilhado = multiprocessing.Array("q", len(self.TABELAS))
+            self._lock = compartilhado.get_lock()
+            self._versoes = compartilhado.get_obj()
+            # Instante (time.time) da última escrita em cada tabela
+            self._alteracoes = multiprocessing.RawArray("d", len(self.TABELAS))
+        except (ImportError, OSError):
+            # Sem semáforos POSIX (ex.: /dev/shm indisponível): contadores por processo
+            self._lock = threading.Lock()
+            self._versoes = [0] * len(self.TABELAS)
+            self._alteracoes = [0.0] * len(self.TABELAS)
+        # Época do processo: evita reaproveitar ETags de antes de um restart
+        self._epoca = f"{int(time.time()):x}{os.getpid():x}"
+
+    def atual(self, tabela: str) -> int:
+        """Retorna a versão atual de uma tabela"""
+        return self._versoes[self._indices[tabela]]
+
+    def incrementar(self, *tabelas: str) -> None:
+        """Incrementa a versão das tabelas alteradas por uma escrita"""
+        agora = time.time()
+        with self._lock:
+            for tabela in tabelas:
+                self._versoes[self._indices[tabela]] += 1
+                self._alteracoes[self._indices[tabela]] = agora
+
+    def alterada_recentemente(self, segundos: float, *tabelas: str) -> bool:
+        """Indica se alguma das tabelas recebeu escrita nos últimos `segundos`"""
+        limite = time.time() - segundos
+        return any(self._alteracoes[self._indices[tabela]] > limite for tabela in tabelas)
+
+    def etag(self, *tabelas: str) -> str:
+        """Gera um ETag fraco a partir das versões das tabelas informadas"""
+        versoes = ".".join(str(self.atual(tabela)) for tabela in tabelas)
+        return f'W/"{self._epoca}-{versoes}"'
+
+    def verificar(
+        self,
+        request: Request,
+        response: Response,
+        *tabelas: str
+    ) -> Optional[Response]:
+        """
+        Define o ETag da resposta e verifica o cabeçalho If-None-Match
+
+        Returns:
+            Resposta 304 se o cliente já possui a versão atual, senão None
+        """
+        etag = self.etag(*tabelas)
+        response.headers["ETag"] = etag
+        # no-cache: o cliente pode guardar a resposta, mas deve revalidar
+        response.headers["Cache-Control"] = "no-cache"
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            # Comparação fraca: o prefixo W/ é ignorado
+            etags_cliente = {
+                valor.strip().removeprefix("W/")
+                for valor in if_none_match.split(",")
+            }
+            if etag.removeprefix("W/") in etags_cliente or "*" in etags_cliente:
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={"ETag": etag, "Cache-Control": "no-cache"}
+                )
+
+        return None
+
+
+# Instância global das versões
+versoes_tabelas = VersoesTabelas()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Estoque Engenho - Benchmark da Análise de Estoque (NumPy)
+
+Gera movimentações sintéticas (demanda concentrada em poucos SKUs, como no
+varejo) e mede as etapas de app/services/analise.py:
+
+    memoria  colunas já em arrays, em lotes de LOTE_MOVIMENTACOES:
+             bincount por produto, curva ABC, giro, cobertura e valorização;
+             previsão de demanda (matriz produtos x dias e suavização
+             exponencial de app/services/previsao.py)
+    sqlite   (--sqlite) grava as movimentações num SQLite temporário e mede
+             a análise completa, incluindo a leitura em lotes do banco
+
+Uso:
+    python benchmarks/analise.py                                  # 5M movimentações em memória
+    python benchmarks/analise.py --movimentacoes 1000000 --sqlite # também lendo do SQLite
+    python benchmarks/analise.py --produtos 20000 --saida analise.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.analise import (  # noqa: E402
+    LOTE_MOVIMENTACOES, acumular_por_produto, analisar, valorizar_por_grupo
+)
+from app.services.previsao import demanda_por_dia, pontos_reposicao, suavizar  # noqa: E402
+
+DIAS = 90
+
+
+def gerar_produtos(quantidade: int, rng: np.random.Generator) -> dict:
+    return {
+        "id": np.arange(1, quantidade + 1, dtype=np.int64),
+        "tipo_id": rng.integers(1, 11, quantidade),
+        "cor_id": rng.integers(1, 15, quantidade),
+        "estoque": rng.integers(0, 500, quantidade).astype(np.float64),
+        "preco_custo": rng.uniform(5, 80, quantidade).round(2),
+        "preco_venda": rng.uniform(10, 200, quantidade).round(2),
+    }
+
+
+def gerar_lotes(movimentacoes: int, produtos: int, rng: np.random.Generator):
+    """Movimentações sintéticas em lotes do mesmo tamanho que o serviço lê do banco"""
+    for inicio in range(0, movimentacoes, LOTE_MOVIMENTACOES):
+        tamanho = min(LOTE_MOVIMENTACOES, movimentacoes - inicio)
+        # Zipf truncado: poucos produtos concentram a maior parte das saídas
+        produto_id = np.minimum(rng.zipf(1.3, tamanho), produtos).astype(np.int64)
+        saida = rng.random(tamanho) < 0.7
+        quantidade = rng.integers(1, 6, tamanho).astype(np.float64)
+        yield {
+            "produto_id": produto_id,
+            "saida": np.where(saida, quantidade, 0.0),
+            "variacao": np.where(saida, -quantidade, quantidade),
+            "dia": rng.integers(0, DIAS, tamanho),
+        }
+
+
+def medir_memoria(args) -> dict:
+    rng = np.random.default_rng(42)
+    produtos = gerar_produtos(args.produtos, rng)
+
+    # Gera antes de medir: o tempo é só o da análise
+    inicio = time.perf_counter()
+    lotes = list(gerar_lotes(args.movimentacoes, args.produtos, rng))
+    geracao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    acumulado = acumular_por_produto(produtos["id"], iter(lotes))
+    agregacao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    indicadores = analisar(produtos, acumulado, DIAS)
+    for coluna in ("tipo_id", "cor_id"):
+        valorizar_por_grupo(produtos[coluna], produtos["estoque"], produtos["preco_custo"], produtos["preco_venda"])
+    indicadores_tempo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    demanda = demanda_por_dia(produtos["id"], iter(lotes), 0, DIAS)
+    pontos_reposicao(suavizar(demanda, 0.2), produtos["estoque"], 7, 1.65)
+    previsao = time.perf_counter() - inicio
+
+    classes = {classe: int((indicadores["classe_abc"] == classe).sum()) for classe in "ABC"}
+    return {
+        "geracao_s": round(geracao, 3),
+        "agregacao_s": round(agregacao, 3),
+        "indicadores_s": round(indicadores_tempo, 3),
+        "total_s": round(agregacao + indicadores_tempo, 3),
+        "movimentacoes_por_s": round(args.movimentacoes / (agregacao + indicadores_tempo)),
+        "previsao_s": round(previsao, 3),
+        "classes_abc": classes,
+    }
+
+
+def medir_sqlite(args) -> dict:
+    """Análise completa (leitura em lotes + NumPy) sobre um SQLite com o schema da API"""
+    descritor, caminho = tempfile.mkstemp(prefix="analise_", suffix=".db")
+    os.close(descritor)
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["DB_SQLITE_PATH"] = caminho
+
+    try:
+        from app.database import SessionLocal, preparar_banco
+        from app.services.analise import analise_estoque_service
+
+        preparar_banco()
+        rng = np.random.default_rng(42)
+        produtos = gerar_produtos(args.produtos, rng)
+
+        inicio = time.perf_counter()
+        conexao = sqlite3.connect(caminho)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.executemany(
+            "INSERT INTO produtos (id, codigo_produto, codigo_barras, nome, tipo_id, cor_id, "
+            "estoque_atual, preco_custo, preco_venda) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (int(i), f"{i:06d}", f"{i:010d}", f"Produto {i}", int(t), int(c), int(e), float(pc), float(pv))
+                for i, t, c, e, pc, pv in zip(
+                    produtos["id"], produtos["tipo_id"], produtos["cor_id"], produtos["estoque"],
+                    produtos["preco_custo"], produtos["preco_venda"]
+                )
+            ]
+        )
+        agora = datetime.now()
+        for lote in gerar_lotes(args.movimentacoes, args.produtos, rng):
+            datas = [
+                (agora - timedelta(days=int(dia), seconds=int(segundo))).isoformat(sep=" ")
+                for dia, segundo in zip(lote["dia"], rng.integers(0, 86400, len(lote["dia"])))
+            ]
+            conexao.executemany(
+                "INSERT INTO movimentacoes (produto_id, tipo_movimento, quantidade, estoque_anterior, "
+                "estoque_atual, data_movimento) VALUES (?, ?, ?, 0, ?, ?)",
+                zip(
+                    lote["produto_id"].tolist(),
+                    np.where(lote["saida"] > 0, "SAIDA", "ENTRADA").tolist(),
+                    np.abs(lote["variacao"]).astype(int).tolist(),
+                    lote["variacao"].astype(int).tolist(),
+                    datas
+                )
+            )
+        conexao.commit()
+        conexao.close()
+        carga = time.perf_counter() - inicio
+
+        db = SessionLocal()
+        try:
+            inicio = time.perf_counter()
+            analise = analise_estoque_service.calcular(db, DIAS)
+            total = time.perf_counter() - inicio
+        finally:
+            db.close()
+
+        return {
+            "carga_banco_s": round(carga, 1),
+            "analise_s": round(total, 3),
+            "movimentacoes_por_s": round(args.movimentacoes / total),
+            "produtos": len(analise["produtos"]),
+        }
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo):
+                os.remove(caminho + sufixo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da análise de estoque com NumPy")
+    parser.add_argument("--movimentacoes", type=int, default=5_000_000)
+    parser.add_argument("--produtos", type=int, default=5_000)
+    parser.add_argument("--sqlite", action="store_true", help="Também mede a leitura do banco")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    resultado = {"movimentacoes": args.movimentacoes, "produtos": args.produtos}
+    resultado["memoria"] = memoria = medir_memoria(args)
+    print(
+        f"memória: {args.movimentacoes:,} movimentações, {args.produtos:,} produtos em "
+        f"{memoria['total_s']:.2f}s (agregação {memoria['agregacao_s']:.2f}s, "
+        f"indicadores {memoria['indicadores_s']:.3f}s) - ABC {memoria['classes_abc']}"
+    )
+    print(f"         previsão de demanda ({DIAS} dias, todos os SKUs) em {memoria['previsao_s']:.2f}s")
+
+    if args.sqlite:
+        resultado["sqlite"] = sqlite = medir_sqlite(args)
+        print(
+            f"sqlite:  análise completa em {sqlite['analise_s']:.2f}s "
+            f"({sqlite['movimentacoes_por_s']:,} movimentações/s; carga do banco {sqlite['carga_banco_s']}s)"
+        )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
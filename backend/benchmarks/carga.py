@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Estoque Engenho - Teste de Carga
+
+Executa cenários de carga contra a API e mede latência (p50/p95/p99) e
+vazão de cada um:
+
+    saida     rajadas de leituras do scanner em POST /movimentacoes/saida
+    catalogo  navegação: cores, tipos, páginas de produtos e detalhes,
+              revalidando com If-None-Match como o app faz
+    busca     busca enquanto digita (um GET /produtos/?busca= por tecla)
+    pdf       POST /produtos/etiquetas-pdf com 1000 etiquetas
+
+Por padrão a API roda no mesmo processo (ASGI, sem rede) com o backend
+SQLite (DB_ENGINE=sqlite) num arquivo temporário populado pelo próprio
+script. Com --banco usa outro banco (ex.: um MySQL local vazio) e com --url
+ataca um servidor já rodando.
+
+Uso:
+    python benchmarks/carga.py rodar --saida resultado.json
+    python benchmarks/carga.py rodar --banco mysql+pymysql://root:@localhost/estoque_carga
+    python benchmarks/carga.py rodar --url http://localhost:8000 --cenarios saida,busca
+    python benchmarks/carga.py rodar --base base.json        # roda e compara
+    python benchmarks/carga.py comparar base.json novo.json --limite 0.15
+
+A comparação sai com código 1 se algum cenário piorar além do limite.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CENARIOS = ("saida", "catalogo", "busca", "pdf")
+ETIQUETAS_PDF = 1000
+PALAVRAS_BUSCA = ("blusa", "calça", "vestido", "preto", "branco", "azul", "0001", "00120")
+
+
+# ============= DADOS =============
+
+def preparar_app_local(url_banco: str, quantidade_produtos: int):
+    """Cria o schema, popula o banco e devolve a aplicação apontando para ele"""
+    if url_banco.startswith("sqlite:///"):
+        # SQLite usa o próprio backend da aplicação (DB_ENGINE=sqlite):
+        # mesmos pragmas, schema_sqlite.sql e BEGIN IMMEDIATE nas escritas
+        os.environ["DB_ENGINE"] = "sqlite"
+        os.environ["DB_SQLITE_PATH"] = url_banco.removeprefix("sqlite:///")
+        from app.database import SessionLocal as Sessao, engine, preparar_banco
+        preparar_banco()
+    else:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        from app.models import Base
+        import app.services.estoque_faixas  # noqa: F401 - registram as tabelas no metadata
+        import app.services.idempotencia  # noqa: F401
+        import app.services.jobs  # noqa: F401
+        import app.services.previsao  # noqa: F401
+        from app.services.metricas import instrumentar_engine
+        from app.services.profiler_sql import profiler_sql
+
+        engine = create_engine(url_banco, pool_size=20, max_overflow=20)
+        # Mesma instrumentação do engine da aplicação
+        instrumentar_engine(engine, profiler_sql.observar_consulta)
+        Base.metadata.create_all(engine)
+        Sessao = sessionmaker(bind=engine, autoflush=False)
+
+    from app.models import Cor, Produto, Tipo
+
+    with Sessao() as db:
+        cores = db.query(Cor).order_by(Cor.id).limit(5).all()
+        tipos = db.query(Tipo).order_by(Tipo.id).limit(3).all()
+        if not cores:
+            cores = [Cor(nome=nome, codigo=f"{i:02d}") for i, nome in
+                     enumerate(("Preto", "Branco", "Azul", "Vermelho", "Verde"), 1)]
+            tipos = [Tipo(nome=nome, codigo=f"{i:02d}") for i, nome in
+                     enumerate(("Blusa", "Calça", "Vestido"), 1)]
+            db.add_all(cores + tipos)
+            db.flush()
+
+        if not db.query(Produto).first():
+            produtos = []
+            for i in range(1, quantidade_produtos + 1):
+                tipo, cor = tipos[i % len(tipos)], cores[i % len(cores)]
+                produtos.append({
+                    "codigo_produto": f"{i:04d}",
+                    "codigo_barras": f"{i:04d}{tipo.codigo}{cor.codigo}",
+                    "nome": f"{tipo.nome} {cor.nome} {i}",
+                    "tipo_id": tipo.id,
+                    "cor_id": cor.id,
+                    "estoque_atual": 1_000_000,
+                    "estoque_minimo": 5,
+                    "preco_custo": 25,
+                    "preco_venda": 59.9,
+                })
+            db.bulk_insert_mappings(Produto, produtos)
+        db.commit()
+
+    import app.database as database
+    from app.services.catalogo_cache import catalogo_cache
+    from main import app
+
+    if database.engine is not engine:
+        # Todas as sessões da aplicação (rotas, leituras, faixas, group commit,
+        # jobs) vêm de app.database.SessionLocal, resolvida a cada uso
+        database.SessionLocal = Sessao
+
+    with Sessao() as db:
+        catalogo_cache.carregar(db)
+
+    return app, engine
+
+
+async def carregar_produtos(cliente: httpx.AsyncClient, quantidade: int) -> list:
+    """Produtos usados nos cenários; cria o que faltar em servidores remotos"""
+    resposta = await cliente.get("/produtos/", params={"limit": 1000, "ativo": True})
+    resposta.raise_for_status()
+    produtos = [p for p in resposta.json() if p["estoque_atual"] >= 1000]
+
+    if len(produtos) < quantidade:
+        cor = (await cliente.get("/cores/")).json()[0]
+        tipo = (await cliente.get("/tipos/")).json()[0]
+        for i in range(quantidade - len(produtos)):
+            resposta = await cliente.post("/produtos/", json={
+                "nome": f"Carga {tipo['nome']} {i}",
+                "tipo_id": tipo["id"],
+                "cor_id": cor["id"],
+                "estoque_inicial": 1_000_000,
+                "preco_venda": 59.9
+            })
+            resposta.raise_for_status()
+            produtos.append(resposta.json())
+
+    return produtos[:quantidade]
+
+
+# ============= CENÁRIOS =============
+# Cada cenário gera a lista de requisições (metodo, caminho, kwargs) a partir
+# da semente, para que duas execuções façam exatamente o mesmo trabalho
+
+def gerar_saida(rng: random.Random, produtos: list, total: int) -> list:
+    requisicoes = []
+    while len(requisicoes) < total:
+        # Uma rajada: o operador passa de 1 a 8 peças, às vezes repetidas
+        rajada = rng.sample(produtos, k=min(len(produtos), rng.randint(1, 4)))
+        for _ in range(rng.randint(1, 8)):
+            produto = rng.choice(rajada)
+            requisicoes.append(("POST", "/movimentacoes/saida", {
+                "json": {
+                    "codigo_barras": produto["codigo_barras"],
+                    "quantidade": 1,
+                    "tipo_movimento": "SAIDA"
+                },
+                "idempotente": True
+            }))
+    return requisicoes[:total]
+
+
+def gerar_catalogo(rng: random.Random, produtos: list, total: int) -> list:
+    requisicoes = []
+    while len(requisicoes) < total:
+        requisicoes.append(("GET", "/cores/", {}))
+        requisicoes.append(("GET", "/tipos/", {}))
+        for pagina in range(rng.randint(1, 3)):
+            requisicoes.append(("GET", f"/produtos/?skip={pagina * 50}&limit=50", {}))
+        for produto in rng.sample(produtos, k=min(len(produtos), rng.randint(1, 5))):
+            requisicoes.append(("GET", f"/produtos/{produto['id']}", {}))
+        if rng.random() < 0.3:
+            requisicoes.append(("GET", "/produtos/baixo-estoque", {}))
+    return requisicoes[:total]
+
+
+def gerar_busca(rng: random.Random, produtos: list, total: int) -> list:
+    requisicoes = []
+    while len(requisicoes) < total:
+        palavra = rng.choice(PALAVRAS_BUSCA)
+        for tamanho in range(1, len(palavra) + 1):
+            requisicoes.append(("GET", "/produtos/", {
+                "params": {"busca": palavra[:tamanho], "limit": 20}
+            }))
+    return requisicoes[:total]
+
+
+def gerar_pdf(rng: random.Random, produtos: list, total: int) -> list:
+    ids = [produto["id"] for produto in produtos[:ETIQUETAS_PDF]]
+    return [("POST", "/produtos/etiquetas-pdf", {"json": ids})] * total
+
+
+GERADORES = {
+    "saida": gerar_saida,
+    "catalogo": gerar_catalogo,
+    "busca": gerar_busca,
+    "pdf": gerar_pdf,
+}
+
+
+# ============= EXECUÇÃO =============
+
+def percentil(ordenados: list, fracao: float) -> float:
+    """Percentil com interpolação linear entre as amostras vizinhas"""
+    if not ordenados:
+        return 0.0
+    posicao = (len(ordenados) - 1) * fracao
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+async def executar(cliente: httpx.AsyncClient, requisicoes: list, concorrencia: int) -> dict:
+    """Executa as requisições com N clientes simultâneos e resume o resultado"""
+    latencias = []
+    status_codes = Counter()
+    etags = {}
+    proxima = iter(requisicoes)
+
+    async def usuario():
+        for metodo, caminho, opcoes in proxima:
+            opcoes = dict(opcoes)
+            headers = {}
+            if opcoes.pop("idempotente", False):
+                headers["Idempotency-Key"] = uuid.uuid4().hex
+            chave_etag = (caminho, str(opcoes.get("params")))
+            if metodo == "GET" and chave_etag in etags:
+                headers["If-None-Match"] = etags[chave_etag]
+
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.request(metodo, caminho, headers=headers, **opcoes)
+                codigo = resposta.status_code
+            except httpx.HTTPError:
+                resposta, codigo = None, "erro_conexao"
+            latencias.append(time.perf_counter() - inicio)
+            status_codes[codigo] += 1
+
+            if resposta is not None and resposta.headers.get("etag"):
+                etags[chave_etag] = resposta.headers["etag"]
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+
+    ordenadas = sorted(latencias)
+    erros = sum(
+        quantidade for codigo, quantidade in status_codes.items()
+        if not isinstance(codigo, int) or codigo >= 400
+    )
+    return {
+        "requisicoes": len(latencias),
+        "concorrencia": concorrencia,
+        "erros": erros,
+        "status": {str(codigo): quantidade for codigo, quantidade in sorted(status_codes.items(), key=str)},
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(latencias) / duracao, 2) if duracao else 0.0,
+        "latencia_ms": {
+            "media": round(sum(ordenadas) / len(ordenadas) * 1000, 2) if ordenadas else 0.0,
+            "p50": round(percentil(ordenadas, 0.50) * 1000, 2),
+            "p95": round(percentil(ordenadas, 0.95) * 1000, 2),
+            "p99": round(percentil(ordenadas, 0.99) * 1000, 2),
+            "max": round(ordenadas[-1] * 1000, 2) if ordenadas else 0.0,
+        }
+    }
+
+
+async def rodar_cenarios(cliente: httpx.AsyncClient, args) -> dict:
+    produtos = await carregar_produtos(cliente, args.produtos)
+    resultados = {}
+
+    for nome in args.cenarios:
+        rng = random.Random(f"{args.semente}-{nome}")
+        if nome == "pdf":
+            total, concorrencia, aquecimento = args.pdf_repeticoes, 1, 0
+        else:
+            total, concorrencia, aquecimento = args.requisicoes, args.concorrencia, args.aquecimento
+
+        requisicoes = GERADORES[nome](rng, produtos, aquecimento + total)
+        if aquecimento:
+            await executar(cliente, requisicoes[:aquecimento], concorrencia)
+
+        print(f"▶ {nome}: {total} requisições, {concorrencia} simultâneas", file=sys.stderr)
+        resultados[nome] = await executar(cliente, requisicoes[aquecimento:], concorrencia)
+
+    return resultados
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+async def rodar(args) -> dict:
+    timeout = httpx.Timeout(args.timeout)
+    arquivo_temporario = None
+
+    if args.url:
+        alvo = args.url
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=timeout)
+        app = None
+    else:
+        url_banco = args.banco
+        if not url_banco:
+            descritor, arquivo_temporario = tempfile.mkstemp(prefix="carga_", suffix=".db")
+            os.close(descritor)
+            url_banco = f"sqlite:///{arquivo_temporario}"
+        app, engine = preparar_app_local(url_banco, args.produtos)
+        alvo = f"local ({engine.dialect.name})"
+        cliente = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://carga", timeout=timeout
+        )
+
+    try:
+        async with cliente:
+            if app is not None:
+                async with app.router.lifespan_context(app):
+                    cenarios = await rodar_cenarios(cliente, args)
+            else:
+                cenarios = await rodar_cenarios(cliente, args)
+    finally:
+        if arquivo_temporario:
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(arquivo_temporario + sufixo):
+                    os.remove(arquivo_temporario + sufixo)
+
+    return {
+        "ambiente": {
+            "alvo": alvo,
+            "commit": commit_atual(),
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "parametros": {
+            "cenarios": args.cenarios,
+            "requisicoes": args.requisicoes,
+            "concorrencia": args.concorrencia,
+            "aquecimento": args.aquecimento,
+            "produtos": args.produtos,
+            "pdf_repeticoes": args.pdf_repeticoes,
+            "semente": args.semente
+        },
+        "cenarios": cenarios
+    }
+
+
+# ============= COMPARAÇÃO =============
+
+def comparar(base: dict, novo: dict, limite: float) -> bool:
+    """
+    Compara dois resultados e imprime a variação por cenário
+
+    Returns:
+        True se algum cenário regrediu além do limite (p95, p99 ou vazão)
+    """
+    regrediu = False
+    print(f"{'cenário':<10} {'métrica':<12} {'base':>10} {'novo':>10} {'variação':>9}")
+
+    for nome, atual in novo["cenarios"].items():
+        anterior = base["cenarios"].get(nome)
+        if anterior is None:
+            print(f"{nome:<10} (sem base)")
+            continue
+
+        metricas = [
+            ("p50_ms", anterior["latencia_ms"]["p50"], atual["latencia_ms"]["p50"], False),
+            ("p95_ms", anterior["latencia_ms"]["p95"], atual["latencia_ms"]["p95"], True),
+            ("p99_ms", anterior["latencia_ms"]["p99"], atual["latencia_ms"]["p99"], True),
+            ("vazao_rps", anterior["vazao_rps"], atual["vazao_rps"], True),
+        ]
+        for metrica, valor_base, valor_novo, avaliada in metricas:
+            variacao = (valor_novo - valor_base) / valor_base if valor_base else 0.0
+            # Para vazão, piorar é cair
+            piora = -variacao if metrica == "vazao_rps" else variacao
+            alerta = avaliada and piora > limite
+            regrediu = regrediu or alerta
+            marca = " ❌" if alerta else ""
+            print(f"{nome:<10} {metrica:<12} {valor_base:>10.2f} {valor_novo:>10.2f} {variacao:>+8.1%}{marca}")
+
+        if atual["erros"] > anterior["erros"]:
+            regrediu = True
+            print(f"{nome:<10} {'erros':<12} {anterior['erros']:>10} {atual['erros']:>10} ❌")
+
+    return regrediu
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_rodar = comandos.add_parser("rodar", help="Executa os cenários")
+    p_rodar.add_argument("--url", help="Servidor já rodando (ex.: http://localhost:8000)")
+    p_rodar.add_argument("--banco", help="URL SQLAlchemy do banco local (padrão: SQLite temporário)")
+    p_rodar.add_argument("--cenarios", default=",".join(CENARIOS),
+                         type=lambda valor: [c for c in valor.split(",") if c])
+    p_rodar.add_argument("--requisicoes", type=int, default=500, help="Requisições medidas por cenário")
+    p_rodar.add_argument("--concorrencia", type=int, default=8)
+    p_rodar.add_argument("--aquecimento", type=int, default=50)
+    p_rodar.add_argument("--produtos", type=int, default=ETIQUETAS_PDF)
+    p_rodar.add_argument("--pdf-repeticoes", type=int, default=3)
+    p_rodar.add_argument("--semente", type=int, default=42)
+    p_rodar.add_argument("--timeout", type=float, default=120.0)
+    p_rodar.add_argument("--saida", help="Grava o resultado em JSON")
+    p_rodar.add_argument("--base", help="Resultado anterior para comparar")
+    p_rodar.add_argument("--limite", type=float, default=0.10, help="Piora tolerada (0.10 = 10%%)")
+
+    p_comparar = comandos.add_parser("comparar", help="Compara dois resultados")
+    p_comparar.add_argument("base")
+    p_comparar.add_argument("novo")
+    p_comparar.add_argument("--limite", type=float, default=0.10)
+
+    args = parser.parse_args()
+
+    if args.comando == "comparar":
+        with open(args.base) as arquivo:
+            base = json.load(arquivo)
+        with open(args.novo) as arquivo:
+            novo = json.load(arquivo)
+        sys.exit(1 if comparar(base, novo, args.limite) else 0)
+
+    desconhecidos = set(args.cenarios) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    resultado = asyncio.run(rodar(args))
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    if args.base:
+        with open(args.base) as arquivo:
+            base = json.load(arquivo)
+        if comparar(base, resultado, args.limite):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
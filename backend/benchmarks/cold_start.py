@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Estoque Engenho - Benchmark de Inicialização a Frio
+
+Mede, em processos novos, o tempo até a primeira resposta da API:
+importação do módulo da aplicação, lifespan (startup) e um GET /health.
+Cada rodada é um interpretador novo, como um worker recém-iniciado.
+
+Uso:
+    python benchmarks/cold_start.py                      # backend (main:app)
+    python benchmarks/cold_start.py --dir .. --rodadas 10  # API da raiz
+    DB_STARTUP_MODE=nenhum python benchmarks/cold_start.py --dir ..
+
+Sai com código 1 se a mediana até a primeira resposta passar de --alvo-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script executado em cada processo filho
+SONDA = r"""
+import json, sys, time
+from fastapi.testclient import TestClient  # fora da medição: não faz parte da API
+
+inicio = time.perf_counter()
+sys.path.insert(0, {diretorio!r})
+modulo, atributo = {app!r}.split(":")
+app = getattr(__import__(modulo), atributo)
+importado = time.perf_counter()
+
+with TestClient(app) as cliente:
+    iniciado = time.perf_counter()
+    resposta = cliente.get("/health")
+    primeira = time.perf_counter()
+
+pesados = [m for m in ("reportlab", "PIL", "qrcode", "barcode") if m in sys.modules]
+print(json.dumps({{
+    "importacao_ms": (importado - inicio) * 1000,
+    "startup_ms": (iniciado - importado) * 1000,
+    "primeira_requisicao_ms": (primeira - inicio) * 1000,
+    "status": resposta.status_code,
+    "modulos_pesados": pesados
+}}))
+"""
+
+
+def rodar(diretorio: str, app: str) -> dict:
+    inicio = time.perf_counter()
+    resultado = subprocess.run(
+        [sys.executable, "-c", SONDA.format(diretorio=diretorio, app=app)],
+        cwd=diretorio,
+        capture_output=True,
+        text=True
+    )
+    parede = (time.perf_counter() - inicio) * 1000
+
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr)
+
+    dados = json.loads(resultado.stdout.strip().splitlines()[-1])
+    dados["processo_total_ms"] = parede
+    return dados
+
+
+def resumir(valores):
+    return {
+        "mediana": round(statistics.median(valores), 1),
+        "min": round(min(valores), 1),
+        "max": round(max(valores), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização a frio")
+    parser.add_argument("--dir", default=BACKEND_DIR, help="Diretório da aplicação")
+    parser.add_argument("--app", default="main:app", help="Módulo e atributo da aplicação")
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--alvo-ms", type=float, default=300.0)
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    diretorio = os.path.abspath(args.dir)
+    rodadas = [rodar(diretorio, args.app) for _ in range(args.rodadas)]
+
+    resultado = {
+        "app": args.app,
+        "diretorio": diretorio,
+        "rodadas": args.rodadas,
+        "alvo_ms": args.alvo_ms,
+        "importacao_ms": resumir([r["importacao_ms"] for r in rodadas]),
+        "startup_ms": resumir([r["startup_ms"] for r in rodadas]),
+        "primeira_requisicao_ms": resumir([r["primeira_requisicao_ms"] for r in rodadas]),
+        "processo_total_ms": resumir([r["processo_total_ms"] for r in rodadas]),
+        "modulos_pesados": rodadas[-1]["modulos_pesados"]
+    }
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    mediana = resultado["primeira_requisicao_ms"]["mediana"]
+    if mediana > args.alvo_ms:
+        print(f"❌ Primeira resposta em {mediana} ms (alvo: {args.alvo_ms} ms)")
+        sys.exit(1)
+    print(f"✅ Primeira resposta em {mediana} ms (alvo: {args.alvo_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()
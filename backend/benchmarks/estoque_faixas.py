@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Estoque Engenho - Benchmark de Contenção (um SKU concorrido)
+
+Todas as requisições são POST /movimentacoes/saida do mesmo produto, como
+na abertura de uma promoção. Roda duas vezes, cada uma num processo novo e
+com banco novo: estoque numa linha só e estoque distribuído em faixas
+(DB_ESTOQUE_FAIXAS, PUT /produtos/{id}/estoque-faixas).
+
+O ganho aparece em bancos com lock por linha (MySQL/InnoDB). No SQLite
+toda escrita já é serializada pelo lock do arquivo, então as duas rodadas
+ficam parecidas; serve para conferir que o modo em faixas não perde
+movimentações nem deixa o estoque negativo.
+
+Uso:
+    python benchmarks/estoque_faixas.py
+    python benchmarks/estoque_faixas.py --banco mysql+pymysql://root:@localhost/estoque_carga
+    python benchmarks/estoque_faixas.py --concorrencia 64 --faixas 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from carga import executar, preparar_app_local  # noqa: E402
+
+
+async def rodar_modo(args) -> dict:
+    """Executa as saídas de um SKU no modo atual (variáveis de ambiente)"""
+    arquivo_temporario = None
+    url_banco = args.banco
+    if not url_banco:
+        descritor, arquivo_temporario = tempfile.mkstemp(prefix="faixas_", suffix=".db")
+        os.close(descritor)
+        url_banco = f"sqlite:///{arquivo_temporario}"
+
+    try:
+        app, _ = preparar_app_local(url_banco, 1)
+        cliente = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://carga", timeout=120
+        )
+        async with cliente, app.router.lifespan_context(app):
+            produto = (await cliente.get("/produtos/", params={"limit": 1})).json()[0]
+            if args.faixas:
+                resposta = await cliente.put(
+                    f"/produtos/{produto['id']}/estoque-faixas", params={"faixas": args.faixas}
+                )
+                resposta.raise_for_status()
+
+            requisicao = ("POST", "/movimentacoes/saida", {"json": {
+                "codigo_barras": produto["codigo_barras"],
+                "quantidade": 1,
+                "tipo_movimento": "SAIDA"
+            }})
+            resultado = await executar(cliente, [requisicao] * args.requisicoes, args.concorrencia)
+
+            if args.faixas:
+                await cliente.delete(f"/produtos/{produto['id']}/estoque-faixas")
+            final = (await cliente.get(f"/produtos/{produto['id']}")).json()["estoque_atual"]
+            resultado["estoque_consumido"] = produto["estoque_atual"] - final
+            return resultado
+    finally:
+        if arquivo_temporario:
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(arquivo_temporario + sufixo):
+                    os.remove(arquivo_temporario + sufixo)
+
+
+def rodar_processo(args, faixas: int) -> dict:
+    """Roda um modo num processo novo (as configurações são lidas no import)"""
+    env = dict(os.environ)
+    env["DB_ESTOQUE_FAIXAS"] = str(bool(faixas))
+    env["DB_POOL_SIZE"] = str(args.concorrencia)
+    comando = [
+        sys.executable, os.path.abspath(__file__), "--interno",
+        "--faixas", str(faixas),
+        "--requisicoes", str(args.requisicoes),
+        "--concorrencia", str(args.concorrencia),
+    ]
+    if args.banco:
+        comando += ["--banco", args.banco]
+    saida = subprocess.run(comando, cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Saídas simultâneas de um SKU: linha única x faixas")
+    parser.add_argument("--banco", help="URL SQLAlchemy (padrão: SQLite temporário)")
+    parser.add_argument("--requisicoes", type=int, default=1000)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--faixas", type=int, default=8)
+    parser.add_argument("--saida", help="Grava os dois resultados em JSON")
+    parser.add_argument("--interno", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(asyncio.run(rodar_modo(args))))
+        return
+
+    resultados = {
+        "linha_unica": rodar_processo(args, 0),
+        f"faixas_{args.faixas}": rodar_processo(args, args.faixas),
+    }
+
+    print(f"\n{'':14} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'erros':>7} {'consumido':>10}")
+    for nome, resultado in resultados.items():
+        latencia = resultado["latencia_ms"]
+        print(
+            f"{nome:14} {resultado['vazao_rps']:>10.1f} {latencia['p50']:>10.2f} "
+            f"{latencia['p99']:>10.2f} {resultado['erros']:>7} {resultado['estoque_consumido']:>10}"
+        )
+
+    base = resultados["linha_unica"]["vazao_rps"]
+    if base:
+        ganho = resultados[f"faixas_{args.faixas}"]["vazao_rps"] / base
+        print(f"\nVazão com faixas: {ganho:.2f}x")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
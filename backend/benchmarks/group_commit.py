@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Estoque Engenho - Benchmark do Group Commit
+
+Roda o cenário `saida` do teste de carga (benchmarks/carga.py) duas vezes,
+com DB_GROUP_COMMIT desligado e ligado, e compara vazão e latência. Cada
+rodada é um processo novo, com banco novo e a mesma semente.
+
+No SQLite o padrão aqui é synchronous=FULL (um fsync por commit), que é o
+custo que o group commit divide entre as movimentações do lote; com
+--synchronous NORMAL o ganho é menor.
+
+Uso:
+    python benchmarks/group_commit.py
+    python benchmarks/group_commit.py --concorrencia 32 --requisicoes 2000
+    python benchmarks/group_commit.py --janela-ms 5 --lote-max 128
+    python benchmarks/group_commit.py --banco mysql+pymysql://root:@localhost/estoque_carga
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARGA = os.path.join(BACKEND_DIR, "benchmarks", "carga.py")
+
+
+def rodar(args, group_commit: bool) -> dict:
+    """Executa o cenário de saídas num processo novo e devolve o resultado"""
+    env = dict(os.environ)
+    env.update({
+        "DB_GROUP_COMMIT": str(group_commit),
+        "DB_GROUP_COMMIT_JANELA_MS": str(args.janela_ms),
+        "DB_GROUP_COMMIT_LOTE_MAX": str(args.lote_max),
+        "DB_SQLITE_SYNCHRONOUS": args.synchronous,
+        # O pool precisa comportar todas as requisições simultâneas
+        "DB_POOL_SIZE": str(args.concorrencia),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as arquivo:
+        saida = arquivo.name
+    comando = [
+        sys.executable, CARGA, "rodar",
+        "--cenarios", "saida",
+        "--requisicoes", str(args.requisicoes),
+        "--concorrencia", str(args.concorrencia),
+        "--produtos", str(args.produtos),
+        "--saida", saida,
+    ]
+    if args.banco:
+        comando += ["--banco", args.banco]
+
+    try:
+        subprocess.run(comando, cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(saida, encoding="utf-8") as arquivo:
+            return json.load(arquivo)["cenarios"]["saida"]
+    finally:
+        os.remove(saida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara movimentações com e sem group commit")
+    parser.add_argument("--banco", help="URL SQLAlchemy (padrão: SQLite temporário)")
+    parser.add_argument("--requisicoes", type=int, default=1000)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--produtos", type=int, default=200)
+    parser.add_argument("--janela-ms", type=float, default=2)
+    parser.add_argument("--lote-max", type=int, default=64)
+    parser.add_argument("--synchronous", default="FULL", choices=("NORMAL", "FULL"))
+    parser.add_argument("--saida", help="Grava os dois resultados em JSON")
+    args = parser.parse_args()
+
+    resultados = {
+        "sem_group_commit": rodar(args, group_commit=False),
+        "com_group_commit": rodar(args, group_commit=True),
+    }
+
+    print(f"\n{'':20} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'erros':>7}")
+    for nome, resultado in resultados.items():
+        latencia = resultado["latencia_ms"]
+        print(
+            f"{nome:20} {resultado['vazao_rps']:>10.1f} {latencia['p50']:>10.2f} "
+            f"{latencia['p99']:>10.2f} {resultado['erros']:>7}"
+        )
+
+    base = resultados["sem_group_commit"]["vazao_rps"]
+    if base:
+        ganho = resultados["com_group_commit"]["vazao_rps"] / base
+        print(f"\nVazão com group commit: {ganho:.2f}x")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
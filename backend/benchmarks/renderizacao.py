@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Estoque Engenho - Microbenchmark do BarcodeService
+
+Mede, sem API nem banco, as renderizações do BarcodeService:
+
+    code128   gerar_imagem_code128
+    qrcode    gerar_imagem_qrcode
+    etiqueta  gerar_etiqueta_produto
+    pdf       gerar_pdf_etiquetas (PDF com N etiquetas)
+
+Cada caso roda uma renderização isolada e lotes de 10, 100 e 1000 itens.
+Também mostra o tamanho médio da saída por item (PNG ou parte do PDF).
+O tempo é a mediana de --repeticoes execuções; o pico de memória vem do
+tracemalloc, numa execução separada (o tracemalloc deixa tudo mais lento).
+
+A baseline registra o ambiente em que foi gravada (CPU, Python e plataforma)
+e só é comparada com execuções no mesmo ambiente.
+
+Uso:
+    python benchmarks/renderizacao.py                         # mede e compara com a baseline
+    python benchmarks/renderizacao.py --salvar-baseline       # grava a baseline desta máquina
+    python benchmarks/renderizacao.py --casos etiqueta,pdf --lotes 1,10 --limite 0.15
+
+Sai com código 1 se algum caso ficar mais lento ou usar mais memória do
+que a baseline além de --limite.
+"""
+import argparse
+import base64
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.barcode_service import BarcodeService  # noqa: E402
+
+BASELINE_PADRAO = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "renderizacao.json")
+CASOS = ("code128", "qrcode", "etiqueta", "pdf")
+LOTES = (1, 10, 100, 1000)
+
+
+def dados_etiqueta(indice: int) -> dict:
+    return {
+        "codigo_barras": f"{indice % 10000:04d}0101",
+        "nome_produto": f"Blusa Manga Longa Preta {indice}",
+        "tipo_nome": "Blusa",
+        "cor_nome": "Preto",
+        "preco": 59.9
+    }
+
+
+def tarefa(caso: str, lote: int):
+    """Função sem argumentos que renderiza um lote do caso informado"""
+    if caso == "code128":
+        codigos = [f"{i % 10000:04d}0101" for i in range(lote)]
+        return lambda: [BarcodeService.gerar_imagem_code128(codigo) for codigo in codigos]
+    if caso == "qrcode":
+        codigos = [f"{i % 10000:04d}0101" for i in range(lote)]
+        return lambda: [BarcodeService.gerar_imagem_qrcode(codigo) for codigo in codigos]
+    if caso == "etiqueta":
+        etiquetas = [dados_etiqueta(i) for i in range(lote)]
+        return lambda: [BarcodeService.gerar_etiqueta_produto(**dados) for dados in etiquetas]
+    etiquetas = [dados_etiqueta(i) for i in range(lote)]
+    return lambda: BarcodeService.gerar_pdf_etiquetas(etiquetas)
+
+
+def repeticoes_para(lote: int, repeticoes: int) -> int:
+    # Lotes grandes já somam muitas renderizações em cada execução
+    return max(1, repeticoes // lote) if lote > 1 else repeticoes
+
+
+def medir(caso: str, lote: int, repeticoes: int) -> dict:
+    funcao = tarefa(caso, lote)
+    saida = funcao()  # aquecimento: importações, fontes e caches
+    if isinstance(saida, bytes):
+        tamanho = len(saida) / lote
+    else:
+        tamanho = sum(len(base64.b64decode(imagem)) for imagem in saida) / lote
+
+    tempos = []
+    for _ in range(repeticoes_para(lote, repeticoes)):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mediana = statistics.median(tempos)
+    return {
+        "execucoes": len(tempos),
+        "mediana_ms": round(mediana * 1000, 3),
+        "min_ms": round(min(tempos) * 1000, 3),
+        "desvio_ms": round(statistics.stdev(tempos) * 1000, 3) if len(tempos) > 1 else 0.0,
+        "por_item_ms": round(mediana * 1000 / lote, 3),
+        "pico_memoria_kb": round(pico / 1024, 1),
+        "bytes_por_item": round(tamanho)
+    }
+
+
+def ambiente() -> dict:
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+
+def comparar(base: dict, atual: dict, limite: float) -> bool:
+    """Imprime a variação de cada medição; True se houver regressão"""
+    regrediu = False
+    print(f"{'caso':<18} {'ms/item base':>12} {'atual':>9} {'var.':>8}   {'pico KB base':>12} {'atual':>9} {'var.':>8}")
+
+    for chave, medicao in atual["medicoes"].items():
+        anterior = base["medicoes"].get(chave)
+        if anterior is None:
+            continue
+        var_tempo = medicao["por_item_ms"] / anterior["por_item_ms"] - 1 if anterior["por_item_ms"] else 0.0
+        var_memoria = (
+            medicao["pico_memoria_kb"] / anterior["pico_memoria_kb"] - 1
+            if anterior["pico_memoria_kb"] else 0.0
+        )
+        alerta = var_tempo > limite or var_memoria > limite
+        regrediu = regrediu or alerta
+        print(
+            f"{chave:<18} {anterior['por_item_ms']:>12.3f} {medicao['por_item_ms']:>9.3f} {var_tempo:>+8.1%}"
+            f"   {anterior['pico_memoria_kb']:>12.1f} {medicao['pico_memoria_kb']:>9.1f} {var_memoria:>+8.1%}"
+            f"{' ❌' if alerta else ''}"
+        )
+
+    return regrediu
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark do BarcodeService")
+    parser.add_argument("--casos", default=",".join(CASOS))
+    parser.add_argument("--lotes", default=",".join(str(lote) for lote in LOTES))
+    parser.add_argument("--repeticoes", type=int, default=200,
+                        help="Execuções da renderização isolada (lotes usam repeticoes/lote)")
+    parser.add_argument("--baseline", default=BASELINE_PADRAO)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--limite", type=float, default=0.10, help="Piora tolerada (0.10 = 10%%)")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    casos = [caso for caso in args.casos.split(",") if caso]
+    desconhecidos = set(casos) - set(CASOS)
+    if desconhecidos:
+        parser.error(f"casos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    lotes = [int(lote) for lote in args.lotes.split(",") if lote]
+
+    resultado = {
+        "ambiente": ambiente(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "medicoes": {}
+    }
+    for caso in casos:
+        for lote in lotes:
+            chave = f"{caso}[{lote}]"
+            resultado["medicoes"][chave] = medicao = medir(caso, lote, args.repeticoes)
+            print(
+                f"{chave:<18} {medicao['mediana_ms']:>10.2f} ms  "
+                f"{medicao['por_item_ms']:>8.3f} ms/item  {medicao['pico_memoria_kb']:>10.1f} KB"
+                f"  {medicao['bytes_por_item']:>8} B/item",
+                file=sys.stderr
+            )
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    if args.salvar_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        base = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as arquivo:
+                base = json.load(arquivo)
+        if base.get("ambiente") == resultado["ambiente"]:
+            # Mesma máquina: atualiza só os casos medidos agora
+            base["medicoes"].update(resultado["medicoes"])
+            base["data"] = resultado["data"]
+        else:
+            base = resultado
+        with open(args.baseline, "w") as arquivo:
+            json.dump(base, arquivo, indent=2, ensure_ascii=False)
+        print(f"✅ Baseline gravada em {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ Sem baseline em {args.baseline}; use --salvar-baseline para gravar uma")
+        return
+
+    with open(args.baseline) as arquivo:
+        base = json.load(arquivo)
+    if base.get("ambiente") != resultado["ambiente"]:
+        print("⚠️ Baseline gravada em outro ambiente; comparação não é confiável")
+        print(f"   baseline: {base.get('ambiente')}")
+        print(f"   atual:    {resultado['ambiente']}")
+        return
+
+    if comparar(base, resultado, args.limite):
+        print(f"❌ Regressão acima de {args.limite:.0%}")
+        sys.exit(1)
+    print(f"✅ Sem regressões acima de {args.limite:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+-- Estoque Engenho - Migração 001
+-- Índice usado pela sincronização incremental (GET /sync?since=...)
+
+USE estoque_engenho;
+
+ALTER TABLE produtos ADD INDEX idx_updated_at (updated_at);
@@ -0,0 +1,12 @@
+-- Estoque Engenho - Migração 002
+-- Chaves de idempotência para POST /movimentacoes/entrada|saida|ajuste
+
+USE estoque_engenho;
+
+CREATE TABLE IF NOT EXISTS idempotencia_movimentacoes (
+    chave VARCHAR(64) PRIMARY KEY,
+    assinatura CHAR(64) NOT NULL,
+    movimentacao_id INT NOT NULL,
+    criado_em DATETIME NOT NULL,
+    INDEX idx_criado_em (criado_em)
+);
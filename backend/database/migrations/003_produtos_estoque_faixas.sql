@@ -0,0 +1,12 @@
+-- Estoque Engenho - Migração 003
+-- Estoque distribuído em faixas para SKUs concorridos (DB_ESTOQUE_FAIXAS)
+
+USE estoque_engenho;
+
+CREATE TABLE IF NOT EXISTS produtos_estoque_faixas (
+    produto_id INT NOT NULL,
+    faixa INT NOT NULL,
+    saldo INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (produto_id, faixa),
+    FOREIGN KEY (produto_id) REFERENCES produtos(id)
+);
@@ -0,0 +1,23 @@
+-- Estoque Engenho - Migração 004
+-- Fila de jobs em segundo plano (/jobs)
+
+USE estoque_engenho;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id CHAR(32) PRIMARY KEY,
+    tipo VARCHAR(30) NOT NULL,
+    status VARCHAR(12) NOT NULL DEFAULT 'pendente',
+    parametros TEXT NOT NULL,
+    progresso INT NOT NULL DEFAULT 0,
+    erro VARCHAR(255),
+    processo VARCHAR(100),
+    nome_arquivo VARCHAR(255),
+    media_type VARCHAR(100),
+    tamanho_bytes INT,
+    criado_em DATETIME NOT NULL,
+    atualizado_em DATETIME NOT NULL,
+    concluido_em DATETIME,
+    expira_em DATETIME,
+    INDEX idx_jobs_status (status),
+    INDEX idx_jobs_expira_em (expira_em)
+);
@@ -0,0 +1,16 @@
+-- Estoque Engenho - Migração 005
+-- Previsão de demanda e ponto de reposição (/relatorios/previsoes)
+
+USE estoque_engenho;
+
+CREATE TABLE IF NOT EXISTS previsoes_reposicao (
+    produto_id INT PRIMARY KEY,
+    demanda_diaria DOUBLE NOT NULL,
+    desvio_diario DOUBLE NOT NULL,
+    estoque_seguranca INT NOT NULL,
+    ponto_reposicao INT NOT NULL,
+    estoque_atual INT NOT NULL,
+    dias_ate_ruptura DOUBLE,
+    calculado_em DATETIME NOT NULL,
+    FOREIGN KEY (produto_id) REFERENCES produtos(id)
+);
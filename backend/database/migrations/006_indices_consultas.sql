@@ -0,0 +1,19 @@
+-- Estoque Engenho - Migração 006
+-- Índices compostos apontados por benchmarks/planos_consulta.py:
+-- listagem de produtos por created_at e movimentações por produto/tipo
+-- já na ordem de data_movimento (sem full scan nem filesort)
+
+USE estoque_engenho;
+
+ALTER TABLE produtos
+    ADD INDEX idx_created_at (created_at),
+    ADD INDEX idx_tipo_created_at (tipo_id, created_at),
+    ADD INDEX idx_cor_created_at (cor_id, created_at);
+
+-- Os compostos começam pelas mesmas colunas: idx_produto (que também
+-- atendia à chave estrangeira) e idx_tipo ficam redundantes
+ALTER TABLE movimentacoes
+    ADD INDEX idx_produto_data (produto_id, data_movimento),
+    ADD INDEX idx_tipo_data (tipo_movimento, data_movimento),
+    DROP INDEX idx_produto,
+    DROP INDEX idx_tipo;
@@ -44,7 +44,12 @@ CREATE TABLE produtos (
     FOREIGN KEY (tipo_id) REFERENCES tipos(id),
     FOREIGN KEY (cor_id) REFERENCES cores(id),
     INDEX idx_codigo_barras (codigo_barras),
-    INDEX idx_estoque (estoque_atual)
+    INDEX idx_estoque (estoque_atual),
+    INDEX idx_updated_at (updated_at),
+    -- Listagem (GET /produtos/) em ordem de criação, com ou sem filtro de tipo/cor
+    INDEX idx_created_at (created_at),
+    INDEX idx_tipo_created_at (tipo_id, created_at),
+    INDEX idx_cor_created_at (cor_id, created_at)
 );
 
 -- Tabela de Movimentações
@@ -59,9 +64,61 @@ CREATE TABLE movimentacoes (
     usuario VARCHAR(100),
     data_movimento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (produto_id) REFERENCES produtos(id),
-    INDEX idx_produto (produto_id),
+    -- Histórico e filtros já na ordem de data_movimento (sem filesort)
+    INDEX idx_produto_data (produto_id, data_movimento),
     INDEX idx_data (data_movimento),
-    INDEX idx_tipo (tipo_movimento)
+    INDEX idx_tipo_data (tipo_movimento, data_movimento)
+);
+
+-- Chaves de idempotência das movimentações (cabeçalho Idempotency-Key)
+CREATE TABLE idempotencia_movimentacoes (
+    chave VARCHAR(64) PRIMARY KEY,
+    assinatura CHAR(64) NOT NULL,
+    movimentacao_id INT NOT NULL,
+    criado_em DATETIME NOT NULL,
+    INDEX idx_criado_em (criado_em)
+);
+
+-- Estoque distribuído em faixas dos produtos concorridos (DB_ESTOQUE_FAIXAS)
+CREATE TABLE produtos_estoque_faixas (
+    produto_id INT NOT NULL,
+    faixa INT NOT NULL,
+    saldo INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (produto_id, faixa),
+    FOREIGN KEY (produto_id) REFERENCES produtos(id)
+);
+
+-- Jobs em segundo plano: exportações e lotes de etiquetas (/jobs)
+CREATE TABLE jobs (
+    id CHAR(32) PRIMARY KEY,
+    tipo VARCHAR(30) NOT NULL,
+    status VARCHAR(12) NOT NULL DEFAULT 'pendente',
+    parametros TEXT NOT NULL,
+    progresso INT NOT NULL DEFAULT 0,
+    erro VARCHAR(255),
+    processo VARCHAR(100),
+    nome_arquivo VARCHAR(255),
+    media_type VARCHAR(100),
+    tamanho_bytes INT,
+    criado_em DATETIME NOT NULL,
+    atualizado_em DATETIME NOT NULL,
+    concluido_em DATETIME,
+    expira_em DATETIME,
+    INDEX idx_jobs_status (status),
+    INDEX idx_jobs_expira_em (expira_em)
+);
+
+-- Previsão de demanda e ponto de reposição, recalculados toda noite (/relatorios/previsoes)
+CREATE TABLE previsoes_reposicao (
+    produto_id INT PRIMARY KEY,
+    demanda_diaria DOUBLE NOT NULL,
+    desvio_diario DOUBLE NOT NULL,
+    estoque_seguranca INT NOT NULL,
+    ponto_reposicao INT NOT NULL,
+    estoque_atual INT NOT NULL,
+    dias_ate_ruptura DOUBLE,
+    calculado_em DATETIME NOT NULL,
+    FOREIGN KEY (produto_id) REFERENCES produtos(id)
 );
 
 -- Inserir cores padrão
@@ -0,0 +1,175 @@
+-- Estoque Engenho - Schema do Banco de Dados (SQLite)
+-- Equivalente ao schema.sql para instalações de loja única (DB_ENGINE=sqlite).
+-- Aplicado automaticamente na inicialização quando o arquivo ainda não tem as tabelas.
+--
+-- Diferenças em relação ao MySQL:
+--   ENUM e BOOLEAN viram CHECK; datas são gravadas em hora local, como a API grava;
+--   ON UPDATE CURRENT_TIMESTAMP é feito por triggers.
+
+-- Tabela de Cores
+CREATE TABLE IF NOT EXISTS cores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome VARCHAR(50) NOT NULL,
+    codigo CHAR(2) NOT NULL UNIQUE,
+    ativo BOOLEAN NOT NULL DEFAULT 1 CHECK (ativo IN (0, 1)),
+    created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+    updated_at DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+-- Tabela de Tipos/Categorias
+CREATE TABLE IF NOT EXISTS tipos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome VARCHAR(100) NOT NULL,
+    codigo CHAR(2) NOT NULL UNIQUE,
+    descricao TEXT,
+    ativo BOOLEAN NOT NULL DEFAULT 1 CHECK (ativo IN (0, 1)),
+    created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+    updated_at DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+-- Tabela de Produtos
+CREATE TABLE IF NOT EXISTS produtos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codigo_produto CHAR(4) NOT NULL UNIQUE,
+    nome VARCHAR(200) NOT NULL,
+    tipo_id INTEGER NOT NULL REFERENCES tipos(id),
+    cor_id INTEGER NOT NULL REFERENCES cores(id),
+    codigo_barras VARCHAR(20) NOT NULL UNIQUE,
+    estoque_atual INTEGER DEFAULT 0,
+    estoque_minimo INTEGER DEFAULT 5,
+    preco_custo DECIMAL(10, 2),
+    preco_venda DECIMAL(10, 2),
+    observacoes TEXT,
+    ativo BOOLEAN NOT NULL DEFAULT 1 CHECK (ativo IN (0, 1)),
+    created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+    updated_at DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_estoque ON produtos (estoque_atual);
+CREATE INDEX IF NOT EXISTS idx_updated_at ON produtos (updated_at);
+-- Listagem (GET /produtos/) em ordem de criação, com ou sem filtro de tipo/cor
+CREATE INDEX IF NOT EXISTS idx_created_at ON produtos (created_at);
+CREATE INDEX IF NOT EXISTS idx_tipo_created_at ON produtos (tipo_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_cor_created_at ON produtos (cor_id, created_at);
+
+-- Tabela de Movimentações
+CREATE TABLE IF NOT EXISTS movimentacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    produto_id INTEGER NOT NULL REFERENCES produtos(id),
+    tipo_movimento VARCHAR(7) NOT NULL CHECK (tipo_movimento IN ('ENTRADA', 'SAIDA', 'AJUSTE')),
+    quantidade INTEGER NOT NULL,
+    estoque_anterior INTEGER NOT NULL,
+    estoque_atual INTEGER NOT NULL,
+    observacao VARCHAR(255),
+    usuario VARCHAR(100),
+    data_movimento DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+-- Histórico e filtros já na ordem de data_movimento (sem ordenação em memória)
+CREATE INDEX IF NOT EXISTS idx_produto_data ON movimentacoes (produto_id, data_movimento);
+CREATE INDEX IF NOT EXISTS idx_data ON movimentacoes (data_movimento);
+CREATE INDEX IF NOT EXISTS idx_tipo_data ON movimentacoes (tipo_movimento, data_movimento);
+-- Substituídos pelos compostos acima (bancos criados antes da migração 006)
+DROP INDEX IF EXISTS idx_produto;
+DROP INDEX IF EXISTS idx_tipo;
+
+-- Chaves de idempotência das movimentações (cabeçalho Idempotency-Key)
+CREATE TABLE IF NOT EXISTS idempotencia_movimentacoes (
+    chave VARCHAR(64) PRIMARY KEY,
+    assinatura CHAR(64) NOT NULL,
+    movimentacao_id INTEGER NOT NULL,
+    criado_em DATETIME NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_criado_em ON idempotencia_movimentacoes (criado_em);
+
+-- Estoque distribuído em faixas dos produtos concorridos (DB_ESTOQUE_FAIXAS)
+CREATE TABLE IF NOT EXISTS produtos_estoque_faixas (
+    produto_id INTEGER NOT NULL REFERENCES produtos(id),
+    faixa INTEGER NOT NULL,
+    saldo INTEGER NOT NULL DEFAULT 0 CHECK (saldo >= 0),
+    PRIMARY KEY (produto_id, faixa)
+);
+
+-- Jobs em segundo plano: exportações e lotes de etiquetas (/jobs)
+CREATE TABLE IF NOT EXISTS jobs (
+    id CHAR(32) PRIMARY KEY,
+    tipo VARCHAR(30) NOT NULL,
+    status VARCHAR(12) NOT NULL DEFAULT 'pendente',
+    parametros TEXT NOT NULL,
+    progresso INTEGER NOT NULL DEFAULT 0,
+    erro VARCHAR(255),
+    processo VARCHAR(100),
+    nome_arquivo VARCHAR(255),
+    media_type VARCHAR(100),
+    tamanho_bytes INTEGER,
+    criado_em DATETIME NOT NULL,
+    atualizado_em DATETIME NOT NULL,
+    concluido_em DATETIME,
+    expira_em DATETIME
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_expira_em ON jobs (expira_em);
+
+-- Previsão de demanda e ponto de reposição, recalculados toda noite (/relatorios/previsoes)
+CREATE TABLE IF NOT EXISTS previsoes_reposicao (
+    produto_id INTEGER PRIMARY KEY REFERENCES produtos(id),
+    demanda_diaria REAL NOT NULL,
+    desvio_diario REAL NOT NULL,
+    estoque_seguranca INTEGER NOT NULL,
+    ponto_reposicao INTEGER NOT NULL,
+    estoque_atual INTEGER NOT NULL,
+    dias_ate_ruptura REAL,
+    calculado_em DATETIME NOT NULL
+);
+
+-- updated_at automático (equivalente ao ON UPDATE CURRENT_TIMESTAMP do MySQL).
+-- Só age quando o UPDATE não definiu updated_at, como a API já faz
+CREATE TRIGGER IF NOT EXISTS trg_cores_updated_at AFTER UPDATE ON cores
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE cores SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipos_updated_at AFTER UPDATE ON tipos
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE tipos SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_produtos_updated_at AFTER UPDATE ON produtos
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE produtos SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+-- Inserir cores padrão
+INSERT OR IGNORE INTO cores (nome, codigo) VALUES
+('Preto', '01'),
+('Branco', '02'),
+('Vermelho', '03'),
+('Azul', '04'),
+('Verde', '05'),
+('Amarelo', '06'),
+('Rosa', '07'),
+('Roxo', '08'),
+('Laranja', '09'),
+('Marrom', '10'),
+('Cinza', '11'),
+('Bege', '12'),
+('Nude', '13'),
+('Estampado', '99');
+
+-- Inserir tipos padrão (exemplo para loja de roupas)
+INSERT OR IGNORE INTO tipos (nome, codigo, descricao) VALUES
+('Blusa', '01', 'Blusas e camisetas'),
+('Calça', '02', 'Calças e leggings'),
+('Vestido', '03', 'Vestidos'),
+('Saia', '04', 'Saias'),
+('Short', '05', 'Shorts'),
+('Conjunto', '06', 'Conjuntos'),
+('Casaco', '07', 'Casacos e jaquetas'),
+('Macacão', '08', 'Macacões'),
+('Cropped', '09', 'Croppeds'),
+('Body', '10', 'Bodies');
@@ -0,0 +1,46 @@
+"""
+Estoque Engenho - Configuração do Gunicorn
+
+Modo multi-worker: cada worker é um processo uvicorn com GIL próprio. O
+padrão é um worker por CPU disponível ao container.
+Uso:
+    gunicorn main:app -c gunicorn.conf.py
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# sched_getaffinity respeita o limite de CPUs do container; os.cpu_count() enxerga as do host
+_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+workers = int(os.getenv("WEB_CONCURRENCY", _cpus))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# A aplicação é importada no mestre e aquecida antes do fork: os workers
+# herdam cache, módulos e fontes em copy-on-write e os contadores de versão
+# (ETags) e o anel de eventos do /eventos/stream ficam compartilhados entre eles
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Tempo para as requisições em andamento terminarem após o SIGTERM
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Atrás do proxy (Railway), o IP do cliente vem em X-Forwarded-For; sem isso
+# request.client.host é o endereço do proxy para todos os aparelhos
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "*")
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """Executado no mestre depois do preload e antes de criar os workers"""
+    from app.services.processos import aquecer_antes_do_fork
+
+    aquecer_antes_do_fork()
+
+
+def post_fork(server, worker):
+    """Executado em cada worker logo após o fork"""
+    from app.services.processos import reiniciar_apos_fork
+
+    reiniciar_apos_fork()
@@ -0,0 +1,121 @@
+"""
+Estoque Engenho - API Principal
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from app.config import settings
+from app.database import engine, engines_replica, nova_sessao, preparar_banco
+from app.routers import (
+    cores, tipos, produtos, movimentacoes, sync, eventos, diagnostico, metricas, jobs,
+    relatorios
+)
+from app.services.catalogo_cache import catalogo_cache
+from app.services.estoque_faixas import estoque_faixas_service
+from app.services.jobs import fila_jobs
+from app.services.metricas import MetricasMiddleware
+from app.services.previsao import previsao_service
+from app.services.profiler_sql import ProfilerSQLMiddleware, profiler_sql
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização e finalização da aplicação"""
+    # Carrega cores e tipos em memória antes de atender requisições
+    # (com gunicorn em preload, o cache já vem carregado do processo mestre)
+    if not catalogo_cache.carregado:
+        db = nova_sessao()
+        try:
+            preparar_banco()
+            catalogo_cache.carregar(db)
+        except Exception as e:
+            # Sem banco na inicialização o cache é carregado no primeiro acesso
+            print(f"⚠️ Cache de cores/tipos não carregado: {e}")
+        finally:
+            db.close()
+
+    # Atualiza produtos.estoque_atual dos produtos distribuídos em faixas
+    consolidacao = None
+    if settings.DB_ESTOQUE_FAIXAS:
+        consolidacao = asyncio.create_task(
+            estoque_faixas_service.consolidar_periodicamente(
+                settings.DB_ESTOQUE_FAIXAS_CONSOLIDAR_SEGUNDOS
+            )
+        )
+
+    # Retoma jobs pendentes (ex.: após restart) e expira resultados antigos
+    varredura_jobs = asyncio.create_task(
+        fila_jobs.varrer_periodicamente(settings.JOBS_VARREDURA_SEGUNDOS)
+    )
+
+    # Previsão de demanda e pontos de reposição, uma vez por noite
+    previsao_noturna = asyncio.create_task(
+        previsao_service.agendar_diariamente(settings.PREVISAO_HORA)
+    )
+
+    yield
+
+    if consolidacao:
+        consolidacao.cancel()
+    varredura_jobs.cancel()
+    previsao_noturna.cancel()
+
+    # Jobs em execução voltam para a fila e são retomados por outro worker
+    await asyncio.to_thread(fila_jobs.encerrar)
+
+    engine.dispose()
+    for replica in engines_replica:
+        replica.dispose()
+
+
+app = FastAPI(
+    title=settings.API_TITLE,
+    description=settings.API_DESCRIPTION,
+    version=settings.API_VERSION,
+    lifespan=lifespan
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(ProfilerSQLMiddleware, profiler=profiler_sql)
+app.add_middleware(MetricasMiddleware)
+
+app.include_router(cores.router)
+app.include_router(tipos.router)
+app.include_router(produtos.router)
+app.include_router(movimentacoes.router)
+app.include_router(sync.router)
+app.include_router(eventos.router)
+app.include_router(diagnostico.router)
+app.include_router(metricas.router)
+app.include_router(jobs.router)
+app.include_router(relatorios.router)
+
+
+@app.get("/")
+def root():
+    return {"message": f"{settings.API_TITLE} - Funcionando! 🚀"}
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "healthy", "service": "estoque-engenho"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    uvicorn.run(
+        "main:app",
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        reload=settings.API_DEBUG
+    )
@@ -3,11 +3,12 @@
 Estoque Engenho - Script de Teste
 Testa os principais endpoints da API
 """
+import os
 import requests
 import json
 from time import sleep
 
-BASE_URL = "http://localhost:8000"
+BASE_URL = os.getenv("API_URL", "http://localhost:8000")
 
 
 def print_section(title):
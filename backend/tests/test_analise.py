@@ -0,0 +1,47 @@
+"""
+Estoque Engenho - Testes dos indicadores da análise de estoque
+"""
+import numpy as np
+
+from app.services.analise import analisar, classificar_abc
+
+
+def test_abc_pela_participacao_acumulada_antes_do_produto():
+    # Acumulado antes de cada um: 0%, 50%, 80% (fronteira: já é B), 95% (já é C)
+    receita = np.array([15.0, 0.0, 50.0, 5.0, 30.0])
+
+    assert classificar_abc(receita).tolist() == ["B", "C", "A", "C", "A"]
+
+
+def test_abc_produto_sem_receita_e_sempre_c():
+    assert classificar_abc(np.array([100.0, 0.0])).tolist() == ["A", "C"]
+    assert classificar_abc(np.zeros(3)).tolist() == ["C", "C", "C"]
+    assert classificar_abc(np.array([])).tolist() == []
+
+
+def test_abc_empate_mantem_a_ordem_original():
+    assert classificar_abc(np.array([40.0, 40.0, 20.0])).tolist() == ["A", "A", "B"]
+
+
+def test_indicadores_por_produto():
+    produtos = {
+        "estoque": np.array([10.0, 0.0, 5.0, 0.0]),
+        "preco_custo": np.array([4.0, 4.0, 4.0, 4.0]),
+        "preco_venda": np.array([10.0, 10.0, 10.0, 10.0]),
+    }
+    acumulado = {
+        "saidas": np.array([20.0, 0.0, 0.0, 4.0]),
+        # Estoque no início do período = atual - variação: 30, 0, 0, 4
+        "variacao": np.array([-20.0, 0.0, 5.0, -4.0]),
+    }
+
+    resultado = analisar(produtos, acumulado, dias=10)
+
+    np.testing.assert_array_equal(resultado["receita"], [200.0, 0.0, 0.0, 40.0])
+    np.testing.assert_array_equal(resultado["estoque_medio"], [20.0, 0.0, 2.5, 2.0])
+    # Sem estoque médio: giro não se aplica; com estoque e sem saídas: zero
+    np.testing.assert_array_equal(resultado["giro"], [1.0, np.nan, 0.0, 2.0])
+    # Sem saídas: cobertura não se aplica; sem estoque e com saídas: zero dias
+    np.testing.assert_array_equal(resultado["dias_cobertura"], [5.0, np.nan, np.nan, 0.0])
+    np.testing.assert_array_equal(resultado["valor_custo"], [40.0, 0.0, 20.0, 0.0])
+    assert resultado["classe_abc"].tolist() == ["A", "C", "C", "B"]
@@ -0,0 +1,94 @@
+"""
+Estoque Engenho - Testes do BarcodeService
+"""
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.services.barcode_service import _modulos_code128, barcode_service
+
+
+def _imagem(conteudo_base64: str) -> Image.Image:
+    return Image.open(BytesIO(base64.b64decode(conteudo_base64)))
+
+
+def _linha_barras(img: Image.Image) -> str:
+    """Primeira linha de pixels como "1" (preto) e "0" (branco)"""
+    img = img.convert('1')
+    return "".join("1" if img.getpixel((x, 0)) == 0 else "0" for x in range(img.width))
+
+
+@pytest.mark.parametrize("opcoes", [
+    {"modulo": 1},
+    {"modulo": 1, "dpi": 72},
+    {"dpi": 72},
+    {"dpi": 96},
+    {"dpi": 1200},
+])
+def test_code128_modulos_de_pixels_inteiros(opcoes):
+    img = _imagem(barcode_service.gerar_imagem_code128("00010101", **opcoes))
+
+    assert img.mode == '1'
+    modulo = opcoes.get("modulo") or max(1, round(0.3 * opcoes["dpi"] / 25.4))
+    esperado = "".join(valor * modulo for valor in _modulos_code128("00010101"))
+    assert esperado in _linha_barras(img)
+
+
+def test_code128_miniatura_e_webp():
+    miniatura = _imagem(barcode_service.gerar_imagem_code128("00010101", largura=120))
+    assert miniatura.width == 120
+
+    webp = _imagem(barcode_service.gerar_imagem_code128("00010101", formato="webp"))
+    assert webp.format == "WEBP"
+
+
+@pytest.mark.parametrize("codigo", [
+    "00010101",
+    "ABCDEFGHIJK",          # 11 alfanuméricos
+    "1" * 19,               # 19 numéricos
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",  # mais de 350 módulos: reduzido
+])
+def test_etiqueta_com_codigos_longos(codigo):
+    img = _imagem(barcode_service.gerar_etiqueta_produto(codigo, "Blusa Azul", "Blusa", "Azul", 59.9))
+
+    assert img.size == (400, 250)
+    assert img.mode == '1'
+
+
+def test_etiqueta_sem_reescala_usa_modulos_inteiros():
+    img = _imagem(barcode_service.gerar_etiqueta_produto("00010101", "Blusa", "Blusa", "Azul"))
+    modulos = _modulos_code128("00010101")
+    modulo = 350 // (len(modulos) + 20)
+
+    linha = img.crop((0, 130, img.width, 131))
+    assert "".join(valor * modulo for valor in modulos) in _linha_barras(linha)
+
+
+def test_code128_sem_fontes_do_sistema_em_pillow_antigo(monkeypatch):
+    from PIL import ImageFont
+
+    from app.services import barcode_service as modulo
+
+    # Fonte bitmap que o load_default() do Pillow 10.0 devolve
+    bitmap = ImageFont.load_default_imagefont()
+
+    def truetype(*args, **kwargs):
+        raise OSError("fonte não encontrada")
+
+    def load_default(*args):
+        # Assinatura do Pillow 10.0: sem o tamanho
+        if args:
+            raise TypeError("load_default() takes 0 positional arguments")
+        return bitmap
+
+    monkeypatch.setattr(ImageFont, "truetype", truetype)
+    monkeypatch.setattr(ImageFont, "load_default", load_default)
+    modulo._fonte_codigo.cache_clear()
+    try:
+        img = _imagem(barcode_service.gerar_imagem_code128("00010101"))
+    finally:
+        modulo._fonte_codigo.cache_clear()
+
+    assert img.mode == '1'
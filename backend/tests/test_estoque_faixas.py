@@ -0,0 +1,108 @@
+"""
+Estoque Engenho - Testes do estoque distribuído em faixas
+"""
+import pytest
+
+from app import database
+from app.config import settings
+from app.services.estoque_faixas import FaixaEstoque, estoque_faixas_service
+
+
+@pytest.fixture
+def distribuido(client, produto, monkeypatch):
+    """O produto de 10 unidades dividido em 4 faixas (3, 3, 2, 2)"""
+    monkeypatch.setattr(settings, "DB_ESTOQUE_FAIXAS", True)
+    resposta = client.put(f"/produtos/{produto['id']}/estoque-faixas", params={"faixas": 4})
+    assert resposta.status_code == 200, resposta.text
+    return produto
+
+
+def _saldos(produto):
+    db = database.SessionLocal()
+    try:
+        return [
+            saldo for (saldo,) in db.query(FaixaEstoque.saldo).filter(
+                FaixaEstoque.produto_id == produto["id"]
+            ).order_by(FaixaEstoque.faixa)
+        ]
+    finally:
+        db.close()
+
+
+def _movimentar(client, rota, produto, quantidade):
+    return client.post(f"/movimentacoes/{rota}", json={
+        "codigo_barras": produto["codigo_barras"],
+        "quantidade": quantidade,
+        "tipo_movimento": rota.upper(),
+    })
+
+
+def test_distribuicao_divide_o_estoque(distribuido):
+    assert _saldos(distribuido) == [3, 3, 2, 2]
+
+
+def test_saida_atendida_por_uma_faixa(client, distribuido):
+    resposta = _movimentar(client, "saida", distribuido, 2)
+
+    assert resposta.status_code == 201
+    assert (resposta.json()["estoque_anterior"], resposta.json()["estoque_atual"]) == (10, 8)
+    assert sum(_saldos(distribuido)) == 8
+
+
+def test_saida_maior_que_qualquer_faixa_usa_todas(client, distribuido):
+    resposta = _movimentar(client, "saida", distribuido, 7)
+
+    assert resposta.status_code == 201
+    assert resposta.json()["estoque_atual"] == 3
+    assert sorted(_saldos(distribuido)) == [0, 1, 1, 1]
+
+
+def test_saida_maior_que_o_total_e_recusada(client, distribuido):
+    resposta = _movimentar(client, "saida", distribuido, 11)
+
+    assert resposta.status_code == 400
+    assert _saldos(distribuido) == [3, 3, 2, 2]
+
+
+def test_ajuste_grava_o_produto_e_redistribui(client, distribuido):
+    resposta = _movimentar(client, "ajuste", distribuido, 21)
+
+    assert resposta.status_code == 201
+    assert _saldos(distribuido) == [6, 5, 5, 5]
+    assert client.get(f"/produtos/{distribuido['id']}").json()["estoque_atual"] == 21
+
+
+def test_consolidacao_grava_a_soma_das_faixas(client, distribuido):
+    _movimentar(client, "entrada", distribuido, 5)
+    _movimentar(client, "saida", distribuido, 1)
+
+    db = database.SessionLocal()
+    try:
+        assert estoque_faixas_service.consolidar_todos(db) == 1
+    finally:
+        db.close()
+
+    assert sorted(_saldos(distribuido)) == [3, 3, 4, 4]
+    assert client.get(f"/produtos/{distribuido['id']}").json()["estoque_atual"] == 14
+
+
+def test_produto_sem_faixas_segue_o_caminho_normal(client, produto, monkeypatch):
+    monkeypatch.setattr(settings, "DB_ESTOQUE_FAIXAS", True)
+    travas = []
+    travar = estoque_faixas_service._travar_produto
+
+    def registrar_trava(db, produto_id, exclusivo):
+        travas.append(exclusivo)
+        return travar(db, produto_id, exclusivo)
+
+    monkeypatch.setattr(estoque_faixas_service, "_travar_produto", registrar_trava)
+
+    assert _movimentar(client, "entrada", produto, 5).status_code == 201
+    resposta = _movimentar(client, "saida", produto, 3)
+
+    assert resposta.status_code == 201
+    assert (resposta.json()["estoque_anterior"], resposta.json()["estoque_atual"]) == (15, 12)
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 12
+    assert _saldos(produto) == []
+    # O caminho normal regrava o produto: lock exclusivo desde o início, nunca promovido
+    assert travas == [True, True]
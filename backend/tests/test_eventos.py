@@ -0,0 +1,67 @@
+"""
+Estoque Engenho - Testes do stream de eventos entre workers
+"""
+import asyncio
+import multiprocessing
+
+import pytest
+
+from app.services.eventos import CanalEventos, EventosService, FiltroEventos
+
+
+def _evento(produto_id, estoque_atual=10):
+    return {
+        "evento": "movimentacao", "tipo_movimento": "SAIDA", "quantidade": 1,
+        "produto_id": produto_id, "tipo_id": 1, "estoque_atual": estoque_atual, "estoque_minimo": 5,
+    }
+
+
+async def _receber(assinante, quantidade):
+    recebidos, perdidos = [], 0
+    while len(recebidos) < quantidade:
+        await asyncio.wait_for(assinante.sinal.wait(), timeout=2)
+        eventos, descartados = assinante.retirar()
+        recebidos += eventos
+        perdidos += descartados
+    return recebidos, perdidos
+
+
+def test_assinante_recebe_eventos_de_outro_worker():
+    servico = EventosService()
+
+    async def cenario():
+        assinante = servico.assinar(FiltroEventos(produto_id=1), tamanho_buffer=10)
+        # Outro worker do gunicorn: processo criado por fork depois do servico
+        worker = multiprocessing.get_context("fork").Process(
+            target=lambda: [servico.publicar(_evento(produto_id)) for produto_id in (1, 2, 1)]
+        )
+        worker.start()
+        worker.join()
+        servico.publicar(_evento(1, estoque_atual=7))
+        return await _receber(assinante, 3)
+
+    recebidos, perdidos = asyncio.run(cenario())
+
+    assert [sequencia for sequencia, _ in recebidos] == [1, 3, 4]
+    assert '"estoque_atual":7' in recebidos[-1][1]
+    assert perdidos == 0
+
+
+def test_canal_sobrescrito_conta_perdidos():
+    canal = CanalEventos()
+    for i in range(CanalEventos.EVENTOS + 3):
+        canal.publicar(str(i).encode())
+
+    eventos, perdidos = canal.ler(0)
+
+    assert perdidos == 3
+    assert eventos[0] == (4, b"3")
+    assert len(eventos) == CanalEventos.EVENTOS
+
+
+def test_evento_maior_que_a_posicao_e_descartado():
+    canal = CanalEventos()
+
+    canal.publicar(b"x" * (CanalEventos.TAMANHO_EVENTO + 1))
+
+    assert canal.sequencia == 0
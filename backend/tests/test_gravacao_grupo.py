@@ -0,0 +1,64 @@
+"""
+Estoque Engenho - Testes da gravação em grupo
+"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+from app import database
+from app.database import iniciar_escrita, nova_sessao
+from app.models import Cor
+from app.services.gravacao_grupo import GravacaoEmGrupo
+
+
+@pytest.fixture
+def gravacao(client):
+    return GravacaoEmGrupo(
+        nova_sessao, janela_ms=0, lote_max=8,
+        preparar_sessao=iniciar_escrita
+    )
+
+
+def _cores():
+    db = database.SessionLocal()
+    try:
+        return sorted(codigo for (codigo,) in db.query(Cor.codigo))
+    finally:
+        db.close()
+
+
+def test_erro_de_uma_operacao_desfaz_so_ela(gravacao):
+    def recusar(db):
+        db.add(Cor(nome="Azul", codigo="02"))
+        raise HTTPException(status_code=400)
+
+    with pytest.raises(HTTPException):
+        gravacao.executar(recusar)
+    gravacao.executar(lambda db: db.add(Cor(nome="Verde", codigo="03")))
+
+    assert _cores() == ["01", "03"]
+
+
+def test_deadlock_repete_o_lote(gravacao):
+    tentativas = []
+
+    def operacao(db):
+        tentativas.append(1)
+        db.add(Cor(nome="Azul", codigo="02"))
+        db.flush()
+        if len(tentativas) == 1:
+            raise OperationalError("INSERT", {}, Exception(1213, "Deadlock found"))
+        return "ok"
+
+    assert gravacao.executar(operacao) == "ok"
+    assert len(tentativas) == 2
+    assert _cores() == ["01", "02"]
+
+
+def test_outros_erros_do_banco_derrubam_o_lote(gravacao):
+    def operacao(db):
+        raise OperationalError("INSERT", {}, Exception(2013, "Lost connection"))
+
+    with pytest.raises(OperationalError):
+        gravacao.executar(operacao)
+    assert _cores() == ["01"]
@@ -0,0 +1,95 @@
+"""
+Estoque Engenho - Testes da fila de jobs
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from app import database
+from app.services.jobs import CONCLUIDO, EXECUTANDO, PENDENTE, FilaJobs, Job
+
+
+@pytest.fixture
+def fila():
+    """Fila sem pool: os testes executam o job na própria thread"""
+    return FilaJobs()
+
+
+@pytest.fixture
+def job_id(client):
+    """Job pendente do tipo teste"""
+    job_id = uuid.uuid4().hex
+    db = database.SessionLocal()
+    try:
+        db.add(Job(id=job_id, tipo="teste", status=PENDENTE, parametros="{}"))
+        db.commit()
+    finally:
+        db.close()
+    return job_id
+
+
+def _job(job_id):
+    db = database.SessionLocal()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+
+def _reivindicado_por_outro_worker(job_id):
+    """A varredura devolveu o job à fila e outro worker o reivindicou"""
+    db = database.SessionLocal()
+    try:
+        db.execute(update(Job).where(Job.id == job_id).values(processo="outro:1"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _temporarios():
+    return [nome for nome in os.listdir(os.environ["JOBS_DIR"]) if nome.endswith(".tmp")]
+
+
+def test_job_concluido_grava_o_resultado(fila, job_id):
+    fila.registrar("teste", lambda db, parametros, progresso: (b"ok", "ok.txt", "text/plain"))
+
+    fila._executar_job(job_id)
+
+    job = _job(job_id)
+    assert (job.status, job.progresso, job.tamanho_bytes) == (CONCLUIDO, 100, 2)
+    with open(fila.caminho_resultado(job.id), "rb") as arquivo:
+        assert arquivo.read() == b"ok"
+
+
+def test_job_perdido_para_outro_worker_para_no_progresso(fila, job_id):
+    chamadas = []
+
+    def executar(db, parametros, progresso):
+        _reivindicado_por_outro_worker(job_id)
+        progresso(1, 2)
+        chamadas.append("continuou")
+        return b"ok", "ok.txt", "text/plain"
+
+    fila.registrar("teste", executar)
+    fila._executar_job(job_id)
+
+    job = _job(job_id)
+    assert chamadas == []
+    assert (job.status, job.processo, job.progresso) == (EXECUTANDO, "outro:1", 0)
+    assert not os.path.exists(fila.caminho_resultado(job.id))
+
+
+def test_job_perdido_ao_concluir_nao_grava_o_arquivo(fila, job_id):
+    def executar(db, parametros, progresso):
+        _reivindicado_por_outro_worker(job_id)
+        return b"ok", "ok.txt", "text/plain"
+
+    fila.registrar("teste", executar)
+    fila._executar_job(job_id)
+
+    job = _job(job_id)
+    assert (job.status, job.processo, job.nome_arquivo) == (EXECUTANDO, "outro:1", None)
+    assert not os.path.exists(fila.caminho_resultado(job.id))
+    assert _temporarios() == []
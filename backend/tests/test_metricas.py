@@ -0,0 +1,22 @@
+"""
+Estoque Engenho - Testes do endpoint /metrics
+"""
+import re
+
+from app import database
+
+
+def _valor(texto, linha):
+    return float(re.search(rf"^{re.escape(linha)} (\S+)$", texto, re.MULTILINE).group(1))
+
+
+def test_contagem_da_espera_do_pool_e_o_bucket_inf(client):
+    # Um timeout entra no histograma de espera sem ser um checkout
+    database.engine.pool.metricas.registrar_espera(30.0)
+    database.engine.pool.metricas.incrementar("timeouts")
+
+    texto = client.get("/metrics").text
+
+    contagem = _valor(texto, 'db_pool_wait_seconds_count{engine="primario"}')
+    assert contagem == _valor(texto, 'db_pool_wait_seconds_bucket{engine="primario",le="+Inf"}')
+    assert contagem > _valor(texto, 'db_pool_wait_seconds_bucket{engine="primario",le="10.0"}')
@@ -0,0 +1,128 @@
+"""
+Estoque Engenho - Testes das movimentações de estoque
+"""
+import uuid
+
+from sqlalchemy.exc import OperationalError
+
+from app.routers import movimentacoes
+
+
+def _movimentar(client, rota, produto, quantidade, chave=None):
+    headers = {"Idempotency-Key": chave} if chave else {}
+    return client.post(f"/movimentacoes/{rota}", headers=headers, json={
+        "codigo_barras": produto["codigo_barras"],
+        "quantidade": quantidade,
+        "tipo_movimento": rota.upper(),
+    })
+
+
+def _estoque(client, produto):
+    return client.get(f"/produtos/{produto['id']}").json()["estoque_atual"]
+
+
+def _historico(client, produto):
+    return client.get(f"/movimentacoes/produto/{produto['id']}/historico").json()
+
+
+def test_entrada_saida_e_ajuste_atualizam_estoque(client, produto):
+    resposta = _movimentar(client, "entrada", produto, 5)
+    assert resposta.status_code == 201
+    assert (resposta.json()["estoque_anterior"], resposta.json()["estoque_atual"]) == (10, 15)
+
+    resposta = _movimentar(client, "saida", produto, 3)
+    assert resposta.status_code == 201
+    assert (resposta.json()["estoque_anterior"], resposta.json()["estoque_atual"]) == (15, 12)
+
+    # No ajuste a quantidade é o estoque final
+    resposta = _movimentar(client, "ajuste", produto, 7)
+    assert resposta.status_code == 201
+    assert (resposta.json()["estoque_anterior"], resposta.json()["estoque_atual"]) == (12, 7)
+
+    assert _estoque(client, produto) == 7
+    tipos = [movimentacao["tipo_movimento"] for movimentacao in _historico(client, produto)[:3]]
+    assert sorted(tipos) == ["AJUSTE", "ENTRADA", "SAIDA"]
+
+
+def test_saida_maior_que_estoque_e_recusada(client, produto):
+    historico = _historico(client, produto)
+
+    resposta = _movimentar(client, "saida", produto, 11)
+
+    assert resposta.status_code == 400
+    assert "Estoque insuficiente" in resposta.json()["detail"]
+    assert _estoque(client, produto) == 10
+    assert _historico(client, produto) == historico
+
+
+def test_saida_de_todo_o_estoque_zera(client, produto):
+    resposta = _movimentar(client, "saida", produto, 10)
+
+    assert resposta.status_code == 201
+    assert _estoque(client, produto) == 0
+
+
+def test_produto_inexistente_retorna_404(client, produto):
+    resposta = _movimentar(client, "saida", {**produto, "codigo_barras": "0000000000000"}, 1)
+
+    assert resposta.status_code == 404
+
+
+def test_chave_repetida_nao_aplica_duas_vezes(client, produto):
+    chave = uuid.uuid4().hex
+
+    primeira = _movimentar(client, "saida", produto, 3, chave)
+    segunda = _movimentar(client, "saida", produto, 3, chave)
+
+    assert primeira.status_code == 201
+    assert segunda.status_code == 201
+    assert segunda.json() == primeira.json()
+    assert _estoque(client, produto) == 7
+
+
+def test_chave_repetida_com_outra_movimentacao_retorna_422(client, produto):
+    chave = uuid.uuid4().hex
+    _movimentar(client, "saida", produto, 3, chave)
+
+    resposta = _movimentar(client, "saida", produto, 4, chave)
+
+    assert resposta.status_code == 422
+    assert _estoque(client, produto) == 7
+
+
+def test_chaves_diferentes_aplicam_cada_movimentacao(client, produto):
+    _movimentar(client, "saida", produto, 3, uuid.uuid4().hex)
+    _movimentar(client, "saida", produto, 3, uuid.uuid4().hex)
+
+    assert _estoque(client, produto) == 4
+
+
+def test_chave_de_saida_recusada_pode_ser_reutilizada(client, produto):
+    chave = uuid.uuid4().hex
+
+    assert _movimentar(client, "saida", produto, 11, chave).status_code == 400
+    _movimentar(client, "entrada", produto, 5)
+
+    resposta = _movimentar(client, "saida", produto, 11, chave)
+    assert resposta.status_code == 201
+    assert _estoque(client, produto) == 4
+
+
+def test_deadlock_repete_a_transacao(client, produto, monkeypatch):
+    aplicar = movimentacoes._aplicar_movimentacao
+    chamadas = []
+
+    def aplicar_com_deadlock(db, *args):
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            aplicar(db, *args)  # o banco desfaz o que já foi aplicado
+            raise OperationalError("UPDATE", {}, Exception(1213, "Deadlock found"))
+        return aplicar(db, *args)
+
+    monkeypatch.setattr(movimentacoes, "_aplicar_movimentacao", aplicar_com_deadlock)
+
+    resposta = _movimentar(client, "saida", produto, 3)
+
+    assert resposta.status_code == 201
+    assert len(chamadas) == 2
+    assert _estoque(client, produto) == 7
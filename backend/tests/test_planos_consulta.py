@@ -0,0 +1,292 @@
+"""
+Estoque Engenho - Regressão de Planos de Consulta
+
+Chama cada rota de app/routers/produtos.py e app/routers/movimentacoes.py
+contra um banco populado, captura os SELECTs que a rota executa e roda
+EXPLAIN em cada um, com os mesmos parâmetros. Falha se algum plano:
+
+    varredura         lê a tabela inteira (SQLite: SCAN sem índice; MySQL: type ALL)
+    varredura_indice  percorre um índice inteiro e lê cada linha da tabela
+                      (SQLite: SCAN ... USING INDEX; MySQL: type index sem
+                      "Using index")
+    ordenacao         ordena fora de um índice (SQLite: USE TEMP B-TREE;
+                      MySQL: Using filesort)
+
+Varreduras de consultas com LIMIT e sem WHERE não contam: sem ordenação
+extra (que falha como `ordenacao`), param nas primeiras linhas lidas.
+
+Exceções conhecidas ficam em PERMITIDOS, com o motivo. Rota nova ou
+consulta alterada que caia num desses planos quebra o teste: crie o índice
+(schema.sql, schema_sqlite.sql e uma migração) ou justifique a exceção.
+
+Roda nos bancos da fixture `banco` (SQLite; MySQL com TEST_MYSQL_URL).
+Para ver todos os planos: python -m pytest tests/test_planos_consulta.py -s
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, event, insert
+
+from app import database
+from app.models import Base, Cor, Movimentacao, Produto, Tipo, TipoMovimento
+from app.services.catalogo_cache import catalogo_cache
+
+PRODUTOS = 2_000
+MOVIMENTACOES = 50_000
+
+# Catálogos pequenos, lidos inteiros de propósito (cache em memória)
+TABELAS_PEQUENAS = ("cores", "tipos")
+
+# (rota, problema) -> motivo
+PERMITIDOS: Dict[Tuple[str, str], str] = {
+    ("GET /produtos/?ativo", "varredura_indice"): (
+        "ativo não é seletivo (quase todos os produtos estão ativos): a leitura "
+        "em ordem de created_at para no LIMIT depois de poucas linhas a mais"
+    ),
+    ("GET /produtos/?busca", "varredura_indice"): (
+        "LIKE '%termo%' em nome e código de barras não usa índice; o catálogo "
+        "é lido em ordem de created_at até o LIMIT ou até o fim se o termo for raro"
+    ),
+    ("GET /produtos/baixo-estoque", "varredura"): (
+        "compara duas colunas (estoque_atual <= estoque_minimo) e devolve a lista inteira"
+    ),
+    ("POST /produtos/imagens-zip?ativo", "varredura"): (
+        "ativo não é seletivo: percorre a chave primária em ordem até ZIP_MAX_PRODUTOS"
+    ),
+    ("POST /produtos/imagens-zip?tipo_id", "ordenacao"): (
+        "lê todos os produtos do tipo de qualquer forma; ordena no máximo ZIP_MAX_PRODUTOS por id"
+    ),
+}
+
+
+def rotas(produto: dict, movimentacao_id: int) -> List[Tuple[str, str, str, dict]]:
+    """(nome, método, caminho, argumentos do cliente) de cada rota verificada"""
+    produto_id = produto["id"]
+    ontem = (datetime.now() - timedelta(days=1)).isoformat()
+    semana = (datetime.now() - timedelta(days=7)).isoformat()
+    saida = {
+        "codigo_barras": produto["codigo_barras"], "quantidade": 1, "tipo_movimento": "SAIDA"
+    }
+    return [
+        # produtos.py
+        ("GET /produtos/", "GET", "/produtos/", {}),
+        ("GET /produtos/?ativo", "GET", "/produtos/", {"params": {"ativo": True}}),
+        ("GET /produtos/?tipo_id", "GET", "/produtos/", {"params": {"tipo_id": produto["tipo_id"]}}),
+        ("GET /produtos/?cor_id", "GET", "/produtos/", {"params": {"cor_id": produto["cor_id"]}}),
+        ("GET /produtos/?busca", "GET", "/produtos/", {"params": {"busca": "azul"}}),
+        ("GET /produtos/baixo-estoque", "GET", "/produtos/baixo-estoque", {}),
+        ("GET /produtos/codigo-barras/{codigo}", "GET",
+         f"/produtos/codigo-barras/{produto['codigo_barras']}", {}),
+        ("GET /produtos/{id}", "GET", f"/produtos/{produto_id}", {}),
+        ("GET /produtos/{id}/barcode", "GET", f"/produtos/{produto_id}/barcode", {}),
+        ("GET /produtos/{id}/etiqueta", "GET", f"/produtos/{produto_id}/etiqueta", {}),
+        ("POST /produtos/", "POST", "/produtos/", {"json": {
+            "nome": "Produto do EXPLAIN", "tipo_id": produto["tipo_id"], "cor_id": produto["cor_id"]
+        }}),
+        ("PUT /produtos/{id}", "PUT", f"/produtos/{produto_id}", {"json": {"estoque_minimo": 3}}),
+        ("POST /produtos/etiquetas-pdf", "POST", "/produtos/etiquetas-pdf",
+         {"json": [produto_id, produto_id + 1]}),
+        ("POST /produtos/imagens-zip?ids", "POST", "/produtos/imagens-zip",
+         {"json": {"produto_ids": [produto_id], "conteudo": ["code128"]}}),
+        ("POST /produtos/imagens-zip?tipo_id", "POST", "/produtos/imagens-zip",
+         {"json": {"tipo_id": produto["tipo_id"], "conteudo": ["code128"], "imagem": "svg"}}),
+        ("POST /produtos/imagens-zip?ativo", "POST", "/produtos/imagens-zip",
+         {"json": {"ativo": True, "conteudo": ["code128"], "imagem": "svg"}}),
+        # movimentacoes.py
+        ("GET /movimentacoes/", "GET", "/movimentacoes/", {}),
+        ("GET /movimentacoes/?produto_id", "GET", "/movimentacoes/", {"params": {"produto_id": produto_id}}),
+        ("GET /movimentacoes/?tipo_movimento", "GET", "/movimentacoes/",
+         {"params": {"tipo_movimento": "ENTRADA"}}),
+        ("GET /movimentacoes/?data_inicio&data_fim", "GET", "/movimentacoes/",
+         {"params": {"data_inicio": semana, "data_fim": ontem}}),
+        ("GET /movimentacoes/?produto_id&data_inicio", "GET", "/movimentacoes/",
+         {"params": {"produto_id": produto_id, "data_inicio": semana}}),
+        ("GET /movimentacoes/?formato=normalizado", "GET", "/movimentacoes/",
+         {"params": {"formato": "normalizado"}}),
+        ("GET /movimentacoes/recentes", "GET", "/movimentacoes/recentes", {}),
+        ("GET /movimentacoes/{id}", "GET", f"/movimentacoes/{movimentacao_id}", {}),
+        ("GET /movimentacoes/produto/{id}/historico", "GET",
+         f"/movimentacoes/produto/{produto_id}/historico", {}),
+        ("POST /movimentacoes/saida", "POST", "/movimentacoes/saida", {"json": saida}),
+        ("POST /movimentacoes/saida (Idempotency-Key)", "POST", "/movimentacoes/saida",
+         {"json": saida, "headers": {"Idempotency-Key": "planos-consulta"}}),
+        ("POST /movimentacoes/entrada", "POST", "/movimentacoes/entrada",
+         {"json": {**saida, "tipo_movimento": "ENTRADA"}}),
+        ("POST /movimentacoes/ajuste", "POST", "/movimentacoes/ajuste",
+         {"json": {**saida, "quantidade": 500, "tipo_movimento": "AJUSTE"}}),
+    ]
+
+
+# ============= DADOS =============
+
+def popular() -> None:
+    """Banco novo com cores, tipos, produtos e movimentações sintéticos"""
+    with database.SessionLocal() as db:
+        for tabela in reversed(Base.metadata.sorted_tables):
+            db.execute(delete(tabela))
+        cores = [Cor(nome=nome, codigo=f"{i:02d}") for i, nome in
+                 enumerate(("Preto", "Branco", "Vermelho", "Azul", "Verde"), 1)]
+        tipos = [Tipo(nome=nome, codigo=f"{i:02d}") for i, nome in
+                 enumerate(("Blusa", "Calça", "Vestido"), 1)]
+        db.add_all(cores + tipos)
+        db.flush()
+
+        agora = datetime.now()
+        produtos = []
+        for i in range(1, PRODUTOS + 1):
+            tipo, cor = tipos[i % len(tipos)], cores[i % len(cores)]
+            produtos.append({
+                "codigo_produto": f"{i:04d}",
+                "codigo_barras": f"{i:04d}{tipo.codigo}{cor.codigo}",
+                "nome": f"{tipo.nome} {cor.nome} {i}",
+                "tipo_id": tipo.id,
+                "cor_id": cor.id,
+                "estoque_atual": i % 5 if i % 25 == 0 else 1000,
+                "estoque_minimo": 5,
+                "preco_custo": 25,
+                "preco_venda": 59.9,
+                "ativo": i % 10 != 0,
+                "created_at": agora - timedelta(minutes=i),
+            })
+        db.execute(insert(Produto), produtos)
+        ids = [linha[0] for linha in db.query(Produto.id).order_by(Produto.id)]
+
+        tipos_movimento = (TipoMovimento.SAIDA, TipoMovimento.SAIDA, TipoMovimento.ENTRADA, TipoMovimento.AJUSTE)
+        db.execute(insert(Movimentacao), [
+            {
+                "produto_id": ids[(i * 7919) % len(ids)],
+                "tipo_movimento": tipos_movimento[i % len(tipos_movimento)],
+                "quantidade": 1 + i % 5,
+                "estoque_anterior": 100,
+                "estoque_atual": 99,
+                "data_movimento": agora - timedelta(minutes=i * 5),
+            }
+            for i in range(MOVIMENTACOES)
+        ])
+        db.commit()
+        catalogo_cache.carregar(db)
+
+
+# ============= PLANOS =============
+
+def limitada(sql: str) -> bool:
+    """Consulta sem filtro que para nas primeiras linhas (ORDER BY ... LIMIT n)"""
+    return re.search(r"\bLIMIT\b", sql, re.IGNORECASE) is not None and \
+        re.search(r"\bWHERE\b", sql, re.IGNORECASE) is None
+
+
+def explicar(conexao, sql: str, parametros) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Linhas do plano e problemas encontrados: [(problema, tabela)]"""
+    problemas: List[Tuple[str, str]] = []
+    if conexao.dialect.name == "sqlite":
+        linhas = [linha[-1] for linha in conexao.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+        for detalhe in linhas:
+            partes = detalhe.split()
+            if partes[0] == "SCAN" and partes[1] not in ("CONSTANT", "SUBQUERY") and not limitada(sql):
+                if "USING" not in partes:
+                    problemas.append(("varredura", partes[1]))
+                elif "COVERING" not in partes:
+                    problemas.append(("varredura_indice", partes[1]))
+            if detalhe.startswith("USE TEMP B-TREE"):
+                problemas.append(("ordenacao", detalhe.removeprefix("USE TEMP B-TREE FOR ")))
+        return linhas, problemas
+
+    resultado = conexao.exec_driver_sql(f"EXPLAIN {sql}", parametros)
+    linhas = []
+    for linha in resultado.mappings():
+        extra = linha["Extra"] or ""
+        linhas.append(
+            f"{linha['table']}: type={linha['type']} key={linha['key']} "
+            f"rows={linha['rows']} extra={extra}"
+        )
+        if linha["type"] == "ALL" and not limitada(sql):
+            problemas.append(("varredura", linha["table"]))
+        elif linha["type"] == "index" and "Using index" not in extra and not limitada(sql):
+            problemas.append(("varredura_indice", linha["table"]))
+        if "Using filesort" in extra:
+            problemas.append(("ordenacao", linha["table"]))
+    return linhas, problemas
+
+
+@pytest.fixture(scope="module")
+def relatorio(app, banco) -> Dict[str, List[dict]]:
+    """rota -> consultas da rota com plano, falhas e exceções permitidas"""
+    popular()
+
+    rota_atual: List[str] = []
+    capturadas: Dict[str, List[Tuple[str, object]]] = {}
+
+    def _capturar(conn, cursor, statement, parameters, context, executemany):
+        # As requisições do TestClient são sequenciais: a rota em execução é a última
+        if rota_atual and statement.lstrip().upper().startswith("SELECT"):
+            capturadas.setdefault(rota_atual[-1], []).append((statement, parameters))
+
+    cliente = TestClient(app)
+    produto = cliente.get("/produtos/", params={"limit": 1, "ativo": True}).json()[0]
+    movimentacao_id = cliente.get("/movimentacoes/", params={"limit": 1}).json()[0]["id"]
+
+    event.listen(banco, "before_cursor_execute", _capturar)
+    try:
+        for nome, metodo, caminho, kwargs in rotas(produto, movimentacao_id):
+            rota_atual.append(nome)
+            resposta = cliente.request(metodo, caminho, **kwargs)
+            assert resposta.status_code < 400, f"{nome} respondeu {resposta.status_code}: {resposta.text[:200]}"
+    finally:
+        event.remove(banco, "before_cursor_execute", _capturar)
+
+    resultado: Dict[str, List[dict]] = {}
+    with banco.connect() as conexao:
+        for nome, _, _, _ in rotas(produto, movimentacao_id):
+            # Mesma consulta repetida na rota (ex.: um SELECT por produto): um EXPLAIN só
+            distintas: Dict[str, object] = {}
+            for sql, parametros in capturadas.get(nome, []):
+                distintas.setdefault(sql, parametros)
+
+            consultas = []
+            for sql, parametros in distintas.items():
+                plano, problemas = explicar(conexao, sql, parametros)
+                consultas.append({
+                    "sql": " ".join(sql.split()),
+                    "plano": plano,
+                    # joinedload usa apelidos (tipos_1, cores_1)
+                    "problemas": [
+                        (problema, tabela) for problema, tabela in problemas
+                        if re.sub(r"_\d+$", "", tabela) not in TABELAS_PEQUENAS
+                    ],
+                })
+            resultado[nome] = consultas
+    return resultado
+
+
+def test_planos_sem_varredura_nem_ordenacao(relatorio):
+    falhas = []
+    for nome, consultas in relatorio.items():
+        for consulta in consultas:
+            print(f"{nome}: {consulta['sql'][:160]}")
+            for linha in consulta["plano"]:
+                print(f"    {linha}")
+            for problema, tabela in consulta["problemas"]:
+                if (nome, problema) not in PERMITIDOS:
+                    falhas.append(f"{nome}: {problema} em {tabela}\n    {consulta['sql'][:200]}\n    "
+                                  + "\n    ".join(consulta["plano"]))
+
+    assert not falhas, "\n".join(falhas)
+
+
+def test_excecoes_ainda_necessarias(relatorio, banco):
+    """Exceção que não aparece mais (índice novo, consulta mudou) deve sair de PERMITIDOS"""
+    usados = {
+        (nome, problema)
+        for nome, consultas in relatorio.items()
+        for consulta in consultas
+        for problema, _ in consulta["problemas"]
+    }
+    sem_uso = [f"{rota} ({problema})" for rota, problema in PERMITIDOS if (rota, problema) not in usados]
+
+    if banco.dialect.name != "sqlite":
+        # Os planos do MySQL dependem das estatísticas: só o SQLite é determinístico
+        pytest.skip(f"exceções sem uso no {banco.dialect.name}: {sem_uso}")
+    assert not sem_uso, sem_uso
@@ -0,0 +1,66 @@
+"""
+Estoque Engenho - Testes da previsão de demanda e do ponto de reposição
+"""
+import numpy as np
+import pytest
+
+from app.services.previsao import FATOR_DESVIO, demanda_por_dia, pontos_reposicao, suavizar
+
+
+def _lote(produto_id, dia, saida):
+    return {
+        "produto_id": np.array(produto_id, dtype=np.int64),
+        "dia": np.array(dia, dtype=np.int64),
+        "saida": np.array(saida, dtype=np.float64),
+    }
+
+
+def test_demanda_por_dia_soma_as_saidas_dentro_da_janela():
+    lotes = [
+        # Dia 103 fica fora (janela 100 a 102), dia 99 também; produto 99 não é ativo
+        _lote([10, 10, 20, 99], [100, 102, 101, 100], [1, 2, 3, 4]),
+        _lote([10, 20, 10, 20], [103, 99, 100, 101], [5, 6, 7, 0]),
+    ]
+
+    matriz = demanda_por_dia(np.array([10, 20]), iter(lotes), primeiro_dia=100, dias=3)
+
+    np.testing.assert_array_equal(matriz, [[8, 0, 2], [0, 3, 0]])
+
+
+def test_demanda_por_dia_sem_movimentacoes():
+    matriz = demanda_por_dia(np.array([10, 20]), iter([]), primeiro_dia=100, dias=3)
+
+    assert matriz.shape == (2, 3)
+    assert not matriz.any()
+
+
+def test_suavizacao_parte_da_media_da_primeira_semana():
+    demanda = np.array([
+        [1, 1, 1, 1, 1, 1, 1, 3],
+        [2, 2, 2, 2, 2, 2, 2, 2],
+    ], dtype=np.float64)
+
+    previsao = suavizar(demanda, alfa=0.5)
+
+    # Produto 0: nível 1 e erro 0 na semana; no 8º dia, erro 0,5 x |3 - 1| e nível 0,5 x 3 + 0,5 x 1
+    np.testing.assert_allclose(previsao["demanda_diaria"], [2.0, 2.0])
+    np.testing.assert_allclose(previsao["desvio_diario"], [FATOR_DESVIO * 1.0, 0.0])
+
+
+def test_suavizacao_com_historico_menor_que_uma_semana():
+    previsao = suavizar(np.array([[1.0, 2.0, 3.0]]), alfa=0.5)
+
+    np.testing.assert_allclose(previsao["demanda_diaria"], [2.0])
+    np.testing.assert_allclose(previsao["desvio_diario"], [FATOR_DESVIO * 2 / 3])
+
+
+def test_ponto_de_reposicao_e_ruptura():
+    previsao = {"demanda_diaria": np.array([2.0, 0.0]), "desvio_diario": np.array([1.25, 0.0])}
+
+    resultado = pontos_reposicao(previsao, np.array([10.0, 5.0]), lead_time=4, z=1.65)
+
+    # Segurança: teto de 1,65 x 1,25 x raiz(4) = 4,125; ponto: 2 x 4 + 5
+    np.testing.assert_array_equal(resultado["estoque_seguranca"], [5, 0])
+    np.testing.assert_array_equal(resultado["ponto_reposicao"], [13, 0])
+    assert resultado["dias_ate_ruptura"][0] == pytest.approx(5.0)
+    assert np.isnan(resultado["dias_ate_ruptura"][1])
@@ -0,0 +1,74 @@
+"""
+Estoque Engenho - Testes da listagem e busca de produtos
+"""
+import pytest
+
+from app.services.barcode_service import BarcodeService
+
+
+@pytest.fixture
+def catalogo(client):
+    """Três produtos; o último desativado"""
+    tipo_id = client.get("/tipos/").json()[0]["id"]
+    cor_id = client.get("/cores/").json()[0]["id"]
+    produtos = []
+    for nome in ("Blusa Listrada", "Calça Jeans", "Blusa Lisa"):
+        resposta = client.post("/produtos/", json={
+            "nome": nome, "tipo_id": tipo_id, "cor_id": cor_id,
+            "preco_custo": 10, "preco_venda": 20,
+        })
+        assert resposta.status_code == 201, resposta.text
+        produtos.append(resposta.json())
+    assert client.delete(f"/produtos/{produtos[2]['id']}").status_code == 204
+    return produtos
+
+
+def _nomes(client, **params):
+    return sorted(produto["nome"] for produto in client.get("/produtos/", params=params).json())
+
+
+def test_busca_por_parte_do_nome(client, catalogo):
+    assert _nomes(client, busca="Blusa") == ["Blusa Lisa", "Blusa Listrada"]
+    assert _nomes(client, busca="jeans") == ["Calça Jeans"]
+
+
+def test_busca_por_parte_do_codigo_de_barras(client, catalogo):
+    codigo = catalogo[1]["codigo_barras"]
+
+    produtos = client.get("/produtos/", params={"busca": codigo[-6:]}).json()
+
+    assert [produto["id"] for produto in produtos] == [catalogo[1]["id"]]
+
+
+def test_busca_sem_resultado(client, catalogo):
+    assert _nomes(client, busca="Vestido") == []
+
+
+def test_busca_com_filtro_de_ativo(client, catalogo):
+    assert _nomes(client, busca="Blusa", ativo=True) == ["Blusa Listrada"]
+    assert _nomes(client, busca="Blusa", ativo=False) == ["Blusa Lisa"]
+
+
+def test_busca_pelo_codigo_exato(client, catalogo):
+    codigo = catalogo[0]["codigo_barras"]
+
+    resposta = client.get(f"/produtos/codigo-barras/{codigo}")
+
+    assert resposta.status_code == 200
+    assert resposta.json()["nome"] == "Blusa Listrada"
+    assert client.get("/produtos/codigo-barras/0000000000000").status_code == 404
+
+
+def test_pdf_de_etiquetas_usa_o_armazem(client, catalogo, monkeypatch):
+    ids = [produto["id"] for produto in catalogo[:2]]
+    for produto_id in ids:
+        assert client.get(f"/produtos/{produto_id}/etiqueta").status_code == 200
+
+    def renderizar(*args, **kwargs):
+        raise AssertionError("etiqueta renderizada de novo")
+
+    monkeypatch.setattr(BarcodeService, "gerar_etiqueta_produto", staticmethod(renderizar))
+    resposta = client.post("/produtos/etiquetas-pdf", json=ids)
+
+    assert resposta.status_code == 200
+    assert resposta.content.startswith(b"%PDF")
@@ -3,33 +3,34 @@ Estoque Engenho - API Principal
 Sistema de controle de estoque com códigos de barras
 """
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import uvicorn
 
 # Importar módulos locais
-from database import SessionLocal, engine, init_db
-from models import Base
+from database import SessionLocal, preparar_banco
 from schemas import *
 #from crud import *
-from utils.barcode_generator import gerar_codigo_barras, gerar_etiqueta_pdf
-from utils.qr_generator import gerar_qr_code
 
-# Criar tabelas no banco
-Base.metadata.create_all(bind=engine)
+# Geradores de código de barras/QR (reportlab, PIL, qrcode, barcode) são
+# importados dentro dos endpoints: só quem gera imagem paga esse custo
 
-# Inicializar dados padrão
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepara o banco na inicialização (ver DB_STARTUP_MODE em database.py)"""
+    preparar_banco()
+    yield
 
 # Criar app FastAPI
 app = FastAPI(
     title="Estoque Engenho API",
     description="Sistema de controle de estoque com códigos de barras",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS para permitir acesso do app mobile
@@ -194,6 +195,8 @@ async def listar_movimentacoes(
 @app.get("/produtos/{produto_id}/codigo-barras")
 async def gerar_codigo_barras_produto(produto_id: int, db: Session = Depends(get_db)):
     """Gerar imagem do código de barras do produto"""
+    from utils.barcode_generator import gerar_codigo_barras
+    
     produto = obter_produto_db(db, produto_id)
     if not produto:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -205,6 +208,8 @@ async def gerar_codigo_barras_produto(produto_id: int, db: Session = Depends(get
 @app.get("/produtos/{produto_id}/etiqueta")
 async def gerar_etiqueta_produto(produto_id: int, db: Session = Depends(get_db)):
     """Gerar etiqueta PDF para impressão"""
+    from utils.barcode_generator import gerar_etiqueta_pdf
+    
     produto = obter_produto_db(db, produto_id)
     if not produto:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -220,6 +225,8 @@ async def gerar_etiqueta_produto(produto_id: int, db: Session = Depends(get_db))
 @app.get("/produtos/{produto_id}/qr-code")
 async def gerar_qr_code_produto(produto_id: int, db: Session = Depends(get_db)):
     """Gerar QR Code do produto"""
+    from utils.qr_generator import gerar_qr_code
+    
     produto = obter_produto_db(db, produto_id)
     if not produto:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -261,6 +268,8 @@ async def listar_tipos(db: Session = Depends(get_db)):
 # ================================
 
 if __name__ == "__main__":
+    import uvicorn
+    
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(
         "main:app", 
@@ -12,4 +12,5 @@ export const API_ENDPOINTS = {
   MOVIMENTACOES_RECENTES: '/movimentacoes/recentes',
   CORES: '/cores',
   TIPOS: '/tipos',
+  SYNC: '/sync',
 };
\ No newline at end of file
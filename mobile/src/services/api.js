@@ -1,11 +1,18 @@
 import axios from 'axios';
 import { API_URL, API_ENDPOINTS } from '../config/api';
 
+// Identifica o aparelho para o servidor: depois de uma movimentação, as
+// leituras com o mesmo X-Cliente-Id vão ao banco primário e já mostram o
+// estoque novo. Atrás do proxy o IP não distingue os aparelhos; o id só
+// precisa valer enquanto o app está aberto
+const CLIENTE_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+
 const api = axios.create({
   baseURL: API_URL,
   timeout: 120000,
   headers: {
     'Content-Type': 'application/json',
+    'X-Cliente-Id': CLIENTE_ID,
   },
 });
 
@@ -33,6 +40,30 @@ if (__DEV__) {
   );
 }
 
+const gerarChaveIdempotencia = () =>
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+
+// Movimentações usam a mesma Idempotency-Key em todas as tentativas,
+// então repetir após timeout nunca conta o estoque duas vezes
+const postMovimentacao = async (url, dados, tentativas = 3) => {
+  const chave = gerarChaveIdempotencia();
+
+  for (let tentativa = 1; ; tentativa++) {
+    try {
+      const response = await api.post(url, dados, {
+        timeout: 15000,
+        headers: { 'Idempotency-Key': chave },
+      });
+      return response.data;
+    } catch (error) {
+      // Só repete falhas de rede/timeout; erros da API sobem direto
+      if (error.response || tentativa >= tentativas) {
+        throw error;
+      }
+    }
+  }
+};
+
 export const produtosAPI = {
   listar: async (filtros = {}) => {
     const params = new URLSearchParams(filtros).toString();
@@ -86,18 +117,15 @@ export const movimentacoesAPI = {
   },
 
   entrada: async (dados) => {
-    const response = await api.post(API_ENDPOINTS.ENTRADA, dados);
-    return response.data;
+    return postMovimentacao(API_ENDPOINTS.ENTRADA, dados);
   },
 
   saida: async (dados) => {
-    const response = await api.post(API_ENDPOINTS.SAIDA, dados);
-    return response.data;
+    return postMovimentacao(API_ENDPOINTS.SAIDA, dados);
   },
 
   ajuste: async (dados) => {
-    const response = await api.post(API_ENDPOINTS.AJUSTE, dados);
-    return response.data;
+    return postMovimentacao(API_ENDPOINTS.AJUSTE, dados);
   },
 
   recentes: async (horas = 24) => {
@@ -130,6 +158,14 @@ export const tiposAPI = {
   },
 };
 
+export const syncAPI = {
+  sincronizar: async (token = null) => {
+    const params = token ? `?since=${encodeURIComponent(token)}` : '';
+    const response = await api.get(`${API_ENDPOINTS.SYNC}/${params}`);
+    return response.data;
+  },
+};
+
 export const verificarConexao = async () => {
   try {
     const response = await api.get('/health');